@@ -2,11 +2,11 @@
 
 import os
 import sys
+# start profiling before anything else is imported
+if [arg for arg in sys.argv if arg.startswith('--profile-startup')]:
+    from flexget.utils import startup_profile
+    startup_profile.start()
 import logging
-from flexget import logger
-from flexget.options import CoreOptionParser
-from flexget import plugin
-from flexget.manager import Manager
 
 __version__ = '{subversion}'
 
@@ -16,10 +16,22 @@ log = logging.getLogger('main')
 def main():
     """Main entry point for Command Line Interface"""
 
+    # hand the execution to a running daemon before importing anything heavy
+    from flexget import daemon
+    status = daemon.submit(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+
+    from flexget import logger
+    from flexget.options import CoreOptionParser
+    from flexget import plugin
+    from flexget.manager import Manager
+    from flexget.utils import startup_profile
+
     logger.initialize()
 
     parser = CoreOptionParser()
-    plugin.load_plugins(parser)
+    plugin.load_plugins(parser, lazy=True)
 
     options = parser.parse_args()[0]
 
@@ -31,6 +43,18 @@ def main():
         logger.flush_logging_to_console()
         sys.exit(1)
 
+    profile = startup_profile.stop()
+    if profile:
+        if options.profile_startup:
+            print profile.report()
+        if options.profile_startup_trace:
+            from flexget.utils import json
+            trace_file = open(options.profile_startup_trace, 'w')
+            try:
+                json.dump(profile.trace(), trace_file, indent=2)
+            finally:
+                trace_file.close()
+
     log_level = logging.getLevelName(options.loglevel.upper())
     log_file = os.path.expanduser(manager.options.logfile)
     # If an absolute path is not specified, use the config directory.
@@ -38,7 +62,9 @@ def main():
         log_file = os.path.join(manager.config_base, log_file)
     logger.start(log_file, log_level)
 
-    if options.profile:
+    if options.run_daemon:
+        daemon.Daemon(manager).serve()
+    elif options.profile:
         try:
             import cProfile as profile
         except ImportError:
@@ -0,0 +1,316 @@
+"""
+Headless daemon keeping one :class:`~flexget.manager.Manager` alive between executions.
+
+``flexget --daemon`` serves execution requests on a Unix socket. While it is running, plain ``flexget`` runs with the
+same config only send their arguments to the daemon and print the output of the execution, so plugins, database
+connection and caches are already warm. Runs with options the daemon can not honour (eg. --test or --reset), and
+runs with --no-daemon, are ran locally as before. They can not acquire the config lock while the daemon is running.
+
+This module is imported by the client before anything else, keep its imports light.
+"""
+
+import errno
+import hashlib
+import os
+import signal
+import socket
+import sys
+
+# options which can differ for each execution ran by the daemon, by dest
+EXECUTION_OPTIONS = set(['onlyfeed', 'interval_ignore', 'due_only', 'learn', 'nocache', 'quiet', 'loglevel', 'debug',
+                         'debug_trace', 'validate', 'retry', 'preset', 'debug_perf'])
+
+# separates output from the exit status in responses
+END = '\0'
+
+
+def config_locations(config):
+    """
+    :param string config: Config file as given with -c
+    :return: List of paths where *config* is looked for, in order
+    """
+    if os.path.dirname(config):
+        # explicit path given, don't try anything too fancy
+        return [config]
+    startup_path = os.path.dirname(os.path.abspath(sys.path[0]))
+    exec_path = sys.path[0]
+    # normal lookup locations
+    possible = [startup_path, os.path.join(os.path.expanduser('~'), '.flexget')]
+    if sys.platform.startswith('win'):
+        # On windows look in ~/flexget as well, as explorer does not let you create a folder starting with a dot
+        possible.append(os.path.join(os.path.expanduser('~'), 'flexget'))
+    else:
+        # The freedesktop.org standard config location
+        xdg_config = os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config'))
+        possible.append(os.path.join(xdg_config, 'flexget'))
+    # for virtualenv / dev sandbox
+    from flexget import __version__ as version
+    if version == '{subversion}':
+        possible.extend([os.path.join(exec_path, '..'), os.getcwd(), exec_path])
+    return [os.path.join(path, config) for path in possible]
+
+
+def find_config(config):
+    """:return: Absolute path of the file manager would load for *config*, or None if there is no such file"""
+    for path in config_locations(config):
+        if os.path.exists(path):
+            return os.path.abspath(path)
+
+
+def socket_path(config):
+    """
+    :param string config: Absolute path of the config file
+    :return: Path of the daemon socket for *config*
+    """
+    name = os.path.splitext(os.path.basename(config))[0]
+    # configs with the same name in different directories get their own daemon
+    digest = hashlib.md5(config).hexdigest()[:8]
+    return os.path.join(os.path.expanduser('~'), '.flexget', 'daemon-%s-%s.sock' % (name, digest))
+
+
+def _config_arg(argv):
+    """Find value of -c from *argv* without parsing options."""
+    config = 'config.yml'
+    for i, arg in enumerate(argv):
+        if arg == '-c' and i + 1 < len(argv):
+            config = argv[i + 1]
+        elif arg.startswith('-c') and not arg.startswith('--'):
+            config = arg[2:]
+    return config
+
+
+def _recv_all(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(4096)
+        if not chunk:
+            return ''.join(chunks)
+        chunks.append(chunk)
+
+
+def _read_status(conn):
+    """:return: Tuple of status line and data received after it"""
+    data = ''
+    while '\n' not in data:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    status, _, rest = data.partition('\n')
+    return status, rest
+
+
+def submit(argv, output=None):
+    """
+    Run an execution in the daemon, if one is running.
+
+    :param list argv: Command line arguments, without program name
+    :param output: File where output of the execution is written, stdout by default
+    :return: Exit status of the execution, or None if it should be ran locally
+    """
+    if '--daemon' in argv or '--no-daemon' in argv:
+        return None
+    config = find_config(_config_arg(argv))
+    if config is None:
+        # let the local run report it
+        return None
+    output = output or sys.stdout
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            conn.connect(socket_path(config))
+        except socket.error, e:
+            if e.args[0] not in (errno.ENOENT, errno.ECONNREFUSED):
+                output.write('Unable to connect to FlexGet daemon: %s\n' % e)
+            return None
+        # daemon does not know our working directory, send the config as resolved here
+        return request(conn, argv + ['-c', config], output)
+    finally:
+        conn.close()
+
+
+def request(conn, argv, output):
+    """Send execution request with *argv* over connected socket *conn*, see :func:`submit`"""
+    conn.sendall('\0'.join(argv))
+    conn.shutdown(socket.SHUT_WR)
+    status, data = _read_status(conn)
+    if status != 'OK':
+        if status.startswith('LOCAL '):
+            # local run will not get the lock while the daemon is running, tell why it was attempted
+            output.write('Not executed by FlexGet daemon: %s\n' % status[6:])
+        return None
+    # output is streamed until the end marker, which is followed by exit status
+    while END not in data:
+        output.write(data)
+        output.flush()
+        data = conn.recv(4096)
+        if not data:
+            output.write('Connection to FlexGet daemon was lost\n')
+            return 1
+    text, _, code = data.partition(END)
+    output.write(text)
+    code += _recv_all(conn)
+    try:
+        return int(code)
+    except ValueError:
+        return 1
+
+
+class Daemon(object):
+    """Serves executions of *manager* on a Unix socket, one at a time."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.config = os.path.abspath(manager.config_path or manager.options.config)
+        self.path = socket_path(self.config)
+        self.config_mtime = self._config_mtime()
+        self.server = None
+
+    def _config_mtime(self):
+        try:
+            return os.path.getmtime(self.manager.config_path)
+        except (OSError, TypeError):
+            return None
+
+    def parse(self, argv):
+        """
+        :return: Tuple of options for the execution and None, or None and reason why it should be ran locally
+        """
+        from optparse import OptionParser
+        from flexget.options import CoreOptionParser
+        from flexget import plugin
+
+        class RequestParser(CoreOptionParser):
+
+            def error(self, msg):
+                raise ValueError(msg)
+
+            def exit(self, status=0, msg=None):
+                raise ValueError(msg or 'exit')
+
+        # new option instances, optparse binds options to the parser they are added to
+        parser = RequestParser()
+        for args, kwargs in plugin._plugin_options:
+            parser.add_option(*args, **kwargs)
+        try:
+            # CoreOptionParser would parse our own sys.argv when argv is empty
+            options = OptionParser.parse_args(parser, argv)[0]
+        except ValueError, e:
+            return None, str(e)
+        if options.quiet:
+            options.loglevel = 'info'
+        if os.path.abspath(options.config) != self.config:
+            return None, 'daemon is running with config %s' % self.config
+        defaults = parser.get_default_values().__dict__
+        changed = [name for name, value in options.__dict__.iteritems()
+                   if value != defaults.get(name) and name not in EXECUTION_OPTIONS and name != 'config']
+        if changed:
+            return None, 'options %s are not supported by the daemon' % ', '.join(sorted(changed))
+        return options, None
+
+    def reload_config(self):
+        """Load config again if the file has changed, :return: List of validation errors"""
+        mtime = self._config_mtime()
+        if mtime == self.config_mtime:
+            return []
+        try:
+            self.manager.load_config(self.manager.config_path)
+        except SystemExit:
+            # malformed config, details have been printed already
+            return ['Failed to load config %s' % self.manager.config_path]
+        errors = self.manager.validate_config()
+        if not errors:
+            self.config_mtime = mtime
+        return errors
+
+    def execute(self, options, output):
+        """Execute with *options*, writing log and stdout of the execution into *output*."""
+        import logging
+        from flexget.logger import FlexGetFormatter
+
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(FlexGetFormatter())
+        level = logging.getLevelName(options.loglevel.upper())
+        handler.setLevel(level)
+        root = logging.getLogger()
+        old_level = root.level
+        root.setLevel(min(old_level, level))
+        root.addHandler(handler)
+        old_options, old_stdout, old_stderr = self.manager.options, sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = output
+        try:
+            errors = self.reload_config()
+            if errors:
+                for error in errors:
+                    root.critical(error)
+                return 1
+            self.manager.options = options
+            self.manager.update_feeds()
+            self.manager.execute()
+            self.manager.db_cleanup()
+            return 0
+        except Exception, e:
+            root.exception('Execution failed: %s' % e)
+            return 1
+        finally:
+            self.manager.options = old_options
+            sys.stdout, sys.stderr = old_stdout, old_stderr
+            root.removeHandler(handler)
+            root.setLevel(old_level)
+
+    def handle(self, conn):
+        import logging
+        log = logging.getLogger('daemon')
+
+        argv = _recv_all(conn)
+        argv = argv.split('\0') if argv else []
+        output = conn.makefile('wb', 0)
+        options, reason = self.parse(argv)
+        if options is None:
+            log.verbose('Request to run `%s` locally: %s' % (' '.join(argv), reason))
+            output.write('LOCAL %s\n' % reason)
+            return
+        log.verbose('Executing `%s`' % ' '.join(argv))
+        output.write('OK\n')
+        status = self.execute(options, output)
+        output.write('%s%d' % (END, status))
+
+    def serve(self):
+        """Accept executions until interrupted."""
+        import logging
+        log = logging.getLogger('daemon')
+
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(self.path):
+            # stale socket, daemon already running would have prevented us from acquiring the lock
+            os.remove(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        os.chmod(self.path, 0600)
+        self.server.listen(5)
+        log.info('Daemon listening on %s' % self.path)
+        if self.manager.options.watch_fs:
+            from flexget.utils import fs_watch
+            fs_watch.enable()
+        # let finally clauses clean up when terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            while True:
+                try:
+                    conn = self.server.accept()[0]
+                except socket.error, e:
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                try:
+                    self.handle(conn)
+                except socket.error, e:
+                    log.warning('Client disconnected: %s' % e)
+                finally:
+                    conn.close()
+        finally:
+            self.server.close()
+            os.remove(self.path)
+            log.info('Daemon stopped')
@@ -1,8 +1,10 @@
 from exceptions import Exception, UnicodeDecodeError, TypeError, KeyError
 import logging
 import copy
+from flexget.logger import TRACE
 from flexget.plugin import PluginError
 from flexget.utils.imdb import extract_id, make_url
+from flexget.utils.tools import is_immutable
 from flexget.utils.template import render_from_entry
 
 log = logging.getLogger('entry')
@@ -33,10 +35,18 @@ class LazyField(object):
         self.entry = entry
         self.field = field
         self.funcs = [func]
+        # func -> LazyBatch, for functions registered with a batch
+        self.batches = None
 
     def __call__(self):
         # Return a result from the first lookup function which succeeds
         for func in self.funcs[:]:
+            if self.batches and func in self.batches:
+                # resolve all pending entries of the batch at once, see if it took care of this entry
+                self.batches[func].resolve()
+                value = dict.get(self.entry, self.field)
+                if value is not self:
+                    return value
             result = func(self.entry, self.field)
             if result is not None:
                 return result
@@ -51,6 +61,67 @@ class LazyField(object):
         return unicode(self())
 
 
+def _set_url(entry, value):
+    if not isinstance(value, basestring):
+        raise PluginError('Tried to set %r url to %r' % (entry.get('title'), value))
+    if not 'original_url' in entry:
+        entry['original_url'] = value
+    return value
+
+
+def _set_title(entry, value):
+    if not isinstance(value, basestring):
+        raise PluginError('Tried to set title to %r' % value)
+    return value
+
+
+def _set_imdb_url(entry, value):
+    # TODO: HACK! Implement via plugin once #348 (entry events) is implemented
+    # enforces imdb_url in same format
+    if isinstance(value, basestring):
+        imdb_id = extract_id(value)
+        if imdb_id:
+            value = make_url(imdb_id)
+        else:
+            log.debug('Tried to set imdb_id to invalid imdb url: %s' % value)
+            value = None
+    return value
+
+# Fields requiring special handling when set, field name -> function(entry, value) returning the value to be set
+FIELD_SETTERS = {'url': _set_url, 'title': _set_title, 'imdb_url': _set_imdb_url}
+
+
+class LazyBatch(object):
+    """
+    Groups lazy field lookups of many entries (ie. all entries in a feed) so that they can be resolved in bulk.
+
+    When a lazy field registered with a batch is evaluated for the first time on any entry, *bulk_func* is called
+    with all entries registered to the batch so far. It should populate fields of every entry it can
+    (eg. using a single database query), entries left lazy are looked up individually when accessed.
+    """
+
+    def __init__(self, bulk_func):
+        self.bulk_func = bulk_func
+        self.pending = []
+
+    def add(self, entry):
+        self.pending.append(entry)
+
+    def resolve(self):
+        if not self.pending:
+            return
+        # entries registering several fields to the batch are added more than once
+        seen = set()
+        pending = []
+        for entry in self.pending:
+            if id(entry) not in seen:
+                seen.add(id(entry))
+                pending.append(entry)
+        self.pending = []
+        log.debug('resolving %s lazy entries in bulk' % len(pending))
+        self.bulk_func(pending)
+
+
 class Entry(dict):
     """
     Represents one item in feed. Must have `url` and *title* fields.
@@ -65,9 +136,14 @@ class Entry(dict):
     and trigger :meth:`~flexget.feed.Feed.abort`.
     """
 
+    # no per instance __dict__, trace and snapshots are allocated on first use
+    __slots__ = ('_trace', '_snapshots', '_shared')
+
     def __init__(self, *args, **kwargs):
-        self.trace = []
-        self.snapshots = {}
+        self._trace = None
+        self._snapshots = None
+        # mutable fields whose values are shared with snapshots or borrowed, field -> True if borrowed
+        self._shared = None
 
         if len(args) == 2:
             kwargs['title'] = args[0]
@@ -77,6 +153,77 @@ class Entry(dict):
         # Make sure constructor does not escape our __setitem__ enforcement
         self.update(*args, **kwargs)
 
+    def _get_trace(self):
+        if self._trace is None:
+            self._trace = []
+        return self._trace
+
+    def _set_trace(self, value):
+        self._trace = value
+
+    trace = property(_get_trace, _set_trace, doc='List of (plugin, message) tuples')
+
+    def _get_snapshots(self):
+        if self._snapshots is None:
+            self._snapshots = {}
+        return self._snapshots
+
+    def _set_snapshots(self, value):
+        self._snapshots = value
+
+    snapshots = property(_get_snapshots, _set_snapshots, doc='Dict of snapshots taken with :meth:`take_snapshot`')
+
+    def __reduce_ex__(self, protocol):
+        # construct through __init__ so that slots are initialized before items are restored
+        return type(self), (), self.__getstate__(), None, self.iteritems()
+
+    def __getstate__(self):
+        self._detach_all()
+        return self._trace, self._snapshots
+
+    def __setstate__(self, state):
+        self._trace, self._snapshots = state
+        self._shared = None
+
+    def _borrow(self, key, value):
+        """
+        Sets a mutable field value owned by someone else (ie. a cache) without copying it. The entry gets its own copy
+        only when the value is accessed, see :meth:`_detach`.
+        """
+        if self._shared is None:
+            self._shared = {}
+        self._shared[key] = True
+        dict.__setitem__(self, key, value)
+
+    def _detach(self, key):
+        """
+        Gives snapshots their own copy of a shared mutable field value, before it can be mutated through the entry.
+        A borrowed value is copied for the entry instead, snapshots taken meanwhile may keep the original.
+        """
+        borrowed = self._shared.pop(key)
+        value = dict.get(self, key)
+        if borrowed:
+            dict.__setitem__(self, key, copy.deepcopy(value))
+            return
+        snapshot_copy = None
+        for name, snapshot in self._snapshots.iteritems():
+            if key not in snapshot or snapshot[key] is not value:
+                continue
+            if snapshot_copy is None:
+                try:
+                    snapshot_copy = copy.deepcopy(value)
+                except TypeError:
+                    log.warning('Unable to take `%s` snapshot for field `%s` in `%s`' %
+                                (name, key, dict.get(self, 'title')))
+                    del snapshot[key]
+                    continue
+            snapshot[key] = snapshot_copy
+
+    def _detach_all(self):
+        if self._shared:
+            for key in list(self._shared):
+                self._detach(key)
+
     def __setitem__(self, key, value):
         # Enforce unicode compatibility. Check for all subclasses of basestring, so that NavigableStrings are also cast
         if isinstance(value, basestring) and not type(value) == unicode:
@@ -85,35 +232,26 @@ class Entry(dict):
             except UnicodeDecodeError:
                 raise EntryUnicodeError(key, value)
 
-        # url and original_url handling
-        if key == 'url':
-            if not isinstance(value, basestring):
-                raise PluginError('Tried to set %r url to %r' % (self.get('title'), value))
-            if not 'original_url' in self:
-                self['original_url'] = value
-
-        # title handling
-        if key == 'title':
-            if not isinstance(value, basestring):
-                raise PluginError('Tried to set title to %r' % value)
-
-        # TODO: HACK! Implement via plugin once #348 (entry events) is implemented
-        # enforces imdb_url in same format
-        if key == 'imdb_url' and isinstance(value, basestring):
-            imdb_id = extract_id(value)
-            if imdb_id:
-                value = make_url(imdb_id)
-            else:
-                log.debug('Tried to set imdb_id to invalid imdb url: %s' % value)
-                value = None
+        setter = FIELD_SETTERS.get(key)
+        if setter is not None:
+            value = setter(self, value)
 
-        try:
-            log.trace('ENTRY SET: %s = %r' % (key, value))
-        except Exception, e:
-            log.debug('trying to debug key `%s` value threw exception: %s' % (key, e))
+        if log.isEnabledFor(TRACE):
+            try:
+                log.trace('ENTRY SET: %s = %r' % (key, value))
+            except Exception, e:
+                log.debug('trying to debug key `%s` value threw exception: %s' % (key, e))
 
+        if self._shared:
+            # snapshot keeps the old value
+            self._shared.pop(key, None)
         dict.__setitem__(self, key, value)
 
+    def __delitem__(self, key):
+        if self._shared:
+            self._shared.pop(key, None)
+        dict.__delitem__(self, key)
+
     def update(self, *args, **kwargs):
         """Overridden so our __setitem__ is not avoided."""
         if args:
@@ -126,16 +264,21 @@ class Entry(dict):
             self[key] = kwargs[key]
 
     def setdefault(self, key, value=None):
-        """Overridden so our __setitem__ is not avoided."""
+        """Overridden so our __setitem__ is not avoided, and snapshots get their own copy of the returned value."""
+        if self._shared and key in self._shared:
+            self._detach(key)
         if key not in self:
             self[key] = value
         return self[key]
 
     def __getitem__(self, key):
         """Supports lazy loading of fields. If a stored value is a :class:`LazyField`, call it, return the result."""
+        if self._shared and key in self._shared:
+            self._detach(key)
         result = dict.__getitem__(self, key)
         if isinstance(result, LazyField):
-            log.trace('evaluating lazy field %s' % key)
+            if log.isEnabledFor(TRACE):
+                log.trace('evaluating lazy field %s' % key)
             return result()
         else:
             return result
@@ -164,7 +307,7 @@ class Entry(dict):
         """Will cause lazy field lookup to occur and will return false if a field exists but is None."""
         return self.get(key) is not None
 
-    def register_lazy_fields(self, fields, func):
+    def register_lazy_fields(self, fields, func, batch=None):
         """Register a list of fields to be lazily loaded by callback func.
 
         :param fields:
@@ -173,14 +316,28 @@ class Entry(dict):
           Callback function which is called when lazy field needs to be evaluated.
           Function call will get params (entry, field).
           See :class:`LazyField` class for more details.
+        :param batch:
+          Optional :class:`LazyBatch`, which is resolved before *func* is called.
         """
+        registered = False
         for field in fields:
             if self.is_lazy(field):
                 # If the field is already a lazy field, append this function to it's list of functions
-                dict.get(self, field).funcs.append(func)
+                lazy = dict.get(self, field)
+                lazy.funcs.append(func)
             elif not self.get(field, eval_lazy=False):
                 # If it is not a lazy field, and isn't already populated, make it a lazy field
-                self[field] = LazyField(self, field, func)
+                lazy = LazyField(self, field, func)
+                self[field] = lazy
+            else:
+                continue
+            registered = True
+            if batch is not None:
+                if lazy.batches is None:
+                    lazy.batches = {}
+                lazy.batches[func] = batch
+        if registered and batch is not None:
+            batch.add(self)
 
     def unregister_lazy_fields(self, fields, func):
         """
@@ -230,18 +387,53 @@ class Entry(dict):
     def take_snapshot(self, name):
         """
         Takes a snapshot of the entry under *name*. Snapshots can be accessed via :attr:`.snapshots`.
+        Values are shared with the entry, mutable values are copied into the snapshot only once they are accessed
+        (and possibly mutated) through the entry.
+
         :param string name: Snapshot name
         """
-        snapshot = {}
-        for field, value in self.iteritems():
-            try:
-                snapshot[field] = copy.deepcopy(value)
-            except TypeError:
-                log.warning('Unable to take `%s` snapshot for field `%s` in `%s`' % (name, field, self['title']))
-        if snapshot:
-            if name in self.snapshots:
-                log.warning('Snapshot `%s` is being overwritten for `%s`' % (name, self['title']))
-            self.snapshots[name] = snapshot
+        snapshot = dict(dict.iteritems(self))
+        if not snapshot:
+            return
+        if self._snapshots and name in self._snapshots:
+            log.warning('Snapshot `%s` is being overwritten for `%s`' % (name, self['title']))
+        for field, value in snapshot.iteritems():
+            if not is_immutable(value) and not isinstance(value, LazyField):
+                if self._shared is None:
+                    self._shared = {}
+                self._shared.setdefault(field, False)
+        self.snapshots[name] = snapshot
+
+    # dict methods exposing values, which could then be mutated
+
+    def items(self):
+        self._detach_all()
+        return dict.items(self)
+
+    def iteritems(self):
+        self._detach_all()
+        return dict.iteritems(self)
+
+    def values(self):
+        self._detach_all()
+        return dict.values(self)
+
+    def itervalues(self):
+        self._detach_all()
+        return dict.itervalues(self)
+
+    def pop(self, key, *args):
+        if self._shared and key in self._shared:
+            self._detach(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self._detach_all()
+        return dict.popitem(self)
+
+    def copy(self):
+        self._detach_all()
+        return dict.copy(self)
 
     def update_using_map(self, field_map, source_item):
         """
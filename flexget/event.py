@@ -11,11 +11,23 @@ _events = {}
 class Event(object):
     """Represents one registered event."""
 
+    # incremented whenever priority of any event changes, allows caching sorted events
+    priority_version = 0
+
     def __init__(self, name, func, priority=128):
         self.name = name
         self.func = func
         self.priority = priority
 
+    def _get_priority(self):
+        return self._priority
+
+    def _set_priority(self, value):
+        self._priority = value
+        Event.priority_version += 1
+
+    priority = property(_get_priority, _set_priority)
+
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
@@ -1,18 +1,25 @@
 import logging
 import copy
 import hashlib
+import threading
 from flexget import validator
 from flexget.manager import Session, register_config_key
 from flexget.plugin import get_plugins_by_phase, get_plugin_by_name, \
     feed_phases, PluginWarning, PluginError, DependencyError, plugins as all_plugins
 from flexget.utils.simple_persistence import SimpleFeedPersistence
 import flexget.utils.requests as requests
-from flexget.event import fire_event
+from flexget.event import Event, fire_event
 from flexget.entry import Entry, EntryUnicodeError
 from functools import wraps
 
 log = logging.getLogger('feed')
 
+# plugin name -> (PluginInfo, validator tree), trees are built once and reused
+_validators = {}
+_validators_lock = threading.Lock()
+# feed name -> md5 hash of its config which has passed validation, only latest config of each feed is remembered
+_valid_configs = {}
+
 
 def useFeedLogging(func):
 
@@ -36,6 +43,12 @@ class Feed(object):
 
     **Fires events:**
 
+    * feed.execute.started
+
+      Before the first phase of feed execution is ran
+
+      ``parameters: feed``
+
     * feed.execute.before_plugin
 
       Before a plugin is about to be executed. Note that since this will also include all
@@ -77,6 +90,10 @@ class Feed(object):
 
         # This should not be used until after process_start, when it is evaluated
         self.config_modified = None
+        self.config_hash = None
+
+        # phase -> (key, plan), see :meth:`plan`
+        self._plans = {}
 
         # use reset to init variables when creating
         self._reset()
@@ -266,10 +283,29 @@ class Feed(object):
           An iterator over configured :class:`flexget.plugin.PluginInfo` instances enabled on this feed.
         """
         if phase:
-            plugins = sorted(get_plugins_by_phase(phase), key=lambda p: p.phase_handlers[phase], reverse=True)
-        else:
-            plugins = all_plugins.itervalues()
-        return (p for p in plugins if p.name in self.config or p.builtin)
+            # builtin status and config are re-checked while iterating, plugins may disable others during execution
+            return (p for p, configured in self.plan(phase)
+                    if (configured and p.name in self.config) or p.builtin)
+        return (p for p in all_plugins.itervalues() if p.name in self.config or p.builtin)
+
+    def plan(self, phase):
+        """Get the dispatch plan for *phase*.
+
+        Plan is computed once and reused until configured plugin keywords, names of registered plugins, phases or
+        plugin priorities change.
+
+        :param string phase: Name of the phase
+        :return: Tuple of (:class:`flexget.plugin.PluginInfo`, configured) for all plugins handling the phase,
+          sorted in phase order. Configured is True if plugin keyword is present in feed config.
+        """
+        key = (frozenset(self.config), frozenset(all_plugins), len(feed_phases), Event.priority_version)
+        cached = self._plans.get(phase)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        plugins = sorted(get_plugins_by_phase(phase), key=lambda p: p.phase_handlers[phase], reverse=True)
+        plan = tuple((p, p.name in key[0]) for p in plugins)
+        self._plans[phase] = (key, plan)
+        return plan
 
     def __run_feed_phase(self, phase):
         """Executes feed phase, ie. call all enabled plugins on the feed.
@@ -421,6 +457,7 @@ class Feed(object):
         self.session = Session()
 
         try:
+            fire_event('feed.execute.started', self)
             # run phases
             for phase in feed_phases:
                 if phase in self.disabled_phases:
@@ -461,11 +498,17 @@ class Feed(object):
         """Execute process_start phase"""
         self.__run_feed_phase('process_start')
         config_hash = hashlib.md5(str(self.config.items())).hexdigest()
+        self.config_hash = config_hash
         if self.simple_persistence.get('feed_config_hash') != config_hash:
             self.config_modified = True
             self.simple_persistence['feed_config_hash'] = config_hash
         else:
             self.config_modified = False
+        if self.config_modified:
+            self._plans = {}
+        # compute plans for all phases now, plugins configured during process_start (eg. presets) are included
+        for phase in feed_phases + ['accept', 'reject', 'fail', 'abort', 'process_end']:
+            self.plan(phase)
 
     def _process_end(self):
         """Execute terminate phase for this feed"""
@@ -475,8 +518,18 @@ class Feed(object):
         self.__run_feed_phase('process_end')
 
     def validate(self):
-        """Called during feed execution. Validates config, prints errors and aborts feed if invalid."""
+        """Called during feed execution. Validates config, prints errors and aborts feed if invalid.
+
+        Configs which have passed validation already (by hash computed on process_start) are not validated again,
+        unless --check is used.
+        """
+        if self.config_hash and _valid_configs.get(self.name) == self.config_hash and \
+                not self.manager.options.validate:
+            log.debug('config has been validated already')
+            return []
         errors = self.validate_config(self.config)
+        if not errors and self.config_hash:
+            _valid_configs[self.name] = self.config_hash
         # log errors and abort
         if errors:
             log.critical('Feed \'%s\' has configuration errors:' % self.name)
@@ -504,18 +557,29 @@ class Feed(object):
                 validate_errors.append('Unknown plugin \'%s\'' % keyword)
                 continue
             if hasattr(plugin.instance, 'validator'):
+                cached = _validators.get(keyword)
+                if cached and cached[0] is plugin:
+                    validator = cached[1]
+                else:
+                    try:
+                        validator = plugin.instance.validator()
+                    except TypeError, e:
+                        log.critical('Invalid validator method in plugin %s' % keyword)
+                        log.exception(e)
+                        continue
+                    if not validator.name == 'root':
+                        # if validator is not root type, add root validator as it's parent
+                        validator = validator.add_root_parent()
+                    _validators[keyword] = (plugin, validator)
+                # trees are shared, webui may validate at the same time with feed execution
+                _validators_lock.acquire()
                 try:
-                    validator = plugin.instance.validator()
-                except TypeError, e:
-                    log.critical('Invalid validator method in plugin %s' % keyword)
-                    log.exception(e)
-                    continue
-                if not validator.name == 'root':
-                    # if validator is not root type, add root validator as it's parent
-                    validator = validator.add_root_parent()
-                if not validator.validate(config[keyword]):
-                    for msg in validator.errors.messages:
-                        validate_errors.append('%s %s' % (keyword, msg))
+                    validator.reset_errors()
+                    if not validator.validate(config[keyword]):
+                        for msg in validator.errors.messages:
+                            validate_errors.append('%s %s' % (keyword, msg))
+                finally:
+                    _validators_lock.release()
             else:
                 log.warning('Used plugin %s does not support validating. Please notify author!' % keyword)
 
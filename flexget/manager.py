@@ -1,16 +1,20 @@
+from __future__ import with_statement
 import os
 import sys
 import shutil
 import logging
 import yaml
 import atexit
+from copy import deepcopy
 from datetime import datetime, timedelta
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.pool import SingletonThreadPool
-from flexget.event import fire_event
+from flexget.event import fire_event, event
 from flexget import validator
+from flexget import plugin
+from flexget.utils.startup_profile import timed
 
 log = logging.getLogger('manager')
 
@@ -38,6 +42,15 @@ def register_config_key(key, validator, required=False):
     _config_validator.accept(validator, key=key, required=required)
 
 
+@event('plugins.lazy_loaded')
+def lazy_plugins_loaded(modules):
+    """Create tables and run schema upgrades for plugin modules imported after database was initialized."""
+    # when the schema is unchanged the stored fingerprint already covers every module in the manifest
+    if manager and manager.engine and manager.db_schema_changed:
+        Base.metadata.create_all(bind=manager.engine)
+        fire_event('manager.upgrade', manager)
+
+
 def useExecLogging(func):
 
     def wrapper(self, *args, **kw):
@@ -67,6 +80,11 @@ class Manager(object):
 
       Upgrade plugin database schemas etc
 
+    * manager.create_feeds
+
+      Before feed instances are created, handlers may remove names from the passed list of feed names to leave
+      those feeds out of this run entirely
+
     * manager.execute.started
 
       When execute is about the be started, this happens before any feed phases occur
@@ -94,10 +112,14 @@ class Manager(object):
         self.options = options
         self.config_base = None
         self.config_name = None
+        self.config_path = None
         self.db_filename = None
         self.engine = None
         self.lockfile = None
         self.database_uri = None
+        # False when database schema is known to match the code and checking it was skipped
+        self.db_schema_changed = True
+        self.db_upgrade_failed = False
 
         self.config = {}
         self.feeds = {}
@@ -112,9 +134,17 @@ class Manager(object):
         log.debug('sys.getfilesystemencoding: %s' % sys.getfilesystemencoding())
         log.debug('os.path.supports_unicode_filenames: %s' % os.path.supports_unicode_filenames)
 
-        fire_event('manager.upgrade', self)
-        fire_event('manager.startup', self)
-        self.db_cleanup()
+        if self.db_schema_changed:
+            with timed('step', 'manager.upgrade'):
+                fire_event('manager.upgrade', self)
+            from flexget import schema
+            # a version that changed during this pass is stored only once the next start verifies it
+            if not self.db_upgrade_failed and not schema.versions_changed:
+                schema.set_fingerprint(self.engine, schema.fingerprint())
+        with timed('step', 'manager.startup'):
+            fire_event('manager.startup', self)
+        with timed('step', 'db_cleanup'):
+            self.db_cleanup()
 
     def __del__(self):
         global manager
@@ -122,16 +152,21 @@ class Manager(object):
 
     def initialize(self):
         """Separated from __init__ so that unit tests can modify options before loading config."""
-        self.setup_yaml()
-        self.find_config()
+        with timed('step', 'setup_yaml'):
+            self.setup_yaml()
+        with timed('step', 'find_config'):
+            self.find_config()
         self.acquire_lock()
-        self.init_sqlalchemy()
-        errors = self.validate_config()
+        with timed('step', 'init_sqlalchemy'):
+            self.init_sqlalchemy()
+        with timed('step', 'validate_config'):
+            errors = self.validate_config()
         if errors:
             for error in errors:
                 log.critical(error)
             return
-        self.create_feeds()
+        with timed('step', 'create_feeds'):
+            self.create_feeds()
 
     def setup_yaml(self):
         """ Set up the yaml loader to return unicode objects for strings by default
@@ -162,40 +197,11 @@ class Manager(object):
 
     def find_config(self):
         """Find the configuration file and then call :meth:`.load_config` to load it"""
-        startup_path = os.path.dirname(os.path.abspath(sys.path[0]))
-        home_path = os.path.join(os.path.expanduser('~'), '.flexget')
-        current_path = os.getcwd()
-        exec_path = sys.path[0]
-
-        config_path = os.path.dirname(self.options.config)
-        path_given = config_path != ''
-
-        possible = []
-        if path_given:
-            # explicit path given, don't try anything too fancy
-            possible.append(self.options.config)
-        else:
-            log.debug('Figuring out config load paths')
-            # normal lookup locations
-            possible.append(startup_path)
-            possible.append(home_path)
-            if sys.platform.startswith('win'):
-                # On windows look in ~/flexget as well, as explorer does not let you create a folder starting with a dot
-                possible.append(os.path.join(os.path.expanduser('~'), 'flexget'))
-            else:
-                # The freedesktop.org standard config location
-                xdg_config = os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config'))
-                possible.append(os.path.join(xdg_config, 'flexget'))
-            # for virtualenv / dev sandbox
-            from flexget import __version__ as version
-            if version == '{subversion}':
-                log.debug('Running subversion, adding virtualenv / sandbox paths')
-                possible.append(os.path.join(exec_path, '..'))
-                possible.append(current_path)
-                possible.append(exec_path)
-
-        for path in possible:
-            config = os.path.join(path, self.options.config)
+        # the daemon client looks for the config the same way, without loading a manager
+        from flexget.daemon import config_locations
+
+        possible = config_locations(self.options.config)
+        for config in possible:
             if os.path.exists(config):
                 log.debug('Found config: %s' % config)
                 self.load_config(config)
@@ -257,11 +263,14 @@ class Manager(object):
             sys.exit(1)
 
         # config loaded successfully
+        self.config_path = config
         self.config_name = os.path.splitext(os.path.basename(config))[0]
         self.config_base = os.path.normpath(os.path.dirname(config))
         self.lockfile = os.path.join(self.config_base, '.%s-lock' % self.config_name)
         log.debug('config_name: %s' % self.config_name)
         log.debug('config_base: %s' % self.config_base)
+        # import plugin modules used in config when plugins were loaded lazily
+        plugin.load_plugins_for_config(self.config, self.options)
 
     def save_config(self):
         """Dumps current config to yaml config file"""
@@ -406,7 +415,7 @@ class Manager(object):
         # fire up the engine
         log.debug('Connecting to: %s' % self.database_uri)
         try:
-            self.engine = sqlalchemy.create_engine(self.database_uri,
+            engine = sqlalchemy.create_engine(self.database_uri,
                                                    echo=self.options.debug_sql,
                                                    poolclass=SingletonThreadPool)
         except ImportError:
@@ -415,19 +424,34 @@ class Manager(object):
             'If you\'re running correct version of Python then it is not equipped with SQLite.\n'
             'You can try installing `pysqlite`. If you have compiled python yourself, recompile it with SQLite support.')
             sys.exit(1)
-        Session.configure(bind=self.engine)
+        Session.configure(bind=engine)
         # create all tables, doesn't do anything to existing tables
         from sqlalchemy.exc import OperationalError
+        from flexget import schema, plugin
         try:
+            stored = schema.get_fingerprint(engine)
             if self.options.reset or self.options.del_db:
-                Base.metadata.drop_all(bind=self.engine)
-            Base.metadata.create_all(bind=self.engine)
+                Base.metadata.drop_all(bind=engine)
+            elif not self.options.db_verify and stored == schema.fingerprint():
+                # tables and schema versions were verified earlier with the same code, skip probing them
+                log.debug('Database schema is unchanged, skipping table creation and schema upgrades')
+                self.db_schema_changed = False
+            if self.db_schema_changed:
+                if stored is not None:
+                    # the stored fingerprint covers lazily loaded modules too, so they are created and upgraded now.
+                    # self.engine is set afterwards so that lazy_plugins_loaded leaves this to us.
+                    with timed('step', 'load_all_plugins'):
+                        plugin.load_all_plugins()
+                schema.versions_changed = False
+                with timed('step', 'create_all'):
+                    Base.metadata.create_all(bind=engine)
         except OperationalError, e:
             if os.path.exists(self.db_filename):
                 print >> sys.stderr, '%s - make sure you have write permissions to file %s' % (e.message, self.db_filename)
             else:
                 print >> sys.stderr, '%s - make sure you have write permissions to directory %s' % (e.message, self.config_base)
             raise Exception(e.message)
+        self.engine = engine
 
     def check_lock(self):
         """Checks if there is already a lock, returns True if there is."""
@@ -476,6 +500,7 @@ class Manager(object):
 
         # construct feed list
         feeds = self.config.get('feeds', {}).keys()
+        fire_event('manager.create_feeds', self, feeds)
         for name in feeds:
             # create feed
             feed = Feed(self, name, self.config['feeds'][name])
@@ -484,6 +509,34 @@ class Manager(object):
                 feed.enabled = False
             self.feeds[name] = feed
 
+    def update_feeds(self):
+        """Updates instances of all configured feeds from config, for long running processes executing many times"""
+        from flexget.feed import Feed
+
+        if not isinstance(self.config['feeds'], dict):
+            log.critical('Feeds is in wrong datatype, please read configuration guides')
+            return
+
+        # construct feed list
+        for name in self.config.get('feeds', {}):
+            if not isinstance(self.config['feeds'][name], dict):
+                continue
+            if name in self.feeds:
+                # This feed already has an instance, update it
+                self.feeds[name].config = deepcopy(self.config['feeds'][name])
+                if not name.startswith('_'):
+                    self.feeds[name].enabled = True
+            else:
+                # Create feed
+                feed = Feed(self, name, deepcopy(self.config['feeds'][name]))
+                # If feed name is prefixed with _ it's disabled
+                if name.startswith('_'):
+                    feed.enabled = False
+                self.feeds[name] = feed
+        # Delete any feed instances that are no longer in the config
+        for name in [n for n in self.feeds if n not in self.config['feeds']]:
+            del self.feeds[name]
+
     def disable_feeds(self):
         """Disables all feeds."""
         for feed in self.feeds.itervalues():
@@ -596,6 +649,8 @@ class Manager(object):
         if (self.options.db_cleanup or not self.persist.get('last_cleanup') or
             self.persist['last_cleanup'] < datetime.now() - DB_CLEANUP_INTERVAL):
             log.info('Running database cleanup.')
+            # plugins clean up their tables, even if they are not in use at the moment
+            plugin.load_all_plugins()
             session = Session()
             fire_event('manager.db_cleanup', session)
             session.commit()
@@ -37,6 +37,9 @@ class OptionParser(OptParser):
         self.add_option('--del-db', action='store_true', dest='del_db', default=False,
                         help=SUPPRESS_HELP)
         self.add_option('--profile', action='store_true', dest='profile', default=False, help=SUPPRESS_HELP)
+        self.add_option('--watch-fs', action='store_true', dest='watch_fs', default=False,
+                        help='Keep track of directories used by find and exists plugins with inotify while running as '
+                             'daemon or webui, instead of scanning them on every execution. Linux only.')
 
     def _debug_callback(self, option, opt, value, parser):
         setattr(parser.values, option.dest, 1)
@@ -76,6 +79,19 @@ class CoreOptionParser(OptionParser):
                         help='Disables stdout and stderr output, log file used. Reduces logging level slightly.')
         self.add_option('--db-cleanup', action='store_true', dest='db_cleanup', default=False,
                         help='Forces the database cleanup event to run right now.')
+        self.add_option('--db-verify', action='store_true', dest='db_verify', default=False,
+                        help='Check database tables and schema versions even if the schema has not changed.')
+        # checked from sys.argv already when flexget is imported, profiling needs to start before option parsing
+        self.add_option('--profile-startup', action='store_true', dest='profile_startup', default=False,
+                        help='Print report of time spent in imports, plugin registrations and other startup steps.')
+        self.add_option('--profile-startup-trace', action='store', dest='profile_startup_trace', metavar='FILE',
+                        help='Write startup profile as JSON to FILE, eg. for comparing startup between versions.')
+
+        self.add_option('--daemon', action='store_true', dest='run_daemon', default=False,
+                        help='Keep running and execute feeds when requested by other FlexGet runs with the same '
+                             'config, see --no-daemon.')
+        self.add_option('--no-daemon', action='store_true', dest='no_daemon', default=False,
+                        help='Execute in this process even if a daemon is running.')
 
         # Plugins should respect this flag and retry where appropriate
         self.add_option('--retry', action='store_true', dest='retry', default=0, help=SUPPRESS_HELP)
@@ -8,13 +8,14 @@ import re
 import logging
 import time
 from requests import RequestException
-from event import add_event_handler as add_phase_handler
+from event import add_event_handler as add_phase_handler, fire_event, _events
+from flexget.utils import startup_profile
 
 log = logging.getLogger('plugin')
 
 __all__ = ['PluginWarning', 'PluginError', 'register_plugin', 'register_parser_option', 'register_feed_phase',
            'get_plugin_by_name', 'get_plugins_by_group', 'get_plugin_keywords', 'get_plugins_by_phase',
-           'get_phases_by_plugin', 'internet', 'priority']
+           'get_phases_by_plugin', 'load_plugins_for_config', 'load_all_plugins', 'internet', 'priority']
 
 
 class DependencyError(Exception):
@@ -186,9 +187,26 @@ _loaded_plugins = {}
 _plugin_options = []
 _new_phase_queue = {}
 
+# Plugin manifest, allows importing only the plugin modules that are actually used
+MANIFEST_VERSION = 2
+# Events plugin modules may register without having to be imported at startup
+LAZY_EVENTS = ['manager.upgrade', 'manager.db_cleanup']
+
+# Records of imported modules while building the manifest, None when not building
+_manifest_records = None
+# Modules known from the manifest but not imported yet, mapping of module name to its record
+_lazy_modules = {}
+# Plugin name -> name of the not yet imported module registering it
+_lazy_plugins = {}
+# Parser options added from the manifest
+_manifest_options = set()
+
 
 def register_parser_option(*args, **kwargs):
     """Adds a parser option to the global parser."""
+    if args in _manifest_options:
+        # already added from the plugin manifest
+        return
     if _parser is None:
         import warnings
         warnings.warn('register_parser_option called before it can be')
@@ -294,6 +312,7 @@ class PluginInfo(dict):
         :api_ver: Signature of callback hooks (1=feed; 2=feed,config).
         """
         dict.__init__(self)
+        started = time.time()
 
         if groups is None:
             groups = []
@@ -331,6 +350,7 @@ class PluginInfo(dict):
         else:
             self.build_phase_handlers()
             plugins[self.name] = self
+        startup_profile.record('register', self.name, time.time() - started)
 
     def reset_phase_handlers(self):
         """Temporary utility method"""
@@ -443,9 +463,12 @@ def get_standard_plugins_path():
     return path
 
 
-def load_plugins_from_dirs(dirs):
+def _plugin_dirs(dirs):
     """
+    Set up plugin package load paths.
+
     :param list dirs: Directories from where plugins are loaded from
+    :return: List of (basepath, subpkg) tuples where to look for plugin modules
     """
 
     # add all dirs to plugins_pkg load path so that plugins are loaded from flexget and from ~/.flexget/plugins/
@@ -472,26 +495,36 @@ def load_plugins_from_dirs(dirs):
             log.debug('removing defunct plugin_package %s' % subpkg)
             plugin_packages.remove(subpkg)
 
-    # actually load plugins from directories
+    result = []
     for dir in dirs:
         if not dir:
             continue
         if os.path.isdir(dir):
-            log.debug('Looking for plugins in %s', dir)
-            load_plugins_from_dir(dir)
-
+            result.append((dir, None))
             # Also look in sub-packages named like the feed phases, plus "generic"
             for subpkg in plugin_packages:
-                subpath = os.path.join(dir, subpkg)
-                if os.path.isdir(subpath):
-                    # Only log existing subdirs
-                    log.debug("Looking for sub-plugins in '%s'", subpath)
-                    load_plugins_from_dir(dir, subpkg)
+                if os.path.isdir(os.path.join(dir, subpkg)):
+                    result.append((dir, subpkg))
         else:
             log.debug('Ignoring non-existing plugin directory %s', dir)
+    return result
 
 
-def load_plugins_from_dir(basepath, subpkg=None):
+def load_plugins_from_dirs(dirs):
+    """
+    :param list dirs: Directories from where plugins are loaded from
+    """
+    for basepath, subpkg in _plugin_dirs(dirs):
+        if subpkg:
+            # Only log existing subdirs
+            log.debug("Looking for sub-plugins in '%s'", os.path.join(basepath, subpkg))
+        else:
+            log.debug('Looking for plugins in %s', basepath)
+        load_plugins_from_dir(basepath, subpkg)
+
+
+def _find_plugin_modules(basepath, subpkg=None):
+    """Return names of new plugin modules found from directory, in load order."""
     # Get the list of valid python suffixes for plugins
     # this includes .py, .pyc, and .pyo (depending on if we are running -O)
     # but it doesn't include compiled modules (.so, .dll, etc)
@@ -508,8 +541,8 @@ def load_plugins_from_dir(basepath, subpkg=None):
         namespace += subpkg + '.'
         dirpath = os.path.join(dirpath, subpkg)
 
-    found_plugins = set()
-    for filename in os.listdir(dirpath):
+    found_plugins = []
+    for filename in sorted(os.listdir(dirpath)):
         path = os.path.join(dirpath, filename)
         if os.path.isfile(path):
             f_base, ext = os.path.splitext(filename)
@@ -521,40 +554,13 @@ def load_plugins_from_dir(basepath, subpkg=None):
                         namespace + f_base, dirpath, _loaded_plugins[namespace + f_base]))
                 else:
                     _loaded_plugins[namespace + f_base] = path
-                    found_plugins.add(namespace + f_base)
+                    found_plugins.append(namespace + f_base)
+    return found_plugins
 
-    for modulename in found_plugins:
-        try:
-            __import__(modulename, level=0)
-        except DependencyError, e:
-            if e.has_message():
-                msg = e.message
-            else:
-                msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or modulename, e.missing or 'N/A')
-            if not e.silent:
-                log.warning(msg)
-            else:
-                log.debug(msg)
-        except ImportError, e:
-            log.critical('Plugin `%s` failed to import dependencies' % modulename)
-            log.exception(e)
-        except Exception, e:
-            log.critical('Exception while loading plugin %s' % modulename)
-            log.exception(e)
-            raise
-        else:
-            log.trace('Loaded module %s from %s' % (modulename[len(PLUGIN_NAMESPACE) + 1:], dirpath))
-
-            # Auto-register plugins that inherit from plugin base classes,
-            # and weren't already registered manually
-            for obj in vars(sys.modules[modulename]).values():
-                try:
-                    if not issubclass(obj, Plugin):
-                        continue
-                except TypeError:
-                    continue # not a class
-                else:
-                    register(obj, auto=True)
+
+def load_plugins_from_dir(basepath, subpkg=None):
+    for modulename in _find_plugin_modules(basepath, subpkg):
+        _import_plugin_module(modulename)
 
     if _new_phase_queue:
         for phase, args in _new_phase_queue.iteritems():
@@ -562,9 +568,250 @@ def load_plugins_from_dir(basepath, subpkg=None):
                       'point (before, after). Plugin is not working properly.' % (args[0], phase))
 
 
-def load_plugins(parser):
-    """Load plugins from the standard plugin paths."""
-    global plugins_loaded, _parser
+def _registry_state():
+    """Return snapshot of everything plugin modules may register, used to build manifest records."""
+    from flexget.manager import _config_validator
+    from flexget import schema
+    events = dict((name, len(handlers)) for name, handlers in _events.iteritems()
+                  if not name.startswith('plugin.'))
+    return set(plugins), events, len(_plugin_options), len(feed_phases) + len(_new_phase_queue), \
+        len(_config_validator.valid), schema.table_signatures(), schema.schema_versions()
+
+
+def _import_plugin_module(modulename):
+    """Import plugin module and auto-register plugins from it. Return True on success."""
+    if _manifest_records is not None:
+        before = _registry_state()
+    try:
+        __import__(modulename, level=0)
+    except DependencyError, e:
+        if e.has_message():
+            msg = e.message
+        else:
+            msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or modulename, e.missing or 'N/A')
+        if not e.silent:
+            log.warning(msg)
+        else:
+            log.debug(msg)
+        success = False
+    except ImportError, e:
+        log.critical('Plugin `%s` failed to import dependencies' % modulename)
+        log.exception(e)
+        success = False
+    except Exception, e:
+        log.critical('Exception while loading plugin %s' % modulename)
+        log.exception(e)
+        raise
+    else:
+        log.trace('Loaded module %s from %s' % (modulename[len(PLUGIN_NAMESPACE) + 1:],
+                                                os.path.dirname(_loaded_plugins.get(modulename, '?'))))
+
+        # Auto-register plugins that inherit from plugin base classes,
+        # and weren't already registered manually
+        for obj in vars(sys.modules[modulename]).values():
+            try:
+                if not issubclass(obj, Plugin):
+                    continue
+            except TypeError:
+                continue # not a class
+            else:
+                register(obj, auto=True)
+        success = True
+
+    if _manifest_records is not None:
+        _manifest_records.append(_manifest_record(modulename, before, _registry_state(), success))
+    return success
+
+
+def _manifest_record(modulename, before, after, success):
+    """Describe what importing a module registered, by comparing registry states before and after the import.
+
+    Modules imported by another plugin module are attributed to the importing module.
+    """
+    path = _loaded_plugins[modulename]
+    record = {'module': modulename, 'path': path, 'mtime': os.path.getmtime(path), 'plugins': {}, 'options': []}
+    for name in after[0] - before[0]:
+        info = plugins[name]
+        record['plugins'][name] = {'phases': sorted(info.phase_handlers), 'groups': sorted(info.groups),
+                                   'builtin': bool(info.builtin)}
+    # module must be imported at startup if it can't be loaded once it is needed
+    eager = not success or after[3:5] != before[3:5] or \
+        any(plugin['builtin'] for plugin in record['plugins'].itervalues()) or \
+        any(count != before[1].get(name, 0) for name, count in after[1].iteritems() if name not in LAZY_EVENTS)
+    from flexget.utils import json
+    for args, kwargs in _plugin_options[before[2]:after[2]]:
+        try:
+            if json.loads(json.dumps([args, kwargs])) != [list(args), kwargs]:
+                raise ValueError('option changes in serialization')
+        except (TypeError, ValueError):
+            # eg. callback options
+            eager = True
+        else:
+            record['options'].append([args, kwargs])
+    record['eager'] = eager
+    # schema fingerprint covers modules which are not imported
+    record['tables'] = dict((name, table) for name, table in after[5].iteritems() if name not in before[5])
+    record['schemas'] = dict((name, version) for name, version in after[6].iteritems() if name not in before[6])
+    return record
+
+
+def get_manifest_path():
+    return os.path.join(os.path.expanduser('~'), '.flexget', 'plugin_manifest.json')
+
+
+def _save_manifest(dirs):
+    from flexget.utils import json
+    path = get_manifest_path()
+    if not os.path.isdir(os.path.dirname(path)):
+        log.debug('Not saving plugin manifest, %s does not exist' % os.path.dirname(path))
+        return
+    manifest = {'version': MANIFEST_VERSION, 'dirs': dirs, 'modules': _manifest_records}
+    try:
+        manifest_file = open(path, 'w')
+        try:
+            json.dump(manifest, manifest_file)
+        finally:
+            manifest_file.close()
+    except (IOError, OSError), e:
+        log.debug('Failed to save plugin manifest: %s' % e)
+    else:
+        log.debug('Saved plugin manifest %s' % path)
+
+
+def _load_manifest(dirs):
+    """
+    Import plugin modules needed at startup and register rest of the modules for lazy loading.
+
+    :return: False if there is no valid manifest, in which case nothing is loaded
+    """
+    from flexget.utils import json
+    path = get_manifest_path()
+    try:
+        manifest_file = open(path)
+        try:
+            manifest = json.load(manifest_file)
+        finally:
+            manifest_file.close()
+    except (IOError, OSError, ValueError), e:
+        log.debug('Failed to read plugin manifest: %s' % e)
+        return False
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('dirs') != dirs:
+        log.debug('Plugin manifest is outdated')
+        return False
+
+    found = []
+    for basepath, subpkg in _plugin_dirs(dirs):
+        found.extend(_find_plugin_modules(basepath, subpkg))
+    records = manifest['modules']
+    try:
+        valid = [r['module'] for r in records] == found and \
+            all(os.path.getmtime(r['path']) == r['mtime'] for r in records)
+    except OSError:
+        valid = False
+    if not valid:
+        log.debug('Plugin files have changed since plugin manifest was built')
+        # allow finding the modules again while loading normally
+        for modulename in found:
+            del _loaded_plugins[modulename]
+        return False
+
+    for record in records:
+        modulename = str(record['module'])
+        for args, kwargs in record['options']:
+            args = tuple(str(arg) for arg in args)
+            kwargs = dict((str(key), value.encode('utf-8') if isinstance(value, unicode) else value)
+                          for key, value in kwargs.iteritems())
+            if _parser is not None:
+                _parser.add_option(*args, **kwargs)
+            _plugin_options.append((args, kwargs))
+            _manifest_options.add(args)
+        if record['eager']:
+            _import_plugin_module(modulename)
+        else:
+            _lazy_modules[modulename] = record
+            for name in record['plugins']:
+                _lazy_plugins[name] = modulename
+    log.debug('Plugin manifest loaded, %s plugin modules not imported' % len(_lazy_modules))
+    return True
+
+
+def _load_lazy(modulenames):
+    """Import given not yet imported plugin modules."""
+    loaded = []
+    for modulename in sorted(modulenames):
+        record = _lazy_modules.pop(modulename, None)
+        if record is None:
+            continue
+        for name in record['plugins']:
+            _lazy_plugins.pop(name, None)
+        log.debug('Loading plugin module %s' % modulename)
+        if _import_plugin_module(modulename):
+            loaded.append(modulename)
+    if loaded:
+        fire_event('plugins.lazy_loaded', loaded)
+
+
+def load_plugins_for_config(config, options=None):
+    """
+    Import not yet imported plugin modules whose plugins are referred in *config*, either as keys or values, and
+    modules whose parser options are present in *options*.
+
+    Does nothing unless plugins were loaded with the manifest.
+    """
+    if not _lazy_modules:
+        return
+    names = set()
+
+    def walk(item):
+        if isinstance(item, dict):
+            names.update(key for key in item if isinstance(key, basestring))
+            for value in item.itervalues():
+                walk(value)
+        elif isinstance(item, list):
+            for value in item:
+                walk(value)
+        elif isinstance(item, basestring):
+            names.add(item)
+
+    walk(config)
+    modules = set(_lazy_plugins[name] for name in names if name in _lazy_plugins)
+    if options is not None:
+        for modulename, record in _lazy_modules.iteritems():
+            for args, kwargs in record['options']:
+                long_opts = [arg for arg in args if arg.startswith('--')]
+                dest = kwargs.get('dest') or (long_opts and long_opts[0][2:].replace('-', '_'))
+                if dest and getattr(options, dest, None) not in (None, kwargs.get('default')):
+                    modules.add(modulename)
+    _load_lazy(modules)
+
+
+def get_lazy_schemas():
+    """
+    :return: Tuple of table signatures and plugin schema versions defined by plugin modules not imported yet, see
+      :func:`flexget.schema.fingerprint`
+    """
+    tables, versions = {}, {}
+    for record in _lazy_modules.itervalues():
+        tables.update(record['tables'])
+        versions.update(record['schemas'])
+    return tables, versions
+
+
+def load_all_plugins():
+    """Import all plugin modules not imported yet."""
+    _load_lazy(list(_lazy_modules))
+
+
+def load_plugins(parser, lazy=False):
+    """
+    Load plugins from the standard plugin paths.
+
+    :param parser: Option parser where plugins add their options
+    :param bool lazy: Use plugin manifest to import only the modules needed at startup. Rest of the modules are
+      imported when their plugins are used, see :func:`load_plugins_for_config`. Manifest is built when missing or
+      when plugin files have changed.
+    """
+    global plugins_loaded, _parser, _manifest_records
 
     if plugins_loaded:
         if parser is not None:
@@ -578,11 +825,19 @@ def load_plugins(parser):
 
     start_time = time.time()
     _parser = parser
+    dirs = get_standard_plugins_path()
     try:
-        load_plugins_from_dirs(get_standard_plugins_path())
+        if not (lazy and _load_manifest(dirs)):
+            if lazy:
+                _manifest_records = []
+            load_plugins_from_dirs(dirs)
+            if lazy:
+                _save_manifest(dirs)
     finally:
         _parser = None
+        _manifest_records = None
     took = time.time() - start_time
+    startup_profile.record('step', 'load_plugins', took)
     plugins_loaded = True
     log.debug('Plugins took %.2f seconds to load' % took)
 
@@ -601,6 +856,8 @@ def get_phases_by_plugin(name):
 
 def get_plugins_by_group(group):
     """Return an iterator over all plugins with in specified group."""
+    _load_lazy([modulename for modulename, record in _lazy_modules.iteritems()
+                if any(group in info['groups'] for info in record['plugins'].itervalues())])
     return (p for p in plugins.itervalues() if group in p.get('groups'))
 
 
@@ -611,6 +868,8 @@ def get_plugin_keywords():
 
 def get_plugin_by_name(name, issued_by='???'):
     """Get plugin by name, preferred way since this structure may be changed at some point."""
+    if not name in plugins and name in _lazy_plugins:
+        _load_lazy([_lazy_plugins[name]])
     if not name in plugins:
         raise DependencyError(issued_by=issued_by, missing=name, message='Unknown plugin %s' % name)
     return plugins[name]
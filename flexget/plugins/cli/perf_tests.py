@@ -18,6 +18,8 @@ class PerfTests(object):
         try:
             if test_name == 'imdb_query':
                 self.imdb_query(session)
+            elif test_name == 'serialization':
+                self.serialization(session)
             else:
                 log.critical('Unknown performance test %s' % test_name)
         finally:
@@ -26,7 +28,7 @@ class PerfTests(object):
     def imdb_query(self, session):
         import time
         from flexget.plugins.metainfo.imdb_lookup import Movie
-        from flexget.plugins.cli.performance import log_query_count
+        from flexget.plugins.generic.performance import log_query_count
         from sqlalchemy.sql.expression import select
         from progressbar import ProgressBar, Percentage, Bar, ETA
         from sqlalchemy.orm import joinedload_all
@@ -70,6 +72,37 @@ class PerfTests(object):
         took = time.time() - start_time
         log.debug('Took %.2f seconds to query %i movies' % (took, len(imdb_urls)))
 
+    def serialization(self, session):
+        """Compares pickle against the serialization codec using cached entries, or synthetic ones if none"""
+        import pickle
+        import time
+        from datetime import datetime
+        from flexget.entry import Entry
+        from flexget.utils import serialization
+        from flexget.utils.cached_input import InputCacheEntry
+
+        entries = [e.entry for e in session.query(InputCacheEntry).limit(5000)]
+        if not entries:
+            log.info('No cached entries in database, using synthetic entries')
+            for i in xrange(5000):
+                entries.append(Entry(title=u'Some.Series.S01E%02d.720p.HDTV.x264-GROUP' % i,
+                                     url=u'http://localhost/download/%i.torrent' % i,
+                                     description=u'Episode %i of some series ' % i * 5,
+                                     content_size=350 + i, rss_pubdate=datetime.now(),
+                                     torrent_seeds=i * 3, torrent_leeches=i, quality=u'720p hdtv'))
+
+        for name, dumps, loads in [('pickle', lambda v: pickle.dumps(dict(v), pickle.HIGHEST_PROTOCOL), pickle.loads),
+                                   ('codec', serialization.dumps, serialization.loads)]:
+            start_time = time.time()
+            data = [dumps(entry) for entry in entries]
+            dump_time = time.time() - start_time
+            start_time = time.time()
+            for value in data:
+                loads(value)
+            load_time = time.time() - start_time
+            log.info('%-6s dump %.3fs, load %.3fs, %i bytes total for %i entries' %
+                     (name, dump_time, load_time, sum(len(value) for value in data), len(entries)))
+
 
 register_plugin(PerfTests, 'perftests', api_ver=2, debug=True, builtin=True)
 register_parser_option('--perf-test', action='store', dest='perf_test', default='',
@@ -1,6 +1,6 @@
 import logging
 from optparse import SUPPRESS_HELP
-from flexget.plugin import register_parser_option, plugins
+from flexget.plugin import register_parser_option, load_all_plugins, plugins
 from flexget.event import event
 
 log = logging.getLogger('plugins')
@@ -10,6 +10,7 @@ log = logging.getLogger('plugins')
 def plugins_summary(manager):
     if manager.options.plugins:
         manager.disable_feeds()
+        load_all_plugins()
         print '-' * 79
         print '%-20s%-30s%s' % ('Name', 'Roles (priority)', 'Info')
         print '-' * 79
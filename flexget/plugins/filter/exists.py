@@ -1,6 +1,7 @@
 import os
 import logging
 from flexget.plugin import register_plugin, priority, PluginWarning
+from flexget.utils.fs_index import DirectoryIndex
 
 log = logging.getLogger('exists')
 
@@ -38,15 +39,11 @@ class FilterExists(object):
             path = str(os.path.expanduser(path))
             if not os.path.exists(path):
                 raise PluginWarning('Path %s does not exist' % path, log)
-            # scan through
-            for root, dirs, files in os.walk(path):
-                # convert filelists into utf-8 to avoid unicode problems
-                dirs = [x.decode('utf-8', 'ignore') for x in dirs]
-                files = [x.decode('utf-8', 'ignore') for x in files]
-                for entry in feed.entries:
-                    name = entry['title']
-                    if name in dirs or name in files:
-                        log.debug('Found %s in %s' % (name, root))
-                        feed.reject(entry, '%s/%s' % (name, root))
+            names = DirectoryIndex(feed.session, path).refresh().names()
+            for entry in feed.entries:
+                name = entry['title']
+                for root in names.get(name, []):
+                    log.debug('Found %s in %s' % (name, root))
+                    feed.reject(entry, '%s/%s' % (name, root))
 
 register_plugin(FilterExists, 'exists')
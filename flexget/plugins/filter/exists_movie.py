@@ -1,6 +1,7 @@
 import os
 import logging
 from flexget.plugin import register_plugin, priority, PluginError, get_plugin_by_name
+from flexget.utils.fs_index import DirectoryIndex, DeriveFailed
 from flexget.utils.titles.movie import MovieParser
 
 log = logging.getLogger('exists_movie')
@@ -47,22 +48,37 @@ class FilterExistsMovie(object):
         config = self.build_config(config)
         imdb_lookup = get_plugin_by_name('imdb_lookup').instance
 
-        incompatible_dirs = 0
+        # directories looked up in this run which could not be verified
+        incompatible_dirs = []
         incompatible_entries = 0
         count_entries = 0
         count_dirs = 0
 
-        # list of imdb ids gathered from paths / cache
-        imdb_ids = []
+        # set of imdb ids gathered from paths / cache
+        imdb_ids = set()
+
+        def lookup_dir(item):
+            # TODO: add also video files?
+            if item.lower() in self.skip:
+                return
+            movie = MovieParser()
+            movie.parse(item)
+            try:
+                return imdb_lookup.imdb_id_lookup(movie_title=movie.name, raw_title=item, session=feed.session)
+            except PluginError, e:
+                log.trace('%s lookup failed (%s)' % (item, e.value))
+                incompatible_dirs.append(item)
+                # imdb may be unreachable, try again on next run
+                raise DeriveFailed(e.value)
 
         for path in config:
             # see if this path has already been scanned
             if path in self.cache:
                 log.verbose('Using cached scan for %s ...' % path)
-                imdb_ids.extend(self.cache[path])
+                imdb_ids.update(self.cache[path])
                 continue
 
-            path_ids = []
+            path_ids = set()
 
             # with unicode it crashes on some paths ..
             path = str(os.path.expanduser(path))
@@ -76,38 +92,20 @@ class FilterExistsMovie(object):
             #logging.getLogger('movieparser').setLevel(logging.WARNING)
             #logging.getLogger('imdb_lookup').setLevel(logging.WARNING)
 
-            # scan through
-            for root, dirs, files in os.walk(path):
-                # convert filelists into utf-8 to avoid unicode problems
-                dirs = [x.decode('utf-8', 'ignore') for x in dirs]
-                # files = [x.decode('utf-8', 'ignore') for x in files]
-
-                # TODO: add also video files?
-                for item in dirs:
-                    if item.lower() in self.skip:
-                        continue
-                    count_dirs += 1
-
-                    movie = MovieParser()
-                    movie.parse(item)
-
-                    try:
-                        imdb_id = imdb_lookup.imdb_id_lookup(movie_title=movie.name,
-                                                             raw_title=item,
-                                                             session=feed.session)
-                        if imdb_id in path_ids:
-                            log.trace('duplicate %s' % item)
-                            continue
-                        if imdb_id is not None:
-                            log.trace('adding: %s' % imdb_id)
-                            path_ids.append(imdb_id)
-                    except PluginError, e:
-                        log.trace('%s lookup failed (%s)' % (item, e.value))
-                        incompatible_dirs += 1
+            # directories are looked up only when they are new or their parent directory has changed
+            index = DirectoryIndex(feed.session, path).refresh()
+            for root, item, imdb_id in index.derive('exists_movie', lookup_dir, files=False):
+                if imdb_id in path_ids:
+                    log.trace('duplicate %s' % item)
+                    continue
+                log.trace('adding: %s' % imdb_id)
+                path_ids.add(imdb_id)
+            count_dirs += sum(len([item for item in directory.dir_names if item.lower() not in self.skip])
+                              for directory in index.directories)
 
             # store to cache and extend to found list
             self.cache[path] = path_ids
-            imdb_ids.extend(path_ids)
+            imdb_ids.update(path_ids)
 
         log.debug('-- Start filtering entries ----------------------------------')
 
@@ -129,7 +127,7 @@ class FilterExistsMovie(object):
         if incompatible_dirs or incompatible_entries:
             log.verbose('There were some incompatible items. %s of %s entries '
                         'and %s of %s directories could not be verified.' %
-                (incompatible_entries, count_entries, incompatible_dirs, count_dirs))
+                (incompatible_entries, count_entries, len(incompatible_dirs), count_dirs))
 
         log.debug('-- Finished filtering entries -------------------------------')
 
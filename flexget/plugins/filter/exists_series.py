@@ -1,12 +1,42 @@
 import copy
+import hashlib
 import os
 import logging
 from flexget.plugin import register_plugin, priority, PluginWarning
-from flexget.utils.titles import SeriesParser, ParseWarning
+from flexget.utils.fs_index import DirectoryIndex
+from flexget.utils.titles import ParseWarning
+from flexget.utils.titles.series import ID_TYPES
 
 log = logging.getLogger('exists_series')
 
 
+def parser_key(parser):
+    """Key of values parsed with *parser* in the filesystem index, changes when settings of the series change."""
+    settings = [parser.name, parser.identified_by, parser.strict_name, parser.allow_groups, parser.allow_seasonless,
+                parser.date_dayfirst, parser.date_yearfirst]
+    for name in ['name'] + ID_TYPES:
+        settings.append([getattr(regexp, 'pattern', regexp) for regexp in getattr(parser, name + '_regexps')])
+    return 'exists_series:%s' % hashlib.md5(repr(settings)).hexdigest()
+
+
+def episode_parser(parser):
+    """:return: Function parsing names with a copy of *parser* into (identifier, quality, proper count) or None"""
+    disk_parser = copy.copy(parser)
+
+    def parse(name):
+        disk_parser.data = name
+        try:
+            disk_parser.parse(data=name)
+        except ParseWarning, pw:
+            from flexget.utils.log import log_once
+            log_once(pw.value, logger=log)
+        if disk_parser.valid:
+            log.debug('name %s is same series as %s' % (name, parser.name))
+            return disk_parser.identifier, disk_parser.quality.name, disk_parser.proper_count
+
+    return parse
+
+
 class FilterExistsSeries(object):
     """
         Intelligent series aware exists rejecting.
@@ -61,47 +91,25 @@ class FilterExistsSeries(object):
             path = str(os.path.expanduser(path))
             if not os.path.exists(path):
                 raise PluginWarning('Path %s does not exist' % path, log)
-            # scan through
-            for root, dirs, files in os.walk(path):
-                # convert filelists into utf-8 to avoid unicode problems
-                dirs = [x.decode('utf-8', 'ignore') for x in dirs]
-                files = [x.decode('utf-8', 'ignore') for x in files]
-                # For speed, only test accepted entries since our priority should be after everything is accepted.
-                for series in accepted_series:
-                    # make new parser from parser in entry
-                    disk_parser = copy.copy(accepted_series[series][0]['series_parser'])
-                    for name in files + dirs:
-                        # run parser on filename data
-                        disk_parser.data = name
-                        try:
-                            disk_parser.parse(data=name)
-                        except ParseWarning, pw:
-                            from flexget.utils.log import log_once
-                            log_once(pw.value, logger=log)
-                        if disk_parser.valid:
-                            log.debug('name %s is same series as %s' % (name, series))
-                            log.debug('disk_parser.identifier = %s' % disk_parser.identifier)
-                            log.debug('disk_parser.quality = %s' % disk_parser.quality)
-                            log.debug('disk_parser.proper_count = %s' % disk_parser.proper_count)
-
-                            for entry in accepted_series[series]:
-                                log.debug('series_parser.identifier = %s' % entry['series_parser'].identifier)
-                                if disk_parser.identifier != entry['series_parser'].identifier:
-                                    log.trace('wrong identifier')
-                                    continue
-                                log.debug('series_parser.quality = %s' % entry['series_parser'].quality)
-                                if config.get('allow_different_qualities') and \
-                                   disk_parser.quality != entry['series_parser'].quality:
-                                    log.trace('wrong quality')
-                                    continue
-                                log.debug('entry parser.proper_count = %s' % entry['series_parser'].proper_count)
-                                if disk_parser.proper_count >= entry['series_parser'].proper_count:
-                                    feed.reject(entry, 'proper already exists')
-                                    continue
-                                else:
-                                    log.trace('new one is better proper, allowing')
-                                    continue
-
-                                feed.reject(entry, 'episode already exists')
+            index = DirectoryIndex(feed.session, path).refresh()
+            # For speed, only test accepted entries since our priority should be after everything is accepted.
+            for series, entries in accepted_series.iteritems():
+                # parse names on disk with parser from entry, identifier -> list of (quality, proper count)
+                parser = entries[0]['series_parser']
+                episodes = {}
+                for root, name, (identifier, quality, proper_count) in \
+                        index.derive(parser_key(parser), episode_parser(parser)):
+                    episodes.setdefault(identifier, []).append((quality, proper_count))
+
+                for entry in entries:
+                    entry_parser = entry['series_parser']
+                    for quality, proper_count in episodes.get(entry_parser.identifier, []):
+                        if config.get('allow_different_qualities') and quality != entry_parser.quality.name:
+                            log.trace('wrong quality')
+                            continue
+                        if proper_count >= entry_parser.proper_count:
+                            feed.reject(entry, 'proper already exists')
+                        else:
+                            log.trace('new one is better proper, allowing')
 
 register_plugin(FilterExistsSeries, 'exists_series', groups=['exists'])
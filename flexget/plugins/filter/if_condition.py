@@ -1,24 +1,62 @@
+import __builtin__
 import logging
 import re
 import datetime
-from copy import copy
 from collections import defaultdict
 from flexget.feed import Feed
-from flexget.plugin import register_plugin, plugins as all_plugins, get_plugin_by_name, phase_methods
+from flexget.plugin import register_plugin, plugins as all_plugins, get_plugin_by_name, phase_methods, PluginError
 
 log = logging.getLogger('if')
 
+ALLOWED_BUILTINS = ['True', 'False', 'str', 'unicode', 'int', 'float', 'len', 'any', 'all', 'sorted']
+SAFE_BUILTINS = dict((name, getattr(__builtin__, name)) for name in ALLOWED_BUILTINS)
 
-def safer_eval(statement, locals):
-    """A safer eval function. Does not allow __ or try statements, only includes certain 'safe' builtins."""
-    allowed_builtins = ['True', 'False', 'str', 'unicode', 'int', 'float', 'len', 'any', 'all', 'sorted']
-    for name in allowed_builtins:
-        locals[name] = globals()['__builtins__'].get(name)
+
+def compile_condition(statement):
+    """
+    Compile *statement* once, so that it can be evaluated for many entries without parsing it again.
+
+    :raises ValueError: If statement contains __ or try statements
+    :raises SyntaxError: If statement is not a valid expression
+    """
     if re.search(r'__|try\s*:', statement):
         raise ValueError('\'__\' or try blocks not allowed in if statements.')
+    return compile(statement, '<if>', 'eval')
+
+
+def safer_eval(statement, locals):
+    """
+    A safer eval function. Does not allow __ or try statements, only includes certain 'safe' builtins.
+
+    *statement* can also be a code object returned by :func:`compile_condition`.
+    """
+    locals.update(SAFE_BUILTINS)
+    if isinstance(statement, basestring):
+        statement = compile_condition(statement)
     return eval(statement, {'__builtins__': None}, locals)
 
 
+class EntryNamespace(object):
+    """
+    Names available to conditions, used instead of a copy of each entry.
+
+    Safe builtins and *helpers* take precedence over fields of :attr:`entry`. Fields are read from the entry itself,
+    so lazy fields are evaluated only when a condition uses them.
+    """
+
+    def __init__(self, helpers):
+        self.helpers = dict(helpers, **SAFE_BUILTINS)
+        self.helpers['has_field'] = lambda field: field in self.entry
+        #: entry being evaluated
+        self.entry = None
+
+    def __getitem__(self, key):
+        if key in self.helpers:
+            return self.helpers[key]
+        # KeyError makes eval look further and raise NameError
+        return self.entry[key]
+
+
 class FilterIf(object):
     """Can run actions on entries that satisfy a given condition.
 
@@ -47,7 +85,12 @@ class FilterIf(object):
         """Divide the config into parts based on which phase they need to run on."""
         phase_dict = self.feed_phases[feed.name] = defaultdict(lambda: [])
         for item in config:
-            action = item.values()[0]
+            requirement, action = item.items()[0]
+            # conditions are compiled once here instead of for every entry
+            try:
+                item = (requirement, compile_condition(requirement), action)
+            except (ValueError, SyntaxError), e:
+                raise PluginError('Invalid if statement `%s`: %s' % (requirement, e))
             if isinstance(action, basestring):
                 phase_dict['filter'].append(item)
             else:
@@ -64,26 +107,33 @@ class FilterIf(object):
                         else:
                             phase_dict[phase].append(item)
 
-    def check_condition(self, condition, entry):
-        """Checks if a given `entry` passes `condition`"""
+    def passed_entries(self, condition, code, entries):
+        """
+        Evaluates compiled `condition` for each of `entries`.
+
+        :param condition: Condition as configured, for logging
+        :param code: Condition compiled with :func:`compile_condition`
+        :return: List of entries which passed `condition`
+        """
         # Make entry fields and other utilities available in the eval namespace
-        # We need our namespace to be an Entry instance for lazy loading to work
-        eval_locals = copy(entry)
-        eval_locals.update({'has_field': lambda f: f in entry,
-                            'timedelta': datetime.timedelta,
-                            'now': datetime.datetime.now()})
-        try:
-            # Restrict eval namespace to have no globals and locals only from eval_locals
-            passed = safer_eval(condition, eval_locals)
-            if passed:
-                log.debug('%s matched requirement %s' % (entry['title'], condition))
-            return passed
-        except NameError, e:
-            # Extract the name that did not exist
-            missing_field = e.message.split('\'')[1]
-            log.debug('%s does not contain the field %s' % (entry['title'], missing_field))
-        except Exception, e:
-            log.error('Error occurred in if statement: %r' % e)
+        namespace = EntryNamespace({'timedelta': datetime.timedelta,
+                                    'now': datetime.datetime.now()})
+        # Restrict eval namespace to have no globals and locals only from namespace
+        eval_globals = {'__builtins__': None}
+        passed = []
+        for entry in entries:
+            namespace.entry = entry
+            try:
+                if eval(code, eval_globals, namespace):
+                    log.debug('%s matched requirement %s' % (entry['title'], condition))
+                    passed.append(entry)
+            except NameError, e:
+                # Extract the name that did not exist
+                missing_field = e.message.split('\'')[1]
+                log.debug('%s does not contain the field %s' % (entry['title'], missing_field))
+            except Exception, e:
+                log.error('Error occurred in if statement: %r' % e)
+        return passed
 
     def __getattr__(self, item):
         """Provides handlers for all phases except input and entry phases."""
@@ -102,9 +152,8 @@ class FilterIf(object):
                 'accept': feed.accept,
                 'reject': feed.reject,
                 'fail': feed.fail}
-            for item in self.feed_phases[feed.name][phase]:
-                requirement, action = item.items()[0]
-                passed_entries = [e for e in feed.entries if self.check_condition(requirement, e)]
+            for requirement, code, action in self.feed_phases[feed.name][phase]:
+                passed_entries = self.passed_entries(requirement, code, feed.entries)
                 if passed_entries:
                     if isinstance(action, basestring):
                         # Simple entry action (accept, reject or fail) was specified as a string
@@ -115,8 +164,8 @@ class FilterIf(object):
                         fake_feed = Feed(feed.manager, feed.name, feed.config)
                         fake_feed.session = feed.session
                         fake_feed.entries = passed_entries
-                        fake_feed.accepted = [e for e in feed.accepted if self.check_condition(requirement, e)]
-                        fake_feed.rejected = [e for e in feed.rejected if self.check_condition(requirement, e)]
+                        fake_feed.accepted = self.passed_entries(requirement, code, feed.accepted)
+                        fake_feed.rejected = self.passed_entries(requirement, code, feed.rejected)
                         try:
                             for plugin_name, plugin_config in action.iteritems():
                                 plugin = get_plugin_by_name(plugin_name)
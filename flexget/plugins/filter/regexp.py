@@ -5,6 +5,184 @@ from flexget.plugin import register_plugin, priority, get_plugin_by_name
 
 log = logging.getLogger('regexp')
 
+# fields whose values are unquoted before searching
+UNQUOTE = ['url']
+
+FLAGS = re.IGNORECASE | re.UNICODE
+# flags of a regexp without inline flags, inline flags would apply to all combined regexps
+PLAIN_FLAGS = re.compile('', FLAGS).flags
+
+# python 2 supports at most 100 groups in one regexp, combined alternations are split to stay below that
+MAX_GROUPS = 99
+
+# regexps using backreferences can not be combined, group numbers would change
+BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def field_values(entry, find_from=None):
+    """
+    Extract values searched by regexps from *entry*.
+
+    :param find_from: None or a list of fields to search from, all fields by default
+    :return: List of (field, list of string values) in the order they are searched
+    """
+    result = []
+    for field in find_from or entry:
+        if not entry.get(field):
+            continue
+        # Make all fields into lists for search purposes
+        values = entry[field]
+        if not isinstance(values, list):
+            values = [values]
+        values = [value for value in values if isinstance(value, basestring)]
+        if field in UNQUOTE:
+            values = [urllib.unquote(value) for value in values]
+        if values:
+            result.append((field, values))
+    return result
+
+
+class Rule(object):
+    """One configured regexp with its options."""
+
+    def __init__(self, regexp, opts):
+        self.regexp = regexp
+        self.opts = opts
+        self.find_from = opts.get('from')
+        self.not_regexps = opts.get('not') or []
+
+    @property
+    def combinable(self):
+        """Whether the regexp can be searched as a part of a combined alternation."""
+        if self.opts.get('not') or self.opts.get('path') or self.opts.get('set'):
+            return False
+        return self.regexp.flags == PLAIN_FLAGS and \
+            not BACKREFERENCE.search(self.regexp.pattern)
+
+    def match(self, fields):
+        """
+        :param fields: Values of the entry as returned by :func:`field_values`
+        :return: Name of the first field matching the regexp and none of the `not` regexps, or None
+        """
+        for field, values in fields:
+            for value in values:
+                if self.regexp.search(value):
+                    # Make sure the not_regexps do not match for this field
+                    if not any(not_regexp.search(other) for not_regexp in self.not_regexps for other in values):
+                        return field
+                    break
+        return None
+
+
+class RuleGroup(object):
+    """
+    Consecutive rules searching the same fields, combined into one alternation.
+
+    One search of a value tells whether any of the rules matches it, and which rule matches at the leftmost position.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.find_from = rules[0].find_from
+        # group number -> index of the rule, each regexp is wrapped in a group of its own
+        self.groups = {}
+        group = 1
+        for index, rule in enumerate(rules):
+            self.groups[group] = index
+            group += rule.regexp.groups + 1
+        pattern = '|'.join('(%s)' % rule.regexp.pattern for rule in rules)
+        self.search = re.compile(pattern, FLAGS).search
+
+    def candidate(self, fields):
+        """:return: Index of the first rule which may match, None if no rule matches any of the values"""
+        best = None
+        for field, values in fields:
+            for value in values:
+                match = self.search(value)
+                if match:
+                    index = self.groups.get(match.lastindex, 0)
+                    if best is None or index < best:
+                        best = index
+                    if not best:
+                        return best
+        return best
+
+    def first(self, fields, match_mode):
+        """:return: Tuple of first rule whose result is *match_mode* and the matched field, or None"""
+        candidate = self.candidate(fields)
+        if candidate is None:
+            # none of the rules match
+            return (self.rules[0], None) if not match_mode else None
+        # rules before the candidate may still match some other value, they are checked one by one
+        for rule in self.rules[:candidate + 1] if match_mode else self.rules:
+            field = rule.match(fields)
+            if match_mode == bool(field):
+                return rule, field
+        return None
+
+
+class CompiledRegexps(object):
+    """
+    Regexps of one operation, compiled for matching many entries.
+
+    Consecutive regexps without options, searching the same fields, are combined into :class:`RuleGroup` instances.
+    The result is the same as trying the regexps one by one in configured order.
+    """
+
+    def __init__(self, regexps):
+        self.size = len(regexps)
+        #: list of :class:`Rule` and :class:`RuleGroup` instances in configured order
+        self.matchers = []
+        pending = []
+        groups = 0
+        for regexp_opts in regexps:
+            regexp, opts = regexp_opts.items()[0]
+            rule = Rule(regexp, opts)
+            if rule.combinable:
+                if pending and (pending[0].find_from != rule.find_from or
+                                groups + rule.regexp.groups + 1 > MAX_GROUPS):
+                    self._add(pending)
+                    pending, groups = [], 0
+                pending.append(rule)
+                groups += rule.regexp.groups + 1
+            else:
+                self._add(pending)
+                pending, groups = [], 0
+                self.matchers.append(rule)
+        self._add(pending)
+
+    def _add(self, rules):
+        if len(rules) > 1:
+            try:
+                self.matchers.append(RuleGroup(rules))
+                return
+            except (re.error, AssertionError), e:
+                # eg. same group name in several regexps
+                log.debug('Unable to combine regexps: %s' % e)
+        self.matchers.extend(rules)
+
+    def first(self, entry, match_mode):
+        """
+        :param bool match_mode: Whether looking for a regexp which matches, or one which does not match
+        :return: Tuple of first :class:`Rule` whose result is *match_mode* and the matched field, or None
+        """
+        # values of each field set are extracted only once for the entry
+        extracted = {}
+        for matcher in self.matchers:
+            key = tuple(matcher.find_from) if matcher.find_from else None
+            fields = extracted.get(key)
+            if fields is None:
+                fields = extracted[key] = field_values(entry, matcher.find_from)
+            if isinstance(matcher, RuleGroup):
+                result = matcher.first(fields, match_mode)
+                if result:
+                    return result
+            else:
+                field = matcher.match(fields)
+                if match_mode == bool(field):
+                    return matcher, field
+        return None
+
 
 class FilterRegexp(object):
 
@@ -110,10 +288,10 @@ class FilterRegexp(object):
                 # compile `not` option regexps
                 if 'not' in opts:
                     for idx, not_re in enumerate(opts['not'][:]):
-                        opts['not'][idx] = re.compile(not_re, re.IGNORECASE | re.UNICODE)
+                        opts['not'][idx] = re.compile(not_re, FLAGS)
 
                 # compile regexp and make sure regexp is a string for series like '24'
-                regexp = re.compile(unicode(regexp), re.IGNORECASE | re.UNICODE)
+                regexp = re.compile(unicode(regexp), FLAGS)
                 out_config.setdefault(operation, []).append({regexp: opts})
         return out_config
 
@@ -121,20 +299,21 @@ class FilterRegexp(object):
     def on_feed_filter(self, feed, config):
         # TODO: what if accept and accept_excluding configured? Should raise error ...
         config = self.prepare_config(config)
-        rest = []
+        rest = None
         for operation, regexps in config.iteritems():
             if operation == 'rest':
                 continue
             r = self.filter(feed, operation, regexps)
-            if not rest:
+            if rest is None:
                 rest = r
             else:
-                # If there is already something in rest, take the intersection with r (entries no operations matched)
-                rest = [entry for entry in r if entry in rest]
+                # Take the intersection with r (entries no operations matched), entries are compared by identity
+                matched = set(id(entry) for entry in r)
+                rest = [entry for entry in rest if id(entry) in matched]
 
         if 'rest' in config:
             rest_method = feed.accept if config['rest'] == 'accept' else feed.reject
-            for entry in rest:
+            for entry in rest or []:
                 log.debug('Rest method %s for %s' % (config['rest'], entry['title']))
                 rest_method(entry, 'regexp `rest`')
 
@@ -146,30 +325,9 @@ class FilterRegexp(object):
         :param regexp: Compiled regexp
         :param find_from: None or a list of fields to search from
         :param not_regexps: None or list of regexps that can NOT match
-        :return:
+        :return: Name of the matching field or None
         """
-        unquote = ['url']
-        for field in find_from or entry:
-            if not entry.get(field):
-                continue
-            # Make all fields into lists for search purposes
-            values = entry[field]
-            if not isinstance(values, list):
-                values = [values]
-            for value in values:
-                if not isinstance(value, basestring):
-                    continue
-                if field in unquote:
-                    value = urllib.unquote(value)
-                    # If none of the not_regexps match
-                if regexp.search(value):
-                    # Make sure the not_regexps do not match for this field
-                    for not_regexp in not_regexps or []:
-                        if self.matches(entry, not_regexp, find_from=[field]):
-                            break
-                    else: # None of the not_regexps matched
-                        return field
-        return None
+        return Rule(regexp, {'not': not_regexps}).match(field_values(entry, find_from))
 
     def filter(self, feed, operation, regexps):
         """
@@ -184,33 +342,29 @@ class FilterRegexp(object):
         rest = []
         method = feed.accept if 'accept' in operation else feed.reject
         match_mode = 'excluding' not in operation
+        compiled = CompiledRegexps(regexps)
         for entry in feed.entries:
-            log.trace('testing %i regexps to %s' % (len(regexps), entry['title']))
-            for regexp_opts in regexps:
-                regexp, opts = regexp_opts.items()[0]
-
-                # check if entry matches given regexp configuration
-                field = self.matches(entry, regexp, opts.get('from'), opts.get('not'))
-
-                # Run if we are in match mode and have a hit, or are in non-match mode and don't have a hit
-                if match_mode == bool(field):
-                    # Creates the string with the reason for the hit
-                    matchtext = 'regexp \'%s\' ' % regexp.pattern + ('matched field \'%s\'' % field if match_mode else 'didn\'t match')
-                    log.debug('%s for %s' % (matchtext, entry['title']))
-                    # apply settings to entry and run the method on it
-                    if opts.get('path'):
-                        entry['path'] = opts['path']
-                    if opts.get('set'):
-                        # invoke set plugin with given configuration
-                        log.debug('adding set: info to entry:"%s" %s' % (entry['title'], opts['set']))
-                        set = get_plugin_by_name('set')
-                        set.instance.modify(entry, opts['set'])
-                    method(entry, matchtext)
-                    # We had a match so break out of the regexp loop.
-                    break
-            else:
+            log.trace('testing %i regexps to %s' % (compiled.size, entry['title']))
+            # Find the first regexp which has a hit if we are in match mode, or doesn't have a hit in non-match mode
+            hit = compiled.first(entry, match_mode)
+            if hit is None:
                 # We didn't run method for any of the regexps, add this entry to rest
                 rest.append(entry)
+                continue
+            rule, field = hit
+            opts = rule.opts
+            # Creates the string with the reason for the hit
+            matchtext = 'regexp \'%s\' ' % rule.regexp.pattern + ('matched field \'%s\'' % field if match_mode else 'didn\'t match')
+            log.debug('%s for %s' % (matchtext, entry['title']))
+            # apply settings to entry and run the method on it
+            if opts.get('path'):
+                entry['path'] = opts['path']
+            if opts.get('set'):
+                # invoke set plugin with given configuration
+                log.debug('adding set: info to entry:"%s" %s' % (entry['title'], opts['set']))
+                set = get_plugin_by_name('set')
+                set.instance.modify(entry, opts['set'])
+            method(entry, matchtext)
         return rest
 
 register_plugin(FilterRegexp, 'regexp', api_ver=2)
@@ -1,12 +1,18 @@
 import logging
+import re
+from weakref import WeakKeyDictionary
+from sqlalchemy.event import listen
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.schema import Table, ForeignKey
+from sqlalchemy.sql import select, func, and_, or_, not_, table, column, literal_column
 from flexget import schema
 from flexget.event import event
 from flexget.entry import Entry
 from flexget.plugin import priority, register_parser_option, register_plugin
-from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name
+from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name, chunked, IN_CHUNK_SIZE
 from flexget.utils.tools import console, strip_html
 from sqlalchemy import Column, Integer, DateTime, Unicode, Index
 from datetime import datetime
@@ -14,7 +20,7 @@ from flexget.manager import Session
 
 log = logging.getLogger('archive')
 
-SCHEMA_VER = 0
+SCHEMA_VER = 1
 
 Base = schema.versioned_base('archive', SCHEMA_VER)
 
@@ -77,6 +83,233 @@ class ArchiveSource(Base):
         return '<ArchiveSource(id=%s,name=%s)>' % (self.id, self.name)
 
 
+class ArchiveKeyword(Base):
+    """Inverted index of archive keywords, used when SQLite full-text search is not available."""
+
+    __tablename__ = 'archive_keyword'
+    __table_args__ = (Index('ix_archive_keyword_keyword_entry', 'keyword', 'entry_id'),)
+
+    id = Column(Integer, primary_key=True)
+    keyword = Column(Unicode)
+    entry_id = Column(Integer, ForeignKey('archive_entry.id'), index=True)
+    weight = Column(Integer)
+
+
+# Search index
+#
+# Archive titles and descriptions are indexed into SQLite FTS5 / FTS4 virtual table `archive_fts` (rowid being
+# the ArchiveEntry.id) when the sqlite library supports it, otherwise into the `archive_keyword` table.
+# Index is kept in sync by mapper events, bulk operations must use index_entries / unindex_entries.
+
+FTS_TABLE = 'archive_fts'
+# preferred full-text search modules, in order
+FTS_MODULES = ['fts5', 'fts4']
+# relevance of a keyword hit in title compared to hit in description
+TITLE_WEIGHT = 10
+DESCRIPTION_WEIGHT = 1
+
+_index_backends = WeakKeyDictionary()
+
+
+def tokenize(text):
+    """
+    :param string text: Text to be split
+    :return: List of lowercase keywords in *text*, in order of appearance
+    """
+    if not text:
+        return []
+    return re.findall(r'\w+', unicode(text).lower(), re.UNICODE)
+
+
+def index_backend(connection):
+    """
+    Determine which search index is used in the database, creates the full-text table if needed.
+
+    :param connection: SQLAlchemy connection
+    :return: fts5, fts4 or keyword
+    """
+    engine = connection.engine
+    backend = _index_backends.get(engine)
+    if backend is None:
+        backend = _index_backends[engine] = _detect_backend(connection)
+        log.debug('using %s archive search index' % backend)
+    return backend
+
+
+def _detect_backend(connection):
+    if connection.dialect.name != 'sqlite':
+        return 'keyword'
+    sql = connection.execute('SELECT sql FROM sqlite_master WHERE name = ?', FTS_TABLE).scalar()
+    if sql:
+        for module in FTS_MODULES:
+            if module in sql.lower():
+                return module
+        return 'keyword'
+    for module in FTS_MODULES:
+        try:
+            connection.execute('CREATE VIRTUAL TABLE %s USING %s(title, description)' % (FTS_TABLE, module))
+        except DBAPIError:
+            log.debug('sqlite does not support %s' % module)
+            continue
+        return module
+    return 'keyword'
+
+
+def index_entries(connection, rows):
+    """
+    Add archive entries into search index.
+
+    :param connection: SQLAlchemy connection
+    :param rows: List of (id, title, description) tuples
+    """
+    if not rows:
+        return
+    backend = index_backend(connection)
+    if backend == 'keyword':
+        keywords = []
+        for id, title, description in rows:
+            weights = {}
+            for keyword in tokenize(title):
+                weights[keyword] = weights.get(keyword, 0) + TITLE_WEIGHT
+            for keyword in tokenize(description):
+                weights[keyword] = weights.get(keyword, 0) + DESCRIPTION_WEIGHT
+            keywords.extend({'keyword': keyword, 'entry_id': id, 'weight': weight}
+                            for keyword, weight in weights.iteritems())
+        if keywords:
+            connection.execute(ArchiveKeyword.__table__.insert(), keywords)
+    else:
+        connection.execute('INSERT INTO %s (rowid, title, description) VALUES (?, ?, ?)' % FTS_TABLE,
+                           [(id, title or u'', description or u'') for id, title, description in rows])
+
+
+def unindex_entries(connection, ids):
+    """
+    Remove archive entries from search index.
+
+    :param connection: SQLAlchemy connection
+    :param ids: List of ArchiveEntry ids
+    """
+    ids = list(ids)
+    backend = index_backend(connection)
+    for chunk in chunked(ids):
+        if backend == 'keyword':
+            keyword_table = ArchiveKeyword.__table__
+            connection.execute(keyword_table.delete().where(keyword_table.c.entry_id.in_(chunk)))
+        else:
+            connection.execute('DELETE FROM %s WHERE rowid IN (%s)' % (FTS_TABLE, ', '.join('?' * len(chunk))),
+                               chunk)
+
+
+def rebuild_index(session):
+    """
+    Clears and rebuilds the search index from all archived entries.
+
+    :param Session session: SQLAlchemy session
+    :return: Number of entries indexed
+    """
+    connection = session.connection()
+    if index_backend(connection) == 'keyword':
+        connection.execute(ArchiveKeyword.__table__.delete())
+    else:
+        connection.execute('DELETE FROM %s' % FTS_TABLE)
+    entry_table = ArchiveEntry.__table__
+    count = 0
+    last_id = 0
+    while True:
+        # walk by primary key instead of offset, so that each chunk is an index lookup
+        rows = connection.execute(select([entry_table.c.id, entry_table.c.title, entry_table.c.description]).
+                                  where(entry_table.c.id > last_id).order_by(entry_table.c.id).
+                                  limit(IN_CHUNK_SIZE)).fetchall()
+        if not rows:
+            break
+        index_entries(connection, [tuple(row) for row in rows])
+        count += len(rows)
+        last_id = rows[-1][0]
+    return count
+
+
+def _match_query(connection, terms):
+    """
+    :return: Select for ids of ArchiveEntries containing all *terms* (as prefixes)
+    """
+    if index_backend(connection) == 'keyword':
+        query = None
+        for term in terms:
+            matching = select([ArchiveKeyword.entry_id]).where(_keyword_prefix(term))
+            if query is None:
+                query = matching
+            else:
+                query = query.where(ArchiveKeyword.entry_id.in_(matching))
+        return query
+    return select([column('rowid')], from_obj=table(FTS_TABLE)).\
+        where(literal_column(FTS_TABLE).match(_fts_expression(terms)))
+
+
+def _keyword_prefix(term):
+    # range instead of LIKE so that the keyword index is used
+    return (ArchiveKeyword.keyword >= term) & (ArchiveKeyword.keyword < term + u'\uffff')
+
+
+def _fts_expression(terms):
+    return u' '.join(u'%s*' % term for term in terms)
+
+
+def _scores(connection, terms, ids):
+    """
+    :return: Dict of relevance scores by ArchiveEntry id, higher is better
+    """
+    scores = {}
+    backend = index_backend(connection)
+    for chunk in chunked(ids):
+        params = ', '.join('?' * len(chunk))
+        if backend == 'keyword':
+            matches = [_keyword_prefix(term) for term in terms]
+            rows = connection.execute(select([ArchiveKeyword.entry_id, func.sum(ArchiveKeyword.weight)]).
+                                      where(ArchiveKeyword.entry_id.in_(chunk)).where(or_(*matches)).
+                                      group_by(ArchiveKeyword.entry_id))
+            scores.update((id, score) for id, score in rows)
+        elif backend == 'fts5':
+            rows = connection.execute('SELECT rowid, bm25(%s, %s, %s) FROM %s WHERE %s MATCH ? AND rowid IN (%s)' %
+                                      (FTS_TABLE, TITLE_WEIGHT, DESCRIPTION_WEIGHT, FTS_TABLE, FTS_TABLE, params),
+                                      [_fts_expression(terms)] + chunk)
+            # bm25 is negative, smaller being more relevant
+            scores.update((id, -score) for id, score in rows)
+        else:
+            rows = connection.execute('SELECT rowid, offsets(%s) FROM %s WHERE %s MATCH ? AND rowid IN (%s)' %
+                                      (FTS_TABLE, FTS_TABLE, FTS_TABLE, params),
+                                      [_fts_expression(terms)] + chunk)
+            for id, offsets in rows:
+                # offsets are groups of 4 integers: column, term, byte offset, size
+                columns = offsets.split()[::4]
+                scores[id] = sum(TITLE_WEIGHT if column == '0' else DESCRIPTION_WEIGHT for column in columns)
+    return scores
+
+
+def _index_inserted(mapper, connection, target):
+    index_entries(connection, [(target.id, target.title, target.description)])
+
+
+def _index_updated(mapper, connection, target):
+    if get_history(target, 'title').has_changes() or get_history(target, 'description').has_changes():
+        unindex_entries(connection, [target.id])
+        index_entries(connection, [(target.id, target.title, target.description)])
+
+
+def _index_deleted(mapper, connection, target):
+    unindex_entries(connection, [target.id])
+
+
+def _archive_created(target, connection, **kw):
+    """Freshly created archive (eg. --reset) must not find rows from a previous full-text index."""
+    connection.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+    _index_backends.pop(connection.engine, None)
+
+listen(ArchiveEntry, 'after_insert', _index_inserted)
+listen(ArchiveEntry, 'after_update', _index_updated)
+listen(ArchiveEntry, 'after_delete', _index_deleted)
+listen(ArchiveEntry.__table__, 'after_create', _archive_created)
+
+
 def get_source(name, session):
     """
     :param string name: Source name
@@ -103,6 +336,98 @@ def get_tag(name, session):
         return source
 
 
+def resolve_ids(session, model, names):
+    """
+    Resolves :class:`ArchiveTag` or :class:`ArchiveSource` ids with one query, creating the missing ones.
+
+    :param session: SQLAlchemy session
+    :param model: ArchiveTag or ArchiveSource
+    :param names: Iterable of names
+    :return: Dict of ids by name
+    """
+    table = model.__table__
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict((name, id) for id, name in
+               session.execute(select([table.c.id, table.c.name]).where(table.c.name.in_(names))))
+    for name in names - set(ids):
+        ids[name] = session.execute(table.insert().values(name=name)).inserted_primary_key[0]
+    return ids
+
+
+def archive_entries(session, entries, source_name, tag_names=None):
+    """
+    Adds entries into archive with bulk statements. Entries already in archive (by title and url) get the
+    source and tags added if they are missing.
+
+    :param session: SQLAlchemy session
+    :param entries: List of :class:`~flexget.entry.Entry`
+    :param string source_name: Source to be added for entries, usually name of the feed
+    :param list tag_names: Optional list of tags to be added for entries
+    :return: Number of new entries archived
+    """
+    entry_table = ArchiveEntry.__table__
+    source_id = resolve_ids(session, ArchiveSource, [source_name])[source_name]
+    tag_ids = resolve_ids(session, ArchiveTag, tag_names or []).values()
+
+    # unique by (title, url), first one wins, archived in feed order
+    items = {}
+    keys = []
+    for entry in entries:
+        key = (entry['title'], entry['url'])
+        if key not in items:
+            items[key] = entry
+            keys.append(key)
+
+    def lookup(keys):
+        """:return: Dict of archived ids by (title, url) for given keys"""
+        found = {}
+        keys = list(keys)
+        # other archived entries may share a title with the given ones
+        wanted = set(keys)
+        for chunk in chunked(keys):
+            titles = set(title for title, url in chunk)
+            for id, title, url in session.execute(select([entry_table.c.id, entry_table.c.title, entry_table.c.url]).
+                                                  where(entry_table.c.title.in_(titles))):
+                if (title, url) in wanted:
+                    found.setdefault((title, url), id)
+        return found
+
+    existing = lookup(keys)
+    new = [key for key in keys if key not in existing]
+    if new:
+        now = datetime.now()
+        rows = []
+        for key in new:
+            entry = items[key]
+            rows.append({'title': key[0], 'url': key[1], 'description': entry.get('description'),
+                         'feed': source_name, 'added': now})
+        session.execute(entry_table.insert(), rows)
+        # executemany does not return primary keys
+        created = lookup(new)
+        index_entries(session.connection(), [(created[key], key[0], items[key].get('description'))
+                                             for key in new])
+    else:
+        created = {}
+
+    # associate source and tags, only those missing from already archived entries
+    for table, column, values in ((archive_sources_table, 'source_id', [source_id]),
+                                  (archive_tags_table, 'tag_id', tag_ids)):
+        if not values:
+            continue
+        missing = set((id, value) for id in existing.itervalues() for value in values)
+        ids = list(existing.itervalues())
+        for chunk in chunked(ids):
+            for row in session.execute(select([table.c.entry_id, table.c[column]]).
+                                       where(table.c.entry_id.in_(chunk))):
+                missing.discard(tuple(row))
+        pairs = list(missing) + [(id, value) for id in created.itervalues() for value in values]
+        if pairs:
+            session.execute(table.insert(), [{'entry_id': id, column: value} for id, value in pairs])
+    return len(created)
+
+
 @schema.upgrade('archive')
 def upgrade(ver, session):
     if ver is None:
@@ -129,6 +454,11 @@ def upgrade(ver, session):
             log.critical('one time when you have time, it may take hours')
             log.critical('----------------------------------------------')
         ver = 0
+    if ver == 0:
+        log.info('Building archive search index (may take a while) ...')
+        count = rebuild_index(session)
+        log.info('Indexed %i archived entries' % count)
+        ver = 1
     return ver
 
 
@@ -155,49 +485,16 @@ class Archive(object):
         else:
             tag_names = config
 
-        tags = []
-        for tag_name in set(tag_names):
-            tags.append(get_tag(tag_name, feed.session))
-
-        count = 0
-        processed = []
+        # I think entry can be in multiple of those lists .. not sure though!
+        entries = []
+        processed = set()
         for entry in feed.entries + feed.rejected + feed.failed:
-            # I think entry can be in multiple of those lists .. not sure though!
-            if entry in processed:
+            if id(entry) in processed:
                 continue
-            else:
-                processed.append(entry)
-
-            ae = feed.session.query(ArchiveEntry).\
-                 filter(ArchiveEntry.title == entry['title']).\
-                 filter(ArchiveEntry.url == entry['url']).first()
-            if ae:
-                # add (missing) sources
-                source = get_source(feed.name, feed.session)
-                if not source in ae.sources:
-                    log.debug('Adding `%s` into `%s` sources' % (feed.name, ae))
-                    ae.sources.append(source)
-                # add (missing) tags
-                for tag_name in tag_names:
-                    atag = get_tag(tag_name, feed.session)
-                    if not atag in ae.tags:
-                        log.debug('Adding tag %s into %s' % (tag_name, ae))
-                        ae.tags.append(atag)
-            else:
-                # create new archive entry
-                ae = ArchiveEntry()
-                ae.title = entry['title']
-                ae.url = entry['url']
-                if 'description' in entry:
-                    ae.description = entry['description']
-                ae.feed = feed.name
-                ae.sources.append(get_source(feed.name, feed.session))
-                if tags:
-                    # note, we're extending empty list
-                    ae.tags.extend(tags)
-                log.debug('Adding `%s` with %i tags to archive' % (ae, len(tags)))
-                feed.session.add(ae)
-                count += 1
+            processed.add(id(entry))
+            entries.append(entry)
+
+        count = archive_entries(feed.session, entries, feed.name, tag_names)
         if count:
             log.verbose('Added %i new entries to archive' % count)
 
@@ -365,61 +662,220 @@ class UrlrewriteArchive(object):
             session.close()
 
 
-def consolidate():
+# how many (title, url) groups are consolidated per transaction
+CONSOLIDATE_CHUNK_SIZE = 1000
+
+
+class Consolidator(object):
     """
     Converts previous archive data model to new one.
+
+    Entries are streamed grouped by (title, url), each group is merged into its oldest entry which gets the legacy
+    feeds of the whole group as sources. Work is committed in chunks and the position is stored so that an
+    interrupted consolidation continues from where it was left. Progress is available from :attr:`stats`.
     """
 
-    session = Session()
-    try:
-        log.verbose('Checking archive size ...')
-        count = session.query(ArchiveEntry).count()
-        log.verbose('Found %i items to migrate, this can be aborted with CTRL-C safely.' % count)
+    CHECKPOINT_KEY = 'consolidate_checkpoint'
 
-        # consolidate old data
-        from progressbar import ProgressBar, Percentage, Bar, ETA
+    def __init__(self, chunk_size=CONSOLIDATE_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.stats = {'total': 0, 'processed': 0, 'groups': 0, 'duplicates': 0, 'chunks': 0,
+                      'started': None, 'finished': None, 'running': False}
+        self._stop = False
+        # source name -> id
+        self._sources = {}
 
-        widgets = ['Process - ', ETA(), ' ', Percentage(), ' ', Bar(left='[', right=']')]
-        bar = ProgressBar(widgets=widgets, maxval=count).start()
+    def stop(self):
+        """Request consolidation to stop after the current chunk, it can be resumed later."""
+        self._stop = True
 
-        # id's for duplicates
-        duplicates = []
+    def run(self, progress=None):
+        """
+        :param progress: Optional function called with :attr:`stats` after each chunk
+        :return: True if consolidation was completed, False if it was stopped or not needed
+        """
+        from flexget.utils.simple_persistence import SimplePersistence
 
-        for index, orig in enumerate(session.query(ArchiveEntry).yield_per(5)):
-            bar.update(index)
+        self._stop = False
+        self.stats.update(started=datetime.now(), finished=None, running=True)
+        session = Session()
+        try:
+            persistence = SimplePersistence('archive', session=session)
+            checkpoint = persistence.get(self.CHECKPOINT_KEY)
+            self.stats['total'] = session.query(ArchiveEntry).count()
+            if checkpoint is None:
+                first = session.query(ArchiveEntry).order_by(ArchiveEntry.id).first()
+                if first and first.sources:
+                    log.info('Database looks like it has already been consolidated, '
+                             'item %s has already sources ...' % first.title)
+                    return False
+            else:
+                log.verbose('Resuming consolidation after `%s`' % checkpoint[0])
+                self.stats['processed'] = self._count_until(session, checkpoint)
 
-            # item already processed
-            if orig.id in duplicates:
-                continue
+            while not self._stop:
+                groups = self._next_groups(session, checkpoint)
+                if not groups:
+                    break
+                self._consolidate_groups(session, groups)
+                checkpoint = tuple(groups[-1][:2])
+                persistence[self.CHECKPOINT_KEY] = checkpoint
+                session.commit()
+                self.stats['chunks'] += 1
+                if progress:
+                    progress(self.stats)
+            else:
+                log.info('Consolidation stopped, it will continue from where it was left next time.')
+                return False
+
+            del persistence[self.CHECKPOINT_KEY]
+            session.commit()
+            log.info('Completed! Removed %i duplicates. This does NOT need to be ran again.' %
+                     self.stats['duplicates'])
+            return True
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+            self.stats.update(finished=datetime.now(), running=False)
+
+    def _after(self, checkpoint):
+        entry_table = ArchiveEntry.__table__
+        title, url = checkpoint
+        # NULLs sort first, comparisons with NULL would be NULL and drop the rows from both sides of checkpoint
+        if title is None:
+            later_title, same_title = entry_table.c.title != None, entry_table.c.title == None
+        else:
+            later_title = and_(entry_table.c.title != None, entry_table.c.title > title)
+            same_title = entry_table.c.title == title
+        if url is None:
+            later_url = entry_table.c.url != None
+        else:
+            later_url = and_(entry_table.c.url != None, entry_table.c.url > url)
+        return or_(later_title, and_(same_title, later_url))
 
-            # item already migrated
-            if orig.sources:
-                log.info('Database looks like it has already been consolidated, '
-                         'item %s has already sources ...' % orig.title)
-                session.rollback()
-                return
+    def _count_until(self, session, checkpoint):
+        """Number of entries already consolidated before *checkpoint*"""
+        return session.query(ArchiveEntry).filter(not_(self._after(checkpoint))).count()
 
-            # add legacy feed to the sources list
-            orig.sources.append(get_source(orig.feed, session))
-            # remove feed, deprecated .. well, let's still keep it ..
-            #orig.feed = None
+    def _next_groups(self, session, checkpoint):
+        """
+        :return: List of (title, url, oldest id, count, feed) for next chunk of groups, in index order.
+        """
+        entry_table = ArchiveEntry.__table__
+        query = select([entry_table.c.title, entry_table.c.url, func.min(entry_table.c.id),
+                        func.count(entry_table.c.id), func.min(entry_table.c.feed)])
+        if checkpoint is not None:
+            query = query.where(self._after(checkpoint))
+        query = query.group_by(entry_table.c.title, entry_table.c.url).\
+            order_by(entry_table.c.title, entry_table.c.url).limit(self.chunk_size)
+        return session.execute(query).fetchall()
+
+    def _source_id(self, session, name):
+        if name not in self._sources:
+            self._sources.update(resolve_ids(session, ArchiveSource, [name]))
+        return self._sources[name]
+
+    def _consolidate_groups(self, session, groups):
+        entry_table = ArchiveEntry.__table__
+        # keeper id -> set of source ids it should have
+        keeper_sources = {}
+        for title, url, keeper, count, feed in groups:
+            keeper_sources[keeper] = set()
+            if count == 1 and feed is not None:
+                keeper_sources[keeper].add(self._source_id(session, feed))
+
+        # resolve members of groups having duplicates with one query
+        dupe_groups = dict(((title, url), keeper) for title, url, keeper, count, feed in groups if count > 1)
+        duplicates = {}
+        if dupe_groups:
+            titles = set(title for title, url in dupe_groups)
+            conditions = [entry_table.c.title.in_(chunk) for chunk in chunked(titles - set([None]))]
+            if None in titles:
+                # IN does not match NULL
+                conditions.append(entry_table.c.title == None)
+            for condition in conditions:
+                members = session.execute(select([entry_table.c.id, entry_table.c.title, entry_table.c.url,
+                                                  entry_table.c.feed]).where(condition))
+                for id, title, url, feed in members:
+                    keeper = dupe_groups.get((title, url))
+                    if keeper is None:
+                        continue
+                    if feed is not None:
+                        keeper_sources[keeper].add(self._source_id(session, feed))
+                    if id != keeper:
+                        duplicates[id] = keeper
 
-            for dupe in session.query(ArchiveEntry).\
-                        filter(ArchiveEntry.id != orig.id).\
-                        filter(ArchiveEntry.title == orig.title).\
-                        filter(ArchiveEntry.url == orig.url).all():
-                orig.sources.append(get_source(dupe.feed, session))
-                duplicates.append(dupe.id)
+        # move sources and tags of duplicates into the keepers
+        keeper_tags = {}
+        if duplicates:
+            for table, target in ((archive_sources_table, keeper_sources), (archive_tags_table, keeper_tags)):
+                column = table.c.source_id if table is archive_sources_table else table.c.tag_id
+                for chunk in chunked(duplicates):
+                    for entry_id, value in session.execute(select([table.c.entry_id, column]).
+                                                           where(table.c.entry_id.in_(chunk))):
+                        target.setdefault(duplicates[entry_id], set()).add(value)
+
+        # add only missing associations
+        for table, target in ((archive_sources_table, keeper_sources), (archive_tags_table, keeper_tags)):
+            column = table.c.source_id if table is archive_sources_table else table.c.tag_id
+            if not any(target.itervalues()):
+                continue
+            for chunk in chunked(target):
+                for entry_id, value in session.execute(select([table.c.entry_id, column]).
+                                                       where(table.c.entry_id.in_(chunk))):
+                    target[entry_id].discard(value)
+            rows = [{'entry_id': entry_id, column.name: value}
+                    for entry_id, values in target.iteritems() for value in values]
+            if rows:
+                session.execute(table.insert(), rows)
 
         if duplicates:
-            log.info('Consolidated %i items, removing duplicates ...' % len(duplicates))
-            for id in duplicates:
-                session.query(ArchiveEntry).filter(ArchiveEntry.id == id).delete()
-        session.commit()
-        log.info('Completed! This does NOT need to be ran again.')
+            for chunk in chunked(duplicates):
+                session.execute(archive_sources_table.delete().where(archive_sources_table.c.entry_id.in_(chunk)))
+                session.execute(archive_tags_table.delete().where(archive_tags_table.c.entry_id.in_(chunk)))
+                session.execute(entry_table.delete().where(entry_table.c.id.in_(chunk)))
+            unindex_entries(session.connection(), duplicates.keys())
+
+        self.stats['groups'] += len(groups)
+        self.stats['processed'] += sum(group[3] for group in groups)
+        self.stats['duplicates'] += len(duplicates)
+
+
+def consolidate():
+    """
+    Converts previous archive data model to new one.
+    """
+    from progressbar import ProgressBar, Percentage, Bar, ETA
+
+    consolidator = Consolidator()
+    widgets = ['Process - ', ETA(), ' ', Percentage(), ' ', Bar(left='[', right=']')]
+    bar = ProgressBar(widgets=widgets)
+
+    def progress(stats):
+        if bar.start_time is None:
+            bar.maxval = stats['total'] or 1
+            bar.start()
+        bar.update(min(stats['processed'], bar.maxval))
+
+    try:
+        log.verbose('Consolidating archive, this can be aborted with CTRL-C safely and continued later.')
+
+        consolidator.run(progress)
     except KeyboardInterrupt:
-        session.rollback()
-        log.critical('Aborted, no changes saved')
+        log.critical('Aborted, progress of the current chunk was not saved')
+
+
+def reindex():
+    """Rebuilds the archive search index."""
+
+    session = Session()
+    try:
+        log.verbose('Rebuilding archive search index ...')
+        count = rebuild_index(session)
+        session.commit()
+        log.info('Indexed %i archived entries' % count)
     finally:
         session.close()
 
@@ -462,27 +918,45 @@ def tag_source(source_name, tag_names=None):
 
 
 # API function, was also used from webui .. needs to be rethinked
-def search(session, text, tags=None, sources=None, desc=False):
+def search(session, text, tags=None, sources=None, desc=False, ranked=False, limit=None):
     """
     Search from the archive.
 
-    :param string text: Search keywords, spaces will be replaced with %
+    :param string text: Search keywords, all of them must be found from title or description (as prefixes)
     :param Session session: SQLAlchemy session, should not be closed while iterating results.
     :param list tags: Optional list of acceptable tags
     :param list sources: Optional list of acceptable sources
     :param bool desc: Sort results descending
+    :param bool ranked: Sort results by relevance instead of age
+    :param int limit: Optional maximum number of results
     :return: ArchiveEntries responding to query
     """
-    keyword = unicode(text).replace(' ', '%')
-    query = session.query(ArchiveEntry).filter(ArchiveEntry.title.like('%' + keyword + '%'))
+    terms = tokenize(text)
+    if not terms:
+        return
+    connection = session.connection()
+    query = session.query(ArchiveEntry).filter(ArchiveEntry.id.in_(_match_query(connection, terms)))
     if tags:
         query = query.filter(ArchiveEntry.tags.any(ArchiveTag.name.in_(tags)))
     if sources:
         query = query.filter(ArchiveEntry.sources.any(ArchiveSource.name.in_(sources)))
+    if ranked:
+        ids = [id for id, in query.with_entities(ArchiveEntry.id)]
+        scores = _scores(connection, terms, ids)
+        ids.sort(key=lambda id: scores.get(id, 0), reverse=not desc)
+        if limit is not None:
+            ids = ids[:limit]
+        for chunk in chunked(ids):
+            by_id = dict((a.id, a) for a in session.query(ArchiveEntry).filter(ArchiveEntry.id.in_(chunk)))
+            for id in chunk:
+                yield by_id[id]
+        return
     if desc:
-        query = query.order_by(ArchiveEntry.added.desc())
+        query = query.order_by(ArchiveEntry.added.desc(), ArchiveEntry.id.desc())
     else:
-        query = query.order_by(ArchiveEntry.added.asc())
+        query = query.order_by(ArchiveEntry.added.asc(), ArchiveEntry.id.asc())
+    if limit is not None:
+        query = query.limit(limit)
     for a in query.yield_per(5):
         yield a
 
@@ -493,7 +967,7 @@ class ArchiveCli(object):
     """
 
     options = {}
-    ACTIONS = ('consolidate', 'search', 'inject', 'tag-source', 'test')
+    ACTIONS = ('consolidate', 'search', 'inject', 'tag-source', 'reindex', 'test')
 
     @staticmethod
     def optik(option, opt, value, parser):
@@ -506,6 +980,7 @@ class ArchiveCli(object):
             console(' inject ID [ID] [yes]      Inject as accepted from archive by ID\'s. '
                     'If yes is given immortal flag will be used.')
             console(' tag-source SRC TAG [TAG]  Tag all archived items within source with given tag.')
+            console(' reindex                   Rebuild the search index.')
             import sys
 
             sys.exit(1)
@@ -556,6 +1031,8 @@ class ArchiveCli(object):
                     console('IDs must be separated with space now!')
         elif action == 'consolidate':
             consolidate()
+        elif action == 'reindex':
+            reindex()
         elif action == 'search':
             tags = []
             for arg in args[:]:
@@ -589,7 +1066,7 @@ class ArchiveCli(object):
                 console('Tags: %s' % ', '.join(tags))
             console('Please wait ...')
             console('')
-            for ae in search(session, search_term, tags):
+            for ae in search(session, search_term, tags, ranked=True):
                 print_ae(ae)
         finally:
             session.close()
@@ -613,5 +1090,5 @@ register_plugin(UrlrewriteArchive, 'flexget_archive', groups=['search'])
 register_plugin(ArchiveCli, '--archive-cli', builtin=True, api_ver=2)
 register_parser_option('--archive', action='callback', callback=ArchiveCli.optik,
                        metavar='ARGS',
-                       help='Access [search|inject|tag-source|consolidate] functionalities. '
+                       help='Access [search|inject|tag-source|consolidate|reindex] functionalities. '
                             'Without any args display help about those.')
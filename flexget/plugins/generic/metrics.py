@@ -0,0 +1,86 @@
+"""
+Feeds :mod:`flexget.utils.metrics` from feed executions, HTTP requests and database commits.
+
+Metrics are collected only when enabled, eg. with webui --metrics, see /metrics route in :mod:`flexget.ui.webui`.
+"""
+
+import logging
+import time
+from urlparse import urlparse
+from weakref import WeakKeyDictionary
+from sqlalchemy import event as sqlalchemy_event
+from flexget.event import event
+from flexget.manager import Session
+from flexget.utils import metrics
+
+log = logging.getLogger('metrics')
+
+feed_executions = metrics.counter('flexget_feed_executions_total', 'Completed feed executions', ['feed'])
+feed_duration = metrics.histogram('flexget_feed_duration_seconds', 'Feed execution time', ['feed'])
+feed_entries = metrics.counter('flexget_feed_entries_total', 'Entries by the state they had at the end of feed '
+                               'execution, produced counts all entries', ['feed', 'state'])
+http_requests = metrics.counter('flexget_http_requests_total', 'HTTP requests by response status', ['host', 'status'])
+http_errors = metrics.counter('flexget_http_errors_total', 'Failed HTTP requests, including error statuses',
+                              ['host', 'error'])
+db_commit = metrics.histogram('flexget_db_commit_seconds', 'Database commit time',
+                              buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+# feed name -> execution start time
+_started = {}
+# session -> commit start time
+_commits = WeakKeyDictionary()
+
+
+def _host(url):
+    # urlopener reports only the host for Request objects
+    return urlparse(url).hostname or url.split('/')[0]
+
+
+@event('feed.execute.started')
+def feed_started(feed):
+    if metrics.enabled:
+        _started[feed.name] = time.time()
+
+
+@event('feed.execute.completed')
+def feed_completed(feed):
+    started = _started.pop(feed.name, None)
+    if not metrics.enabled or started is None:
+        return
+    feed_executions.inc(feed=feed.name)
+    feed_duration.observe(time.time() - started, feed=feed.name)
+    for state, entries in (('produced', feed.entries), ('accepted', feed.accepted), ('rejected', feed.rejected),
+                           ('failed', feed.failed)):
+        feed_entries.inc(len(entries), feed=feed.name, state=state)
+
+
+@event('http.response')
+def http_response(url, size, status):
+    if metrics.enabled:
+        http_requests.inc(host=_host(url), status=status)
+
+
+@event('http.error')
+def http_error(url, error):
+    if not metrics.enabled:
+        return
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    if status:
+        http_requests.inc(host=_host(url), status=status)
+    http_errors.inc(host=_host(url), error=status or type(error).__name__)
+
+
+def _before_commit(session):
+    if metrics.enabled:
+        _commits[session] = time.time()
+
+
+def _after_commit(session):
+    started = _commits.pop(session, None)
+    if started is not None:
+        db_commit.observe(time.time() - started)
+
+
+sqlalchemy_event.listen(Session, 'before_commit', _before_commit)
+sqlalchemy_event.listen(Session, 'after_commit', _after_commit)
@@ -0,0 +1,282 @@
+"""
+Profiles plugin execution.
+
+For every (feed, phase, plugin) records wall time, database queries, ORM instances loaded, HTTP requests, response
+bytes and number of feed entries before and after the plugin. Counters are kept per execution in the thread running
+it, so concurrent executions (webui, scheduler) do not count each others work. Results of recent executions are kept in the
+database and can be exported as JSON or CSV with --perf-export, or browsed in the webui.
+
+Profiling is enabled with --debug-perf, or by setting :data:`enabled` (webui does this).
+"""
+
+import csv
+import logging
+import threading
+import time
+from datetime import datetime
+from optparse import SUPPRESS_HELP
+from weakref import WeakKeyDictionary
+from sqlalchemy import Column, Integer, String, Unicode, DateTime, Float, ForeignKey, event as sqlalchemy_event, func
+from sqlalchemy.orm import relation, Mapper
+from flexget import schema
+from flexget.event import event
+from flexget.manager import Session
+from flexget.plugin import register_parser_option
+from flexget.utils import json
+from flexget.utils.sqlalchemy_utils import drop_tables
+
+log = logging.getLogger('performance')
+Base = schema.versioned_base('performance', 1)
+
+# number of executions kept in the database
+HISTORY_SIZE = 50
+
+# columns of the exported data, in order
+FIELDS = ['execution', 'started', 'feed', 'phase', 'plugin', 'wall', 'queries', 'rows', 'requests', 'bytes',
+          'entries_in', 'entries_out']
+
+# counters which are sampled before and after each plugin
+COUNTERS = ['queries', 'rows', 'requests', 'bytes']
+
+# profiling enabled regardless of --debug-perf
+enabled = False
+
+# process wide totals, see log_query_count
+counters = dict.fromkeys(COUNTERS, 0)
+
+# state of the execution running in current thread: results, dict of (feed, phase, plugin) -> dict of values,
+# counters of the plugin running and values at its start
+_local = threading.local()
+# engines which have query counting installed
+_engines = WeakKeyDictionary()
+
+
+@schema.upgrade('performance')
+def upgrade(ver, session):
+    if ver == 0:
+        # cpu time was process wide, history is dropped along with it
+        drop_tables(['perf_record', 'perf_execution'], session)
+        Base.metadata.create_all(bind=session.bind)
+        ver = 1
+    return ver
+
+
+class PerfExecution(Base):
+
+    __tablename__ = 'perf_execution'
+
+    id = Column(Integer, primary_key=True)
+    started = Column(DateTime)
+    records = relation('PerfRecord', backref='execution', cascade='all, delete, delete-orphan')
+
+    def __init__(self):
+        self.started = datetime.now()
+
+
+class PerfRecord(Base):
+
+    __tablename__ = 'perf_record'
+
+    id = Column(Integer, primary_key=True)
+    execution_id = Column(Integer, ForeignKey('perf_execution.id'), index=True)
+    feed = Column(Unicode)
+    phase = Column(String)
+    plugin = Column(String, index=True)
+    wall = Column(Float)
+    queries = Column(Integer)
+    rows = Column(Integer)
+    requests = Column(Integer)
+    bytes = Column(Integer)
+    entries_in = Column(Integer)
+    entries_out = Column(Integer)
+
+    def as_dict(self):
+        values = dict((field, getattr(self, field, None)) for field in FIELDS)
+        values['execution'] = self.execution_id
+        values['started'] = self.execution.started.isoformat()
+        return values
+
+    def __repr__(self):
+        return '<PerfRecord(feed=%s,phase=%s,plugin=%s,wall=%.3f)>' % (self.feed, self.phase, self.plugin, self.wall)
+
+
+def is_enabled(manager):
+    return enabled or getattr(manager.options, 'debug_perf', False)
+
+
+def _count(name, amount=1):
+    counters[name] += amount
+    plugin_counters = getattr(_local, 'counters', None)
+    if plugin_counters is not None:
+        plugin_counters[name] += amount
+
+
+def log_query_count(name_point):
+    """Debugging purposes, allows logging number of executed queries at :name_point:"""
+    log.info('At point named `%s` total of %s queries were ran' % (name_point, counters['queries']))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _count('queries')
+
+
+def _load(target, context):
+    _count('rows')
+
+
+@event('http.response')
+def _http_response(url, size, status):
+    _count('requests')
+    _count('bytes', size)
+
+
+def install(engine):
+    """Start counting queries ran in *engine* and loaded ORM instances, does nothing if already counting."""
+    if engine not in _engines:
+        sqlalchemy_event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        _engines[engine] = True
+    if Mapper not in _engines:
+        # listens to all mappers, there is no way to remove listeners so this is done only once
+        sqlalchemy_event.listen(Mapper, 'load', _load)
+        _engines[Mapper] = True
+
+
+@event('manager.startup')
+def startup(manager):
+    if manager.options.debug_perf:
+        log.info('Enabling plugin and SQLAlchemy performance debugging')
+        # installed here already so that log_query_count works outside executions
+        install(manager.engine)
+
+
+@event('manager.execute.started')
+def start(manager):
+    if not is_enabled(manager):
+        return
+    install(manager.engine)
+    _local.results = {}
+    _local.counters = None
+
+
+@event('feed.execute.before_plugin')
+def before_plugin(feed, keyword):
+    if getattr(_local, 'results', None) is None:
+        return
+    _local.counters = dict.fromkeys(COUNTERS, 0)
+    _local.start = (time.time(), len(feed.entries))
+
+
+@event('feed.execute.after_plugin')
+def after_plugin(feed, keyword):
+    plugin_counters = getattr(_local, 'counters', None)
+    if getattr(_local, 'results', None) is None or plugin_counters is None:
+        return
+    started, entries_in = _local.start
+    _local.counters = None
+    result = _local.results.setdefault((feed.name, feed.current_phase, keyword), dict.fromkeys(FIELDS[5:], 0))
+    result['wall'] += time.time() - started
+    for name in COUNTERS:
+        result[name] += plugin_counters[name]
+    # plugins running more than once in a phase (eg. reruns) report entries of the first run
+    if not result['entries_in']:
+        result['entries_in'] = entries_in
+    result['entries_out'] = len(feed.entries)
+
+
+@event('manager.execute.completed')
+def completed(manager):
+    results = getattr(_local, 'results', None)
+    if results is None:
+        return
+    _local.results = _local.counters = None
+    for (feed, phase, plugin), result in sorted(results.iteritems(), key=lambda item: item[1]['wall'], reverse=True):
+        if result['wall'] > 0.1 or result['queries'] > 10:
+            log.info('%-15s %-10s %-15s took %0.2f sec (%s queries, %s requests)' %
+                     (feed, phase, plugin, result['wall'], result['queries'], result['requests']))
+    if manager.options.test:
+        return
+    session = Session()
+    try:
+        save(session, results)
+        session.commit()
+    finally:
+        session.close()
+
+
+def save(session, results):
+    """
+    Store results of one execution and drop executions older than :data:`HISTORY_SIZE`.
+
+    :param results: Dict of (feed, phase, plugin) -> dict of values
+    """
+    execution = PerfExecution()
+    for (feed, phase, plugin), values in results.iteritems():
+        record = PerfRecord(feed=feed, phase=phase, plugin=plugin)
+        for name, value in values.iteritems():
+            setattr(record, name, value)
+        execution.records.append(record)
+    session.add(execution)
+    session.flush()
+    for old in session.query(PerfExecution).order_by(PerfExecution.id.desc()).offset(HISTORY_SIZE):
+        session.delete(old)
+    return execution
+
+
+def records(session, executions=None):
+    """Return records of the latest *executions*, all by default, oldest first."""
+    query = session.query(PerfRecord).join(PerfExecution)
+    if executions:
+        latest = session.query(PerfExecution.id).order_by(PerfExecution.id.desc()).limit(executions).subquery()
+        query = query.filter(PerfRecord.execution_id.in_(latest))
+    return query.order_by(PerfRecord.execution_id, PerfRecord.id).all()
+
+
+def hottest(session, executions=10, limit=20):
+    """
+    Plugins which used most time in the latest *executions*.
+
+    :return: List of dicts with plugin name, totals of wall time, queries and requests, and number of runs
+    """
+    latest = session.query(PerfExecution.id).order_by(PerfExecution.id.desc()).limit(executions).subquery()
+    wall = func.sum(PerfRecord.wall)
+    query = session.query(PerfRecord.plugin, wall, func.sum(PerfRecord.queries),
+                          func.sum(PerfRecord.requests), func.count(PerfRecord.id)).\
+        filter(PerfRecord.execution_id.in_(latest)).group_by(PerfRecord.plugin).order_by(wall.desc()).limit(limit)
+    return [dict(zip(['plugin', 'wall', 'queries', 'requests', 'runs'], row)) for row in query]
+
+
+def export(session, fileobj, format='json'):
+    """Write all stored records to *fileobj* as json or csv."""
+    rows = [record.as_dict() for record in records(session)]
+    if format == 'csv':
+        writer = csv.DictWriter(fileobj, FIELDS)
+        writer.writerow(dict(zip(FIELDS, FIELDS)))
+        for row in rows:
+            writer.writerow(dict((key, unicode(value).encode('utf-8')) for key, value in row.iteritems()))
+    else:
+        json.dump(rows, fileobj, indent=2)
+
+
+@event('manager.startup')
+def export_cli(manager):
+    filename = manager.options.perf_export
+    if not filename:
+        return
+    manager.disable_feeds()
+    session = Session()
+    try:
+        export_file = open(filename, 'wb')
+        try:
+            export(session, export_file, 'csv' if filename.lower().endswith('.csv') else 'json')
+        finally:
+            export_file.close()
+    finally:
+        session.close()
+    log.info('Exported performance history to %s' % filename)
+
+
+register_parser_option('--debug-perf', action='store_true', dest='debug_perf', default=False,
+                       help=SUPPRESS_HELP)
+register_parser_option('--perf-export', action='store', dest='perf_export', metavar='FILE',
+                       help='Export recorded plugin performance history to FILE, as CSV if FILE ends with .csv, '
+                            'otherwise as JSON.')
@@ -1,17 +1,17 @@
 import logging
 import pickle
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, PickleType, Index
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Index
 from flexget import schema
 from flexget.entry import Entry
 from flexget.manager import Session
 from flexget.plugin import register_plugin, priority
-from flexget.utils.database import safe_pickle_synonym
+from flexget.utils.database import serialized_synonym, migrate_pickle_column
 from flexget.utils.sqlalchemy_utils import table_schema
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('backlog')
-Base = schema.versioned_base('backlog', 1)
+Base = schema.versioned_base('backlog', 2)
 
 
 @schema.upgrade('backlog')
@@ -32,6 +32,10 @@ def upgrade(ver, session):
         log.info('Creating index on backlog table.')
         Index('ix_backlog_feed_expire', backlog_table.c.feed, backlog_table.c.expire).create(bind=session.bind)
         ver = 1
+    if ver == 1:
+        log.info('Converting backlog entries from pickle ...')
+        migrate_pickle_column(session, 'backlog', 'entry')
+        ver = 2
     return ver
 
 
@@ -43,8 +47,8 @@ class BacklogEntry(Base):
     feed = Column(String)
     title = Column(String)
     expire = Column(DateTime)
-    _entry = Column('entry', PickleType(mutable=False))
-    entry = safe_pickle_synonym('_entry')
+    _entry = Column('entry', LargeBinary)
+    entry = serialized_synonym('_entry')
 
     def __repr__(self):
         return '<BacklogEntry(title=%s)>' % (self.title)
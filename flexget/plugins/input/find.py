@@ -2,12 +2,117 @@ import logging
 import os
 import re
 import sys
+import threading
+from fnmatch import translate
+from Queue import Queue
 from flexget.entry import Entry
 from flexget.plugin import register_plugin
+from flexget.utils import fs_watch
 from flexget.utils.cached_input import cached
 
 log = logging.getLogger('find')
 
+# directories listed at the same time by default, listing is mostly waiting for the disk or network mount
+DEFAULT_THREADS = 4
+
+
+def _list_dir(path):
+    """:return: Tuple of subdirectory names, file names and paths of subdirectories which are not links"""
+    dirs, files, walkable = [], [], []
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if os.path.isdir(full):
+            dirs.append(name)
+            if not os.path.islink(full):
+                walkable.append(full)
+        else:
+            files.append(name)
+    return dirs, files, walkable
+
+
+def scan(path, threads=DEFAULT_THREADS, max_depth=None, prune=None):
+    """
+    Walk directory tree under *path* like :func:`os.walk`, listing up to *threads* directories at the same time.
+
+    Directories are yielded as soon as they have been listed, parents before their subdirectories but otherwise in no
+    particular order. Subdirectories are listed while the caller processes results.
+
+    :param int max_depth: How many levels of subdirectories are entered, 0 lists only *path*. Default is no limit.
+    :param prune: Function called with a subdirectory name, returning True if it should not be entered.
+    :return: Generator of (path, subdirectory names, file names)
+    """
+    if max_depth == 0:
+        # single listing, nothing to do in parallel
+        try:
+            dirs, files, walkable = _list_dir(path)
+        except OSError, e:
+            log.warning('Unable to list %s: %s' % (path, e))
+            return
+        yield path, dirs, files
+        return
+    tasks = Queue()
+    results = Queue()
+    stopped = threading.Event()
+
+    def worker():
+        while True:
+            task = tasks.get()
+            if task is None or stopped.isSet():
+                return
+            dirpath, depth = task
+            try:
+                results.put((dirpath, depth, _list_dir(dirpath)))
+            except OSError, e:
+                results.put((dirpath, depth, e))
+
+    workers = [threading.Thread(target=worker, name='find-scan-%s' % i) for i in range(max(1, threads))]
+    for thread in workers:
+        thread.setDaemon(True)
+        thread.start()
+    tasks.put((path, 0))
+    pending = 1
+    try:
+        while pending:
+            dirpath, depth, result = results.get()
+            pending -= 1
+            if isinstance(result, OSError):
+                log.warning('Unable to list %s: %s' % (dirpath, result))
+                continue
+            dirs, files, walkable = result
+            if max_depth is None or depth < max_depth:
+                for subdir in walkable:
+                    if prune and prune(os.path.basename(subdir)):
+                        log.debug('pruned %s' % subdir)
+                        continue
+                    tasks.put((subdir, depth + 1))
+                    pending += 1
+            yield dirpath, dirs, files
+    finally:
+        stopped.set()
+        for thread in workers:
+            tasks.put(None)
+        # workers finish at most the listing they are doing
+        for thread in workers:
+            thread.join()
+
+
+def filter_walk(items, max_depth=None, prune=None):
+    """Apply *max_depth* and *prune* of :func:`scan` to top-down :func:`os.walk` like *items*."""
+    # path -> depth of directories which are entered, first item is the root
+    depths = None
+    for dirpath, dirs, files in items:
+        if depths is None:
+            depths, depth = {}, 0
+        else:
+            depth = depths.pop(dirpath, None)
+            if depth is None:
+                continue
+        if max_depth is None or depth < max_depth:
+            for name in dirs:
+                if not (prune and prune(name)):
+                    depths[os.path.join(dirpath, name)] = depth + 1
+        yield dirpath, dirs, files
+
 
 class InputFind(object):
     """
@@ -28,6 +133,19 @@ class InputFind(object):
             - /storage/movies/
             - /storage/tv/
           regexp: .*\.(avi|mkv)$
+
+        Subdirectories are entered with recursive: yes, or up to max_depth levels deep. Directories matching prune
+        masks are not entered. Directories are listed in parallel by threads (default 4) threads.
+
+        Example:
+
+        find:
+          path: /storage/tv/
+          mask: *.mkv
+          max_depth: 2
+          prune:
+            - .*
+            - Sample
     """
 
     def validator(self):
@@ -38,14 +156,20 @@ class InputFind(object):
         root.accept('text', key='mask')
         root.accept('regexp', key='regexp')
         root.accept('boolean', key='recursive')
+        root.accept('integer', key='max_depth')
+        root.accept('text', key='prune')
+        root.accept('list', key='prune').accept('text')
+        root.accept('integer', key='threads')
         return root
 
     def prepare_config(self, config):
-        from fnmatch import translate
         # If only a single path is passed turn it into a 1 element list
         if isinstance(config['path'], basestring):
             config['path'] = [config['path']]
         config.setdefault('recursive', False)
+        config.setdefault('threads', DEFAULT_THREADS)
+        if isinstance(config.get('prune'), basestring):
+            config['prune'] = [config['prune']]
         # If mask was specified, turn it in to a regexp
         if config.get('mask'):
             config['regexp'] = translate(config['mask'])
@@ -58,6 +182,12 @@ class InputFind(object):
         self.prepare_config(config)
         entries = []
         match = re.compile(config['regexp'], re.IGNORECASE).match
+        prune = None
+        if config.get('prune'):
+            prune = re.compile('|'.join(translate(mask) for mask in config['prune']), re.IGNORECASE).match
+        max_depth = config.get('max_depth')
+        if max_depth is None and not config['recursive']:
+            max_depth = 0
         # Default to utf-8 if we get None from getfilesystemencoding()
         fs_encoding = sys.getfilesystemencoding() or 'utf-8'
         for path in config['path']:
@@ -65,9 +195,16 @@ class InputFind(object):
             # unicode causes problems in here (#989)
             path = path.encode(fs_encoding)
             path = os.path.expanduser(path)
-            for item in os.walk(path):
+            # only recursive scans are worth watching, see --watch-fs
+            tree = fs_watch.tree(path) if max_depth != 0 else None
+            if tree is None:
+                items = scan(path, config['threads'], max_depth, prune)
+            else:
+                items = filter_walk([(root, dirs, files) for root, mtime, dirs, files in tree], max_depth, prune)
+            # directories are scanned in parallel, keep entries in a stable order
+            for item in sorted(items):
                 log.debug('item: %s' % str(item))
-                for name in item[2]:
+                for name in sorted(item[2]):
                     # If mask fails continue
                     if match(name) is None:
                         continue
@@ -86,9 +223,6 @@ class InputFind(object):
                         filepath = '/' + filepath
                     e['url'] = 'file://%s' % (filepath)
                     entries.append(e)
-                # If we are not searching recursively, break after first (base) directory
-                if not config['recursive']:
-                    break
         return entries
 
 register_plugin(InputFind, 'find', api_ver=2)
@@ -4,9 +4,86 @@ import logging
 from flexget.entry import Entry
 from flexget.plugin import register_plugin, register_parser_option, get_plugin_by_name, DependencyError, PluginError
 from flexget.utils.cached_input import cached
+from flexget.utils.simple_persistence import SimplePersistence
 
 log = logging.getLogger('tail')
 
+# bytes read from the file at once
+BLOCK_SIZE = 1024 * 1024
+
+# progress is stored after this many entries, so that an interrupted run continues from there
+CHECKPOINT_INTERVAL = 1000
+
+# regexps using backreferences can not be combined, group numbers would change
+BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def checkpoint_key(filename):
+    return '%s checkpoint' % filename
+
+
+def part_key(filename, part):
+    """Entries found between checkpoints are stored in parts, so that each checkpoint only stores new entries"""
+    return '%s checkpoint %s' % (filename, part)
+
+
+def checkpoint_keys(filename, checkpoint):
+    """:return: Keys of *checkpoint* of *filename* and its parts"""
+    return [checkpoint_key(filename)] + [part_key(filename, part) for part in range(checkpoint.get('parts', 0))]
+
+
+def read_lines(file, position):
+    """
+    Read complete lines of *file* from *position* on in large blocks.
+
+    A line which is not terminated yet is left for next run, it is probably still being written.
+
+    :return: Generator of (position after the line, line)
+    """
+    file.seek(position)
+    rest = ''
+    while True:
+        block = file.read(BLOCK_SIZE)
+        if not block:
+            return
+        lines = (rest + block).split('\n')
+        rest = lines.pop()
+        for line in lines:
+            position += len(line) + 1
+            yield position, line + '\n'
+
+
+class FieldMatcher(object):
+    """
+    Finds values of configured fields from lines.
+
+    Lines are first searched with all regexps combined into one, so lines containing none of the fields are skipped
+    with a single search.
+    """
+
+    def __init__(self, fields):
+        # fields in config order, like they have always been searched
+        self.fields = [(field, re.compile(regexp)) for field, regexp in fields.iteritems()]
+        self.search = None
+        # inline flags would apply to all combined regexps
+        plain = re.compile('').flags
+        if all(regexp.flags == plain and not BACKREFERENCE.search(regexp.pattern) for field, regexp in self.fields):
+            try:
+                self.search = re.compile('|'.join('(?:%s)' % regexp.pattern for field, regexp in self.fields)).search
+            except re.error, e:
+                log.debug('Unable to combine regexps: %s' % e)
+
+    def match(self, line):
+        """:return: List of (field, value) found from *line*"""
+        if self.search and not self.search(line):
+            return []
+        result = []
+        for field, regexp in self.fields:
+            match = regexp.search(line)
+            if match:
+                result.append((field, match.group(1)))
+        return result
+
 
 class ResetTail(object):
     """Adds --tail-reset"""
@@ -26,6 +103,14 @@ class ResetTail(object):
             if not poses:
                 print 'No position stored for file %s' % feed.manager.options.tail_reset
                 print 'Note that file must give in same format as in config, ie. ~/logs/log can not be given as /home/user/logs/log'
+            # interrupted runs would continue from their checkpoints
+            filename = feed.manager.options.tail_reset
+            checkpoints = session.query(SimpleKeyValue).filter(SimpleKeyValue.key == checkpoint_key(filename)).all()
+            for checkpoint in checkpoints:
+                session.query(SimpleKeyValue).filter(SimpleKeyValue.feed == checkpoint.feed).\
+                    filter(SimpleKeyValue.plugin == 'tail').\
+                    filter(SimpleKeyValue.key.in_(checkpoint_keys(filename, checkpoint.value))).\
+                    delete(synchronize_session=False)
             for pos in poses:
                 if pos.value == 0:
                     print 'Feed %s tail position is already zero' % pos.feed
@@ -82,7 +167,7 @@ class InputTail(object):
             entry[k] = v % entry
 
     @cached('tail')
-    def on_feed_input(self, feed):
+    def on_feed_input(self, feed, config):
 
         try:
             # details plugin will complain if no entries are created, with this we disable that
@@ -93,76 +178,119 @@ class InputTail(object):
         except DependencyError:
             log.debug('unable to get details plugin')
 
-        filename = os.path.expanduser(feed.config['tail']['file'])
-        encoding = feed.config['tail'].get('encoding', None)
+        filename = os.path.expanduser(config['file'])
+        encoding = config.get('encoding', None)
         file = open(filename, 'r')
 
-        last_pos = feed.simple_persistence.setdefault(filename, 0)
-        if os.path.getsize(filename) < last_pos:
+        last_pos = feed.simple_persistence.get(filename, 0)
+        size = os.path.getsize(filename)
+
+        # checkpoints are committed right away, position of the feed only when the feed completes
+        checkpoints = SimplePersistence('tail')
+        checkpoints.feedname = feed.name
+        checkpoint = checkpoints.get(checkpoint_key(filename))
+        if size < last_pos:
             log.info('File size is smaller than in previous execution, reseting to beginning of the file')
             last_pos = 0
-
-        file.seek(last_pos)
+            # checkpoint was made in the file before it was rotated
+            self.clear_checkpoint(checkpoints, filename, checkpoint)
+            checkpoint = None
+        entries = []
+        if checkpoint and last_pos < checkpoint['position'] <= size:
+            for key in checkpoint_keys(filename, checkpoint)[1:]:
+                entries.extend(checkpoints.get(key, []))
+            log.info('Continuing interrupted run from position %s with %s entries found before it' %
+                     (checkpoint['position'], len(entries)))
+            last_pos = checkpoint['position']
+        elif checkpoint:
+            log.debug('Ignoring checkpoint at %s, last position is %s' % (checkpoint['position'], last_pos))
+            self.clear_checkpoint(checkpoints, filename, checkpoint)
+            checkpoint = None
 
         log.debug('continuing from last position %s' % last_pos)
 
-        entry_config = feed.config['tail'].get('entry')
-        format_config = feed.config['tail'].get('format', {})
+        entry_config = config.get('entry')
+        format_config = config.get('format', {})
+        matcher = FieldMatcher(entry_config)
 
         # keep track what fields have been found
         used = {}
         entry = Entry()
+        position = last_pos
+        # position where the entry in progress started
+        entry_start = last_pos
+        # entries before this index are stored in checkpoint parts already
+        saved = len(entries)
 
         # now parse text
 
-        while True:
-            line = file.readline()
-            if encoding:
-                try:
-                    line = line.decode(encoding)
-                except UnicodeError:
-                    raise PluginError('Failed to decode file using %s. Check encoding.' % encoding)
-
-            if not line:
-                feed.simple_persistence[filename] = file.tell()
-                break
-
-            for field, regexp in entry_config.iteritems():
-                #log.debug('search field: %s regexp: %s' % (field, regexp))
-                match = re.search(regexp, line)
-                if match:
+        try:
+            for end, line in read_lines(file, last_pos):
+                line_start, position = position, end
+                if encoding:
+                    try:
+                        line = line.decode(encoding)
+                    except UnicodeError:
+                        raise PluginError('Failed to decode file using %s. Check encoding.' % encoding)
+
+                for field, value in matcher.match(line):
                     # check if used field detected, in such case start with new entry
-                    if used.has_key(field):
+                    if field in used:
                         if entry.isvalid():
                             log.info('Found field %s again before entry was completed. \
                                       Adding current incomplete, but valid entry and moving to next.' % field)
                             self.format_entry(entry, format_config)
-                            feed.entries.append(entry)
+                            entries.append(entry)
                         else:
                             log.info('Invalid data, entry field %s is already found once. Ignoring entry.' % field)
                         # start new entry
                         entry = Entry()
                         used = {}
 
+                    if not used:
+                        entry_start = line_start
                     # add field to entry
-                    entry[field] = match.group(1)
+                    entry[field] = value
                     used[field] = True
                     log.debug('found field: %s value: %s' % (field, entry[field]))
 
-                # if all fields have been found
-                if len(used) == len(entry_config):
-                    # check that entry has at least title and url
-                    if not entry.isvalid():
-                        log.info('Invalid data, constructed entry is missing mandatory fields (title or url)')
-                    else:
-                        self.format_entry(entry, format_config)
-                        feed.entries.append(entry)
-                        log.debug('Added entry %s' % entry)
-                        # start new entry
-                        entry = Entry()
-                        used = {}
+                    # if all fields have been found
+                    if len(used) == len(entry_config):
+                        # check that entry has at least title and url
+                        if not entry.isvalid():
+                            log.info('Invalid data, constructed entry is missing mandatory fields (title or url)')
+                        else:
+                            self.format_entry(entry, format_config)
+                            entries.append(entry)
+                            log.debug('Added entry %s' % entry)
+                            # start new entry
+                            entry = Entry()
+                            used = {}
+
+                # entry in progress would be lost if continued from here
+                if len(entries) - saved >= CHECKPOINT_INTERVAL and not used:
+                    log.debug('checkpoint at %s with %s entries' % (position, len(entries)))
+                    parts = checkpoint and checkpoint['parts'] or 0
+                    checkpoints[part_key(filename, parts)] = entries[saved:]
+                    checkpoint = {'position': position, 'parts': parts + 1}
+                    checkpoints[checkpoint_key(filename)] = checkpoint
+                    saved = len(entries)
+        finally:
+            file.close()
+
+        # incomplete entry is probably still being written, it is read again on next run
+        feed.simple_persistence[filename] = entry_start if used else position
+        # removed along with storing the position, when the feed completes
+        self.clear_checkpoint(feed.simple_persistence, filename, checkpoint)
+        return entries
+
+    def clear_checkpoint(self, persistence, filename, checkpoint):
+        """Remove *checkpoint* of *filename* and its parts from *persistence*"""
+        if checkpoint:
+            for key in checkpoint_keys(filename, checkpoint):
+                del persistence[key]
 
-register_plugin(InputTail, 'tail')
+register_plugin(InputTail, 'tail', api_ver=2)
 register_plugin(ResetTail, '--tail-reset', builtin=True)
 register_parser_option('--tail-reset', action='store', dest='tail_reset', default=False, metavar='FILE',
     help='Reset tail position for a file.')
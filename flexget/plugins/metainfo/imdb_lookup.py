@@ -4,14 +4,14 @@ from sqlalchemy import Table, Column, Integer, Float, String, Unicode, Boolean,
 from sqlalchemy.schema import ForeignKey, Index
 from sqlalchemy.orm import relation, joinedload_all
 from flexget import schema
-from flexget.entry import Entry
+from flexget.entry import Entry, LazyBatch
 from flexget.plugin import register_plugin, internet, PluginError, priority
 from flexget.manager import Session
 from flexget.utils.log import log_once
 from flexget.utils.imdb import ImdbSearch, ImdbParser, extract_id, make_url
 from flexget.utils.sqlalchemy_utils import table_add_column
 from flexget.utils.database import with_session
-from flexget.utils.sqlalchemy_utils import table_columns, get_index_by_name
+from flexget.utils.sqlalchemy_utils import table_columns, get_index_by_name, chunked
 
 SCHEMA_VER = 1
 
@@ -227,11 +227,70 @@ class ImdbLookup(object):
     def on_feed_metainfo(self, feed, config):
         if not config:
             return
+        batch = LazyBatch(self.bulk_loader)
         for entry in feed.entries:
-            self.register_lazy_fields(entry)
+            self.register_lazy_fields(entry, batch)
 
-    def register_lazy_fields(self, entry):
-        entry.register_lazy_fields(self.field_map, self.lazy_loader)
+    def register_lazy_fields(self, entry, batch=None):
+        entry.register_lazy_fields(self.field_map, self.lazy_loader, batch=batch)
+
+    def bulk_loader(self, entries):
+        """
+        Populates fields for all entries which have their movie details cached, using a few bulk queries.
+        Entries requiring a search or parsing are left for :meth:`lazy_loader`.
+        """
+        from flexget.manager import manager
+
+        # entries that still need a lookup, and don't have fields lookup would complain about
+        entries = [entry for entry in entries if entry.is_lazy('imdb_name') and
+                   not entry.get('imdb_votes', eval_lazy=False) and not entry.get('imdb_score', eval_lazy=False)]
+        if not entries:
+            return
+        session = Session()
+        try:
+            urls = {}
+            titles = {}
+            for entry in entries:
+                url = entry.get('imdb_url', eval_lazy=False)
+                if not url and entry.get('imdb_id', eval_lazy=False):
+                    url = make_url(entry['imdb_id'])
+                imdb_id = url and extract_id(url)
+                if imdb_id:
+                    urls.setdefault(make_url(imdb_id), []).append(entry)
+                elif entry.get('title', eval_lazy=False) and not url:
+                    titles.setdefault(entry['title'], []).append(entry)
+
+            # cached search results
+            for chunk in chunked(titles):
+                for result in session.query(SearchResult).filter(SearchResult.title.in_(chunk)):
+                    if result.title not in titles:
+                        continue
+                    if result.fails and not manager.options.retry:
+                        log.debug('%s will fail lookup' % result.title)
+                        log_once(('Title `%s` lookup fails' % result.title).capitalize(), logger=log)
+                        for entry in titles.pop(result.title):
+                            entry.unregister_lazy_fields(self.field_map, self.lazy_loader)
+                    elif result.url:
+                        urls.setdefault(result.url, []).extend(titles.pop(result.title))
+
+            # cached movies
+            resolved = 0
+            for chunk in chunked(urls):
+                movies = session.query(Movie).\
+                    options(joinedload_all(Movie.genres),
+                        joinedload_all(Movie.languages),
+                        joinedload_all(Movie.actors),
+                        joinedload_all(Movie.directors)).\
+                    filter(Movie.url.in_(chunk))
+                for movie in movies:
+                    if movie.expired or movie.url not in urls:
+                        continue
+                    for entry in urls.pop(movie.url):
+                        entry.update_using_map(self.field_map, movie)
+                        resolved += 1
+            log.debug('resolved %s of %s entries from cache' % (resolved, len(entries)))
+        finally:
+            session.close()
 
     def lazy_loader(self, entry, field):
         """Does the lookup for this entry and populates the entry fields."""
@@ -1,8 +1,13 @@
 import logging
+from sqlalchemy import func
+from flexget.entry import LazyBatch
+from flexget.manager import Session
 from flexget.plugin import register_plugin, DependencyError, priority
+from flexget.utils.sqlalchemy_utils import chunked, IN_CHUNK_SIZE
 
 try:
-    from flexget.plugins.api_tvdb import lookup_series, lookup_episode, get_mirror
+    from flexget.plugins.api_tvdb import lookup_series, lookup_episode, get_mirror, mark_expired, \
+        TVDBSeries, TVDBEpisode, TVDBSearchResult
 except ImportError:
     raise DependencyError(issued_by='thetvdb_lookup', missing='api_tvdb',
                           message='thetvdb_lookup requires the `api_tvdb` plugin')
@@ -99,22 +104,26 @@ class PluginThetvdbLookup(object):
 
         return entry[field]
 
+    def episode_numbers(self, entry):
+        """
+        :return: Tuple of (season, episode) to look up for *entry*, with configured offsets applied
+        """
+        season_offset = entry.get('thetvdb_lookup_season_offset', 0)
+        episode_offset = entry.get('thetvdb_lookup_episode_offset', 0)
+        if not isinstance(season_offset, int):
+            log.error('thetvdb_lookup_season_offset must be an integer')
+            season_offset = 0
+        if not isinstance(episode_offset, int):
+            log.error('thetvdb_lookup_episode_offset must be an integer')
+            episode_offset = 0
+        if season_offset != 0 or episode_offset != 0:
+            log.debug('Using offset for tvdb lookup: season: %s, episode: %s' % (season_offset, episode_offset))
+        return entry['series_season'] + season_offset, entry['series_episode'] + episode_offset
+
     def lazy_episode_lookup(self, entry, field):
         try:
-            season_offset = entry.get('thetvdb_lookup_season_offset', 0)
-            episode_offset = entry.get('thetvdb_lookup_episode_offset', 0)
-            if not isinstance(season_offset, int):
-                log.error('thetvdb_lookup_season_offset must be an integer')
-                season_offset = 0
-            if not isinstance(episode_offset, int):
-                log.error('thetvdb_lookup_episode_offset must be an integer')
-                episode_offset = 0
-            if season_offset != 0 or episode_offset != 0:
-                log.debug('Using offset for tvdb lookup: season: %s, episode: %s' % (season_offset, episode_offset))
-
-            episode = lookup_episode(entry.get('series_name', eval_lazy=False),
-                                     entry['series_season'] + season_offset,
-                                     entry['series_episode'] + episode_offset,
+            season, episode = self.episode_numbers(entry)
+            episode = lookup_episode(entry.get('series_name', eval_lazy=False), season, episode,
                                      tvdb_id=entry.get('thetvdb_id', eval_lazy=False))
             entry.update_using_map(self.episode_map, episode)
         except LookupError, e:
@@ -123,20 +132,90 @@ class PluginThetvdbLookup(object):
 
         return entry[field]
 
+    def bulk_lookup(self, entries):
+        """
+        Populates series and episode fields for all entries which have the information cached, using a few bulk
+        queries. Entries not in cache, or with expired information are left for the lazy lookups.
+        """
+        entries = [entry for entry in entries if entry.is_lazy('series_name_tvdb')]
+        if not entries:
+            return
+        session = Session()
+        try:
+            ids = set()
+            names = set()
+            for entry in entries:
+                tvdb_id = entry.get('thetvdb_id', eval_lazy=False)
+                if tvdb_id:
+                    ids.add(tvdb_id)
+                name = entry.get('series_name', eval_lazy=False)
+                if name:
+                    names.add(name.lower())
+
+            by_id = {}
+            by_name = {}
+            for chunk in chunked(ids):
+                for series in session.query(TVDBSeries).filter(TVDBSeries.id.in_(chunk)):
+                    by_id[series.id] = series
+            for chunk in chunked(names):
+                for series in session.query(TVDBSeries).filter(func.lower(TVDBSeries.seriesname).in_(chunk)):
+                    by_name.setdefault(series.seriesname.lower(), series)
+            missing = names - set(by_name)
+            for chunk in chunked(missing):
+                for found in session.query(TVDBSearchResult).\
+                        filter(func.lower(TVDBSearchResult.search).in_(chunk)):
+                    if found.series:
+                        by_name.setdefault(found.search.lower(), found.series)
+            if not by_id and not by_name:
+                return
+            # same expiration check individual lookups do when they find series from cache
+            mark_expired(session=session)
+
+            episodes = {}
+            for entry in entries:
+                tvdb_id = entry.get('thetvdb_id', eval_lazy=False)
+                name = entry.get('series_name', eval_lazy=False)
+                series = (tvdb_id and by_id.get(tvdb_id)) or (name and by_name.get(name.lower()))
+                if not series or series.expired:
+                    continue
+                entry.update_using_map(self.series_map, series)
+                if entry.is_lazy('ep_name'):
+                    season, episode = self.episode_numbers(entry)
+                    episodes.setdefault((series.id, season, episode), []).append(entry)
+
+            if episodes:
+                series_ids = set(key[0] for key in episodes)
+                seasons = set(key[1] for key in episodes)
+                # both IN lists of a query together stay within the limit of bound variables
+                for season_chunk in chunked(seasons, IN_CHUNK_SIZE // 2):
+                    for chunk in chunked(series_ids, IN_CHUNK_SIZE - len(season_chunk)):
+                        query = session.query(TVDBEpisode).filter(TVDBEpisode.series_id.in_(chunk)).\
+                            filter(TVDBEpisode.seasonnumber.in_(season_chunk))
+                        for episode in query:
+                            key = (episode.series_id, episode.seasonnumber, episode.episodenumber)
+                            if episode.expired or key not in episodes:
+                                continue
+                            for entry in episodes.pop(key):
+                                entry.update_using_map(self.episode_map, episode)
+            session.commit()
+        finally:
+            session.close()
+
     # Run after series and metainfo series
     @priority(110)
     def on_feed_metainfo(self, feed, config):
         if not config:
             return
 
+        batch = LazyBatch(self.bulk_lookup)
         for entry in feed.entries:
             # If there is information for a series lookup, register our series lazy fields
             if entry.get('series_name') or entry.get('thetvdb_id', eval_lazy=False):
-                entry.register_lazy_fields(self.series_map, self.lazy_series_lookup)
+                entry.register_lazy_fields(self.series_map, self.lazy_series_lookup, batch=batch)
 
                 # If there is season and ep info as well, register episode lazy fields
                 if entry.get('series_id_type') == 'ep':
-                    entry.register_lazy_fields(self.episode_map, self.lazy_episode_lookup)
+                    entry.register_lazy_fields(self.episode_map, self.lazy_episode_lookup, batch=batch)
                 # TODO: lookup for 'seq' and 'date' type series
 
 
@@ -1,5 +1,6 @@
 import logging
 import datetime
+from flexget.event import event
 from flexget.plugin import register_plugin, register_parser_option
 from flexget.utils.tools import parse_timedelta
 
@@ -43,6 +44,76 @@ class PluginInterval(object):
         log.debug('interval passed')
         feed.simple_persistence['last_time'] = datetime.datetime.now()
 
+
+def feed_interval(config, presets):
+    """
+    Find interval of a feed from its config, including the presets it uses.
+
+    :return: Interval config, None if feed has no interval. False if it can not be known before the feed is started.
+    """
+    disabled = config.get('disable_plugin', [])
+    if 'interval' in ([disabled] if isinstance(disabled, basestring) else disabled):
+        return None
+    if 'interval' in config:
+        return config['interval']
+    names = config.get('preset', [])
+    if names is False:
+        return None
+    if names is None or isinstance(names, bool):
+        names = []
+    elif isinstance(names, basestring):
+        names = [names]
+    names = list(names)
+    if 'no_global' in names:
+        names.remove('no_global')
+    elif 'global' not in names:
+        names.append('global')
+    for name in names:
+        preset = presets.get(name) or {}
+        if not isinstance(preset, dict):
+            return False
+        if 'interval' in preset:
+            return preset['interval']
+        if 'preset' in preset:
+            # nested presets, leave these for the plugin
+            return False
+    return None
+
+
+@event('manager.create_feeds')
+def due_feeds(manager, names):
+    """Implements --due-only, leaves out feeds whose interval has not passed before they are created."""
+    if not manager.options.due_only or manager.options.learn or manager.options.interval_ignore:
+        return
+    from flexget.manager import Session
+    from flexget.utils.simple_persistence import SimpleKeyValue
+    session = Session()
+    try:
+        last_times = dict((item.feed, item.value) for item in session.query(SimpleKeyValue).
+                          filter(SimpleKeyValue.plugin == 'interval').filter(SimpleKeyValue.key == 'last_time'))
+    finally:
+        session.close()
+    presets = manager.config.get('presets') or {}
+    now = datetime.datetime.now()
+    for name in names[:]:
+        config = manager.config['feeds'][name]
+        interval = feed_interval(config, presets) if isinstance(config, dict) else None
+        if not interval or not last_times.get(name):
+            continue
+        try:
+            next_time = last_times[name] + parse_timedelta(interval)
+        except (AttributeError, TypeError, ValueError):
+            # invalid interval, let validation report it
+            continue
+        if now < next_time:
+            log.debug('Feed %s is not due until %s' % (name, next_time))
+            names.remove(name)
+    log.verbose('Feeds due: %s' % (', '.join(sorted(names)) or 'none'))
+
+
 register_plugin(PluginInterval, 'interval', api_ver=2)
 register_parser_option('--now', action='store_true', dest='interval_ignore', default=False,
                        help='Ignore interval(s)')
+register_parser_option('--due-only', action='store_true', dest='due_only', default=False,
+                       help='Do not load feeds whose interval has not passed at all, faster than letting each feed '
+                            'check its interval.')
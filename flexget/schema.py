@@ -1,13 +1,19 @@
+import hashlib
 import logging
+import time
 from sqlalchemy import Column, Integer, String
 from flexget.manager import Base, Session
 from flexget.event import event
+from flexget.utils import startup_profile
 
 log = logging.getLogger('schema')
 
 # Stores a mapping of {plugin: {'version': version, 'tables': ['table_names'])}
 plugin_schemas = {}
 
+# True once a plugin schema version has been stored or changed, see set_version
+versions_changed = False
+
 
 class PluginSchema(Base):
 
@@ -39,6 +45,7 @@ def get_version(plugin):
 
 
 def set_version(plugin, version):
+    global versions_changed
     if plugin not in plugin_schemas:
         raise ValueError('Tried to set schema version for %s plugin with no versioned_base.' % plugin)
     if version != plugin_schemas[plugin]['version']:
@@ -51,12 +58,14 @@ def set_version(plugin, version):
             log.debug('Initializing plugin %s schema version to %i' % (plugin, version))
             schema = PluginSchema(plugin, version)
             session.add(schema)
+            versions_changed = True
         else:
             if version < schema.version:
                 raise ValueError('Tried to set plugin %s schema version to lower value' % plugin)
             if version != schema.version:
                 log.debug('Updating plugin %s schema version to %i' % (plugin, version))
                 schema.version = version
+                versions_changed = True
         session.commit()
     finally:
         session.close()
@@ -86,6 +95,7 @@ def upgrade(plugin):
 
         @event('manager.upgrade')
         def upgrade_wrapper(manager):
+            started = time.time()
             ver = get_version(plugin)
             session = Session()
             try:
@@ -98,11 +108,14 @@ def upgrade(plugin):
                     log.critical('A lower schema version was returned (%s) from the %s upgrade function '
                                  'than passed in (%s)' % (new_ver, plugin, ver))
                     manager.disable_feeds()
+                    manager.db_upgrade_failed = True
             except Exception, e:
                 log.exception('Failed to upgrade database for plugin %s: %s' % (plugin, e))
                 manager.disable_feeds()
+                manager.db_upgrade_failed = True
             finally:
                 session.close()
+                startup_profile.record('upgrade', plugin, time.time() - started)
 
         return upgrade_wrapper
     return upgrade_decorator
@@ -151,6 +164,51 @@ def versioned_base(plugin, version):
     return Meta('VersionedBase', (object,), {'__metaclass__': Meta, 'plugin': plugin, 'version': version})
 
 
+def table_signatures():
+    """:return: Dict of table name -> list of its column names and index names, for tables defined so far"""
+    return dict((table.name, [sorted(column.name for column in table.columns),
+                              sorted(index.name for index in table.indexes)])
+                for table in Base.metadata.tables.itervalues())
+
+
+def schema_versions():
+    """:return: Dict of plugin -> schema version, for versioned bases defined so far"""
+    return dict((plugin, info['version']) for plugin, info in plugin_schemas.iteritems())
+
+
+def fingerprint():
+    """
+    Fingerprint of the database schema defined by all plugin modules: tables, their columns and indexes, and plugin
+    schema versions. Modules which are not imported are included from the plugin manifest, so the fingerprint does
+    not depend on which plugins the config uses.
+
+    :return: Positive integer which fits in sqlite user_version
+    """
+    from flexget.plugin import get_lazy_schemas
+    tables, versions = get_lazy_schemas()
+    tables.update(table_signatures())
+    versions.update(schema_versions())
+    # manifest is json, compare names as the same type
+    tables = sorted((unicode(name), [[unicode(item) for item in items] for items in table])
+                    for name, table in tables.iteritems())
+    versions = sorted((unicode(plugin), version) for plugin, version in versions.iteritems())
+    digest = hashlib.sha1(repr((tables, versions))).hexdigest()
+    return int(digest[:7], 16) or 1
+
+
+def get_fingerprint(engine):
+    """Return fingerprint stored in database, None if database does not support storing it."""
+    if engine.name != 'sqlite':
+        return None
+    return engine.execute('PRAGMA user_version').scalar()
+
+
+def set_fingerprint(engine, value):
+    """Store schema fingerprint, once the database has been verified to match it."""
+    if engine.name == 'sqlite':
+        engine.execute('PRAGMA user_version = %d' % value)
+
+
 def after_table_create(event, target, bind, tables=None, **kw):
     """Sets the schema version to most recent for a plugin when it's tables are freshly created."""
     if tables:
@@ -1,12 +1,17 @@
+from __future__ import with_statement
 from copy import copy
 import logging
 import sys
 import threading
 from Queue import Queue
 from flexget.logger import FlexGetFormatter
+from flexget.utils import metrics
 
 log = logging.getLogger('ui.executor')
 
+queue_depth = metrics.gauge('flexget_executor_queue_depth', 'Executions queued or running in the webui executor')
+execution_time = metrics.histogram('flexget_executor_execution_seconds', 'Time taken by executions ran by the webui')
+
 
 class BufferQueue(Queue):
 
@@ -21,8 +26,9 @@ class ExecThread(threading.Thread):
 
     def __init__(self):
         threading.Thread.__init__(self)
-        self.daemon = True
+        self.setDaemon(True)
         self.queue = Queue()
+        queue_depth.set_function(lambda: self.queue.unfinished_tasks)
 
     def run(self):
         from flexget.ui.webui import manager
@@ -31,6 +37,7 @@ class ExecThread(threading.Thread):
             opts = kwargs.pop('options', None)
             parsed_options = kwargs.pop('parsed_options', None)
             output = kwargs.pop('output', None)
+            callback = kwargs.pop('callback', None)
             if opts:
                 # make copy of original options and apply options from opts
                 old_opts = copy(manager.options)
@@ -48,7 +55,8 @@ class ExecThread(threading.Thread):
                 streamhandler.setFormatter(FlexGetFormatter())
                 logging.getLogger().addHandler(streamhandler)
             try:
-                manager.execute(**kwargs)
+                with execution_time.time():
+                    manager.execute(**kwargs)
             finally:
                 # Inform queue we are done processing this item.
                 self.queue.task_done()
@@ -61,6 +69,11 @@ class ExecThread(threading.Thread):
                     sys.stdout = old_stdout
                     sys.stderr = old_stderr
                     logging.getLogger().removeHandler(streamhandler)
+                if callback:
+                    try:
+                        callback()
+                    except Exception:
+                        log.exception('Execution callback failed')
 
     def _apply_options(self, parser, options):
         """Applies dict :options: to OptParse parser results"""
@@ -81,6 +94,7 @@ class ExecThread(threading.Thread):
         options: Dict containing option, value pairs for this execution
         parsed_options: Parsed OptionParser to be used for this execution
         output: a BufferQueue object that will be filled with output from the execution.
+        callback: Function called without arguments once the execution has finished.
 
         all other keyword arguments will be passed to manager.execute
         kwargs options and parsed_options are mutually exclusive
@@ -2,7 +2,6 @@ import os
 import sys
 import logging
 import yaml
-from copy import deepcopy
 from flexget.manager import Manager
 from flexget.ui.options import StoreErrorOptionParser
 
@@ -42,34 +41,6 @@ class UIManager(Manager):
         self.update_feeds()
         Manager.execute(self, *args, **kwargs)
 
-    def update_feeds(self):
-        """Updates instances of all configured feeds from config"""
-        from flexget.feed import Feed
-
-        if not isinstance(self.config['feeds'], dict):
-            log.critical('Feeds is in wrong datatype, please read configuration guides')
-            return
-
-        # construct feed list
-        for name in self.config.get('feeds', {}):
-            if not isinstance(self.config['feeds'][name], dict):
-                continue
-            if name in self.feeds:
-                # This feed already has an instance, update it
-                self.feeds[name].config = deepcopy(self.config['feeds'][name])
-                if not name.startswith('_'):
-                    self.feeds[name].enabled = True
-            else:
-                # Create feed
-                feed = Feed(self, name, deepcopy(self.config['feeds'][name]))
-                # If feed name is prefixed with _ it's disabled
-                if name.startswith('_'):
-                    feed.enabled = False
-                self.feeds[name] = feed
-        # Delete any feed instances that are no longer in the config
-        for name in [n for n in self.feeds if n not in self.config['feeds']]:
-            del self.feeds[name]
-
     def check_lock(self):
         if self.options.autoreload:
             log.info('autoreload enabled, not checking for lock file')
@@ -23,6 +23,9 @@ class UIOptionParser(OptionParser):
         self.add_option('--password', action='store', dest='password',
                         help='Password needed to login [default: flexget]')
 
+        self.add_option('--metrics', action='store_true', dest='metrics', default=False,
+                        help='Collect execution metrics and serve them at /metrics in Prometheus text format.')
+
         # enable flask autoreloading (development)
         self.add_option('--autoreload', action='store_true', dest='autoreload', default=False,
                         help=SUPPRESS_HELP)
@@ -1,16 +1,20 @@
 import logging
-from flexget.ui.webui import db_session, app, executor
-from flask import request, render_template, flash, Module
+import threading
+from flexget.ui.webui import register_plugin, db_session, app, executor
+from flask import request, render_template, flash, Module, jsonify
 from flexget.plugin import DependencyError
 
 try:
-    from flexget.plugins.plugin_archive import ArchiveEntry, search
+    from flexget.plugins.generic.archive import ArchiveEntry, Consolidator, search
 except ImportError:
     raise DependencyError(issued_by='ui.archive', missing='archive')
 
 log = logging.getLogger('ui.archive')
 archive = Module(__name__)
 
+# consolidation running in the background, see consolidate()
+consolidator = Consolidator()
+
 
 # TODO: refactor this filter to some globally usable place (webui.py?)
 #       also flexget/plugins/ui/utils.py needs to be removed
@@ -34,11 +38,10 @@ def index():
         elif len(text) < 5:
             flash('Search text is too short, use at least 5 characters', 'error')
         else:
-            results = search(db_session, text)
+            results = list(search(db_session, text, ranked=True, limit=501))
             if not results:
                 flash('No results', 'info')
             else:
-                # not sure if this len check is a good idea, I think it forces to load all items from db ?
                 if len(results) > 500:
                     flash('Too many results, displaying first 500', 'error')
                     results = results[0:500]
@@ -60,5 +63,30 @@ def inject(id):
     return render_template('archive/archive.html')
 
 
-# TODO: Requires refactoring once archive plugin is refactored
-#register_plugin(archive, menu='Archive')
+@archive.route('/consolidate', methods=['POST'])
+def consolidate():
+    """Starts archive consolidation in a background thread, it commits in small chunks so feeds can still run."""
+    if not consolidator.stats['running']:
+        consolidator.stats['running'] = True
+        thread = threading.Thread(target=consolidator.run, name='archive_consolidate')
+        thread.setDaemon(True)
+        thread.start()
+    return consolidate_status()
+
+
+@archive.route('/consolidate/stop', methods=['POST'])
+def consolidate_stop():
+    consolidator.stop()
+    return consolidate_status()
+
+
+@archive.route('/consolidate/status')
+def consolidate_status():
+    stats = dict(consolidator.stats)
+    for key in ('started', 'finished'):
+        if stats[key]:
+            stats[key] = stats[key].isoformat()
+    return jsonify(stats)
+
+
+register_plugin(archive, menu='Archive')
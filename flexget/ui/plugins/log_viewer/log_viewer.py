@@ -1,41 +1,149 @@
 import logging
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+from Queue import Queue, Empty, Full
 from flask import render_template, Module, jsonify, request
 from sqlalchemy import Column, DateTime, Integer, Unicode, String, asc, desc, or_, and_
+from flexget import schema
 from flexget.ui.webui import register_plugin, db_session
-from flexget.manager import Base, Session
+from flexget.manager import Session
 from flexget.event import event
+from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name
 
+log = logging.getLogger('ui.log_viewer')
 log_viewer = Module(__name__)
+Base = schema.versioned_base('log_viewer', 0)
+
+# log records older than this are removed
+RETENTION = timedelta(days=7)
+# how often old records are removed, in seconds
+PRUNE_INTERVAL = 3600
+
+
+@schema.upgrade('log_viewer')
+def upgrade(ver, session):
+    if ver is None:
+        # log table existed before it was versioned, add the indexes used by the viewer
+        table = table_schema('log', session)
+        for name in ('ix_log_created', 'ix_log_feed', 'ix_log_execution'):
+            if not get_index_by_name(table, name):
+                log.info('Creating index %s' % name)
+                get_index_by_name(LogEntry.__table__, name).create(bind=session.bind)
+        ver = 0
+    return ver
+
+
+def record_values(record):
+    """Column values of a :class:`LogEntry` for log *record*."""
+    return {'created': datetime.fromtimestamp(record.created),
+            'logger': record.name,
+            'levelno': record.levelno,
+            'message': unicode(record.getMessage()),
+            'feed': getattr(record, 'feed', u''),
+            'execution': getattr(record, 'execution', '')}
 
 
 class LogEntry(Base):
     __tablename__ = 'log'
 
     id = Column(Integer, primary_key=True)
-    created = Column(DateTime)
+    created = Column(DateTime, index=True)
     logger = Column(String)
     levelno = Column(Integer)
     message = Column(Unicode)
-    feed = Column(Unicode)
-    execution = Column(String)
+    feed = Column(Unicode, index=True)
+    execution = Column(String, index=True)
 
     def __init__(self, record):
-        self.created = datetime.fromtimestamp(record.created)
-        self.logger = record.name
-        self.levelno = record.levelno
-        self.message = unicode(record.getMessage())
-        self.feed = getattr(record, 'feed', u'')
-        self.execution = getattr(record, 'execution', '')
+        for name, value in record_values(record).iteritems():
+            setattr(self, name, value)
 
 
 class DBLogHandler(logging.Handler):
+    """
+    Stores log records in the database.
+
+    Records are queued and written by a background thread in batches, once *batch_size* records are queued or
+    *interval* seconds have passed. When more than *capacity* records are waiting new records are dropped, the
+    number of dropped records is logged once the writer catches up.
+    """
+
+    def __init__(self, capacity=10000, batch_size=500, interval=2.0):
+        logging.Handler.__init__(self)
+        self.queue = Queue(capacity)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.last_prune = 0
+        self._stop = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, name='DBLogHandler')
+        self.writer.setDaemon(True)
+        self.writer.start()
 
     def emit(self, record):
+        if threading.currentThread() is self.writer:
+            # records logged while writing would feed the writer forever
+            return
+        try:
+            self.queue.put_nowait(record_values(record))
+        except Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _next_batch(self):
+        """Collect queued records until batch is full or interval has passed since the first one."""
+        try:
+            batch = [self.queue.get(timeout=self.interval)]
+        except Empty:
+            return []
+        deadline = time.time() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0 or self._stop.isSet():
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        while not (self._stop.isSet() and self.queue.empty()):
+            batch = self._next_batch()
+            try:
+                self.write(batch)
+            except Exception, e:
+                log.error('Failed to write %d log records: %s' % (len(batch), e))
+
+    def write(self, rows):
+        """Insert *rows* with one executemany, and remove expired records from time to time."""
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            rows.append({'created': datetime.now(), 'logger': log.name, 'levelno': logging.WARNING,
+                         'message': u'%d log records were dropped, logging faster than they can be stored' %
+                                    dropped, 'feed': u'', 'execution': ''})
+        prune = time.time() - self.last_prune > PRUNE_INTERVAL
+        if not rows and not prune:
+            return
         session = Session()
-        session.add(LogEntry(record))
-        session.commit()
-        session.close()
+        try:
+            if rows:
+                session.execute(LogEntry.__table__.insert(), rows)
+            if prune:
+                self.last_prune = time.time()
+                session.query(LogEntry).filter(LogEntry.created < datetime.now() - RETENTION).\
+                    delete(synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def close(self):
+        """Write queued records and stop the writer."""
+        self._stop.set()
+        self.writer.join(self.interval * 2 + 5)
+        logging.Handler.close(self)
 
 
 @log_viewer.context_processor
@@ -97,11 +205,23 @@ def get_logdata():
     return jsonify(json)
 
 
+_handler = None
+
+
 @event('webui.start')
 def initialize():
     # Register db handler with base logger
-    logger = logging.getLogger()
-    handler = DBLogHandler()
-    logger.addHandler(handler)
+    global _handler
+    _handler = DBLogHandler()
+    logging.getLogger().addHandler(_handler)
+
+
+@event('webui.stop')
+def shutdown():
+    global _handler
+    if _handler:
+        logging.getLogger().removeHandler(_handler)
+        _handler.close()
+        _handler = None
 
 register_plugin(log_viewer, url_prefix='/log', menu='Log', order=256)
@@ -0,0 +1 @@
+from performance import *
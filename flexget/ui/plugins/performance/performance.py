@@ -0,0 +1,44 @@
+import logging
+from cStringIO import StringIO
+from flexget.ui.webui import register_plugin, db_session
+from flask import request, render_template, Module, redirect, url_for, Response
+from flexget.plugin import DependencyError
+
+try:
+    from flexget.plugins.generic import performance as profiler
+except ImportError:
+    raise DependencyError(issued_by='ui.performance', missing='performance')
+
+log = logging.getLogger('ui.performance')
+performance = Module(__name__)
+
+# number of latest executions summarized on the page
+EXECUTIONS = 10
+
+
+@performance.route('/')
+def index():
+    context = {'enabled': profiler.enabled,
+               'executions': EXECUTIONS,
+               'hottest': profiler.hottest(db_session, executions=EXECUTIONS)}
+    return render_template('performance/performance.html', **context)
+
+
+@performance.route('/toggle', methods=['POST'])
+def toggle():
+    profiler.enabled = request.form.get('enabled') == 'on'
+    log.info('Plugin profiling %s' % ('enabled' if profiler.enabled else 'disabled'))
+    return redirect(url_for('index'))
+
+
+@performance.route('/export/<format>')
+def export(format):
+    if format not in ('json', 'csv'):
+        format = 'json'
+    data = StringIO()
+    profiler.export(db_session, data, format)
+    mimetype = 'text/csv' if format == 'csv' else 'application/json'
+    return Response(data.getvalue(), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename=performance.%s' % format})
+
+register_plugin(performance, menu='Performance')
@@ -1,9 +1,12 @@
 """
-At the moment scheduler supports just one global interval for all feeds.
+Runs feeds on their own intervals, feeds without a schedule use the __DEFAULT__ interval.
 """
+import heapq
 import logging
-from datetime import datetime, timedelta
+import random
 import threading
+import time
+from datetime import timedelta
 from sqlalchemy import Column, Integer, Unicode
 from flask import request, render_template, flash, Module, redirect, url_for
 from flexget.ui.webui import register_plugin, db_session, manager, executor
@@ -15,7 +18,14 @@ schedule = Module(__name__)
 
 DEFAULT_INTERVAL = 60
 
-timers = {}
+# runs are delayed randomly by up to this fraction of the interval, so that feeds don't all start at once
+JITTER = 0.05
+# longest delay after repeated failures, in seconds; intervals longer than this are not extended
+MAX_BACKOFF = 6 * 3600
+# how often the config is checked for added or removed feeds, in seconds
+CONFIG_CHECK_INTERVAL = 60
+
+scheduler = None
 
 
 class Schedule(Base):
@@ -30,41 +40,146 @@ class Schedule(Base):
         self.interval = interval
 
 
-class RepeatingTimer(threading.Thread):
-    """Call a function every certain number of seconds"""
-
-    def __init__(self, interval, function, args=[], kwargs={}):
-        threading.Thread.__init__(self)
-        self.daemon = True
-        self.interval = interval
-        self.function = function
-        self.args = args
-        self.kwargs = kwargs
-        self.finished = threading.Event()
-        self.waiting = threading.Event()
-
-    def cancel(self):
-        """Stop the repeating"""
-        self.finished.set()
-        self.waiting.set()
+class Scheduler(threading.Thread):
+    """
+    Runs feeds when they are due, in a single thread keeping a heap of next run times.
+
+    Due feeds are queued to *executor*, so executions never overlap. A feed is never queued while its previous run
+    is still in progress, a run missed that way or while FlexGet was busy is coalesced into one run. Failing feeds are
+    retried with exponentially growing delays. Feeds added to or removed from the config are picked up within
+    CONFIG_CHECK_INTERVAL.
+    """
+
+    def __init__(self, executor):
+        threading.Thread.__init__(self, name='Scheduler')
+        self.setDaemon(True)
+        self.executor = executor
+        # feed name -> interval in minutes, as stored in the database
+        self.schedules = {}
+        # interval in minutes for feeds without a schedule, None if they are not run
+        self.default = None
+        # feeds in the config when intervals were last resolved
+        self.feeds = set()
+        # feed name -> interval in seconds
+        self.intervals = {}
+        # feed name -> next run time, entries in heap with other times are stale
+        self.next_runs = {}
+        self.heap = []
+        self.running = set()
+        # feed name -> number of consecutive failed runs
+        self.failures = {}
+        self.condition = threading.Condition()
+        self.finished = False
+
+    def _push(self, feed, when):
+        self.next_runs[feed] = when
+        heapq.heappush(self.heap, (when, feed))
+
+    def _jitter(self, interval):
+        return random.uniform(0, interval * JITTER)
+
+    def update(self, schedules, default=None):
+        """
+        Set schedules of the feeds.
+
+        :param dict schedules: Feed name -> interval in minutes.
+        :param default: Interval in minutes for feeds without a schedule, None to not run them.
+        """
+        self.condition.acquire()
+        try:
+            self.schedules, self.default = dict(schedules), default
+            self._refresh()
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def _refresh(self):
+        """
+        Resolve intervals of the feeds currently in the config, caller must hold the condition.
+
+        Feeds whose interval did not change keep their next run time, new feeds are run once their interval has
+        passed.
+        """
+        now = time.time()
+        feeds = get_all_feeds()
+        self.feeds = set(feeds)
+        old, self.intervals = self.intervals, {}
+        for feed in feeds:
+            minutes = self.schedules.get(feed, self.default)
+            if minutes:
+                self.intervals[feed] = minutes * 60
+        for feed in set(self.next_runs) - set(self.intervals):
+            del self.next_runs[feed]
+            self.failures.pop(feed, None)
+        for feed, interval in self.intervals.iteritems():
+            if old.get(feed) != interval:
+                self._push(feed, now + interval + self._jitter(interval))
+
+    def stop(self):
+        self.condition.acquire()
+        try:
+            self.finished = True
+            self.condition.notify()
+        finally:
+            self.condition.release()
 
     def run(self):
-        last_run = datetime.now()
-        while not self.finished.is_set():
-            self.waiting.clear()
-            wait_delta = (last_run + timedelta(seconds=self.interval) - datetime.now())
-            wait_secs = (wait_delta.seconds + wait_delta.days * 24 * 3600)
-            if wait_secs > 0:
-                log.debug('Waiting %s to execute.' % wait_secs)
-                self.waiting.wait(wait_secs)
-            else:
-                log.debug('We were scheduled to execute %d seconds ago, executing now.' % - wait_secs)
-            if self.waiting.is_set():
-                # If waiting was cancelled do not execute the function
-                continue
-            if not self.finished.is_set():
-                last_run = datetime.now()
-                self.function(*self.args, **self.kwargs)
+        self.condition.acquire()
+        try:
+            while not self.finished:
+                # configure page saves the config without telling anyone
+                if set(get_all_feeds()) != self.feeds:
+                    log.debug('Feeds in config changed, updating schedules')
+                    self._refresh()
+                if not self.heap:
+                    self.condition.wait(CONFIG_CHECK_INTERVAL)
+                    continue
+                when, feed = self.heap[0]
+                if self.next_runs.get(feed) != when:
+                    # rescheduled or removed
+                    heapq.heappop(self.heap)
+                    continue
+                now = time.time()
+                if when > now:
+                    self.condition.wait(min(when - now, CONFIG_CHECK_INTERVAL))
+                    continue
+                heapq.heappop(self.heap)
+                interval = self.intervals[feed]
+                if feed in self.running:
+                    log.debug('%s is still running, skipping scheduled run' % feed)
+                else:
+                    self._dispatch(feed)
+                # overdue runs are not caught up, next one is scheduled from now
+                self._push(feed, now + interval + self._jitter(interval))
+        finally:
+            self.condition.release()
+
+    def _dispatch(self, feed):
+        log.info('Executing feed: %s' % feed)
+        self.running.add(feed)
+        fire_event('scheduler.execute')
+        self.executor.execute(feeds=[feed], callback=lambda: self._finished(feed))
+
+    def _finished(self, feed):
+        instance = manager.feeds.get(feed)
+        failed = instance is None or instance._abort or not instance.enabled
+        self.condition.acquire()
+        try:
+            self.running.discard(feed)
+            if feed not in self.intervals:
+                return
+            if not failed:
+                self.failures.pop(feed, None)
+                return
+            failures = self.failures[feed] = self.failures.get(feed, 0) + 1
+            interval = self.intervals[feed]
+            delay = min(interval * 2 ** failures, max(interval, MAX_BACKOFF))
+            log.info('%s failed %d times in a row, next run in %d minutes' % (feed, failures, delay / 60))
+            if self.next_runs[feed] < time.time() + delay:
+                self._push(feed, time.time() + delay)
+                self.condition.notify()
+        finally:
+            self.condition.release()
 
 
 def get_feed_interval(feed):
@@ -82,7 +197,7 @@ def set_feed_interval(feed, interval):
         log.debug('Creating new %s interval' % feed)
         db_session.add(Schedule(feed, interval))
     db_session.commit()
-    stop_empty_timers()
+    update_scheduler()
 
 
 @schedule.context_processor
@@ -115,13 +230,11 @@ def update_interval(form, feed):
                 interval = 1
             log.info('new interval for %s: %d minutes' % (feed, interval))
             set_feed_interval(feed, interval)
-            start_timer(interval)
             flash('%s scheduling updated successfully.' % feed.capitalize(), 'success')
 
 
 @schedule.route('/', methods=['POST', 'GET'])
 def index():
-    global timer
     if request.method == 'POST':
         for feed in get_all_feeds() + [u'__DEFAULT__']:
             if request.form.get(feed + '_interval'):
@@ -134,7 +247,7 @@ def index():
 def delete_schedule(feed):
     db_session.query(Schedule).filter(Schedule.feed == feed).delete()
     db_session.commit()
-    stop_empty_timers()
+    update_scheduler()
     return redirect(url_for('index'))
 
 
@@ -145,7 +258,7 @@ def add_schedule(feed):
         schedule = Schedule(feed, DEFAULT_INTERVAL)
         db_session.add(schedule)
         db_session.commit()
-    start_timer(DEFAULT_INTERVAL)
+        update_scheduler()
     return redirect(url_for('index'))
 
 
@@ -157,69 +270,33 @@ def get_scheduled_feeds():
     return [item.feed for item in db_session.query(Schedule).all()]
 
 
-def execute(interval):
-    """Adds a run to the executor"""
-
-    # Make a list of feeds that run on this interval
-    schedules = db_session.query(Schedule).filter(Schedule.interval == interval).all()
-    feeds = set([sch.feed for sch in schedules])
-    if u'__DEFAULT__' in feeds:
-        feeds.remove(u'__DEFAULT__')
-        # Get a list of all feeds that do not have their own schedule
-        default_feeds = set(get_all_feeds()) - set(get_scheduled_feeds())
-        feeds.update(default_feeds)
-
-    if not feeds:
-        # No feeds scheduled to run at this interval, stop the timer
-        stop_timer(interval)
-        return
-
-    log.info('Executing feeds: %s' % ", ".join(feeds))
-    fire_event('scheduler.execute')
-    executor.execute(feeds=feeds)
-
-
-def start_timer(interval):
-    # autoreload will fail if there are pending timers
-    if manager.options.autoreload:
-        log.info('Aborting start_timer() because --autoreload is enabled')
-        return
-
-    global timers
-    if not timers.get(interval):
-        log.debug('Starting scheduler (%s minutes)' % interval)
-        timers[interval] = RepeatingTimer(interval * 60, execute, (interval,))
-        timers[interval].start()
-
-
-def stop_timer(interval):
-    global timers
-    if timers.get(interval):
-        timers[interval].cancel()
-        del timers[interval]
-
-
-def stop_empty_timers():
-    """Stops timers that don't have any more feeds using them."""
-    current_intervals = set([i.interval for i in db_session.query(Schedule).all()])
-    for interval in timers.keys():
-        if interval not in current_intervals:
-            stop_timer(interval)
+def update_scheduler():
+    """Apply schedules from the database to the running scheduler."""
+    if scheduler:
+        schedules = dict((item.feed, item.interval) for item in db_session.query(Schedule).all())
+        default = schedules.pop(u'__DEFAULT__', None)
+        scheduler.update(schedules, default)
 
 
 @event('webui.start')
 def on_webui_start():
-    # Start timers for all schedules
-    for interval in set([item.interval for item in db_session.query(Schedule).all()]):
-        start_timer(interval)
+    # autoreload will fail if there are pending threads
+    if manager.options.autoreload:
+        log.info('Not starting scheduler because --autoreload is enabled')
+        return
+    global scheduler
+    scheduler = Scheduler(executor)
+    scheduler.start()
+    update_scheduler()
 
 
 @event('webui.stop')
 def on_webui_stop():
+    global scheduler
     log.info('Terminating')
-    # Stop all running timers
-    for interval in timers.keys():
-        stop_timer(interval)
+    if scheduler:
+        scheduler.stop()
+        scheduler = None
 
 
 register_plugin(schedule, menu='Schedule')
@@ -13,12 +13,13 @@ import os
 import urllib
 import threading
 import sys
-from flask import Flask, redirect, url_for, abort, request, send_from_directory
+from flask import Flask, redirect, url_for, abort, request, send_from_directory, Response
 from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm.session import sessionmaker
 from flexget.event import fire_event
 from flexget.plugin import DependencyError
 from flexget.ui.executor import ExecThread
+from flexget.utils import fs_watch, metrics
 
 log = logging.getLogger('webui')
 
@@ -56,6 +57,14 @@ def userstatic(filename):
     return send_from_directory(os.path.join(manager.config_base, 'userstatic'), filename)
 
 
+@app.route('/metrics')
+def metrics_text():
+    """Metrics in Prometheus text format, available when webui is started with --metrics"""
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.context_processor
 def flexget_variables():
     path = urllib.splitquery(request.path)[0]
@@ -158,6 +167,10 @@ def start(mg):
         finally:
             lockfile.close()
 
+    metrics.enable(manager.options.metrics)
+    if manager.options.watch_fs:
+        fs_watch.enable()
+
     # Start the executor thread
     global executor
     executor = ExecThread()
@@ -171,6 +184,7 @@ def start(mg):
     # was called when instantiating manager .. so we need to call it again
     from flexget.manager import Base
     Base.metadata.create_all(bind=manager.engine)
+    fire_event('manager.upgrade', manager)
 
     fire_event('webui.start')
 
@@ -2,17 +2,29 @@ import copy
 import logging
 import hashlib
 from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, DateTime, PickleType, Unicode, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Unicode, ForeignKey
 from sqlalchemy.orm import relation
 from flexget import schema
-from flexget.utils.database import safe_pickle_synonym
-from flexget.utils.tools import parse_timedelta
-from flexget.entry import Entry
+from flexget.utils.database import serialized_synonym, migrate_pickle_column
+from flexget.utils.tools import parse_timedelta, is_immutable
+from flexget.entry import Entry, LazyField
 from flexget.event import event
 from flexget.plugin import PluginError
 
 log = logging.getLogger('input_cache')
-Base = schema.versioned_base('input_cache', 0)
+Base = schema.versioned_base('input_cache', 1)
+
+
+@schema.upgrade('input_cache')
+def upgrade(ver, session):
+    if ver is None:
+        ver = 0
+    if ver == 0:
+        log.info('Converting cached entries from pickle, this may take a while ...')
+        converted, removed = migrate_pickle_column(session, 'input_cache_entry', 'entry', entries=True)
+        log.info('Converted %i cached entries, removed %i which could not be loaded' % (converted, removed))
+        ver = 1
+    return ver
 
 
 class InputCache(Base):
@@ -32,8 +44,8 @@ class InputCacheEntry(Base):
     __tablename__ = 'input_cache_entry'
 
     id = Column(Integer, primary_key=True)
-    _entry = Column('entry', PickleType)
-    entry = safe_pickle_synonym('_entry')
+    _entry = Column('entry', LargeBinary)
+    entry = serialized_synonym('_entry')
 
     cache_id = Column(Integer, ForeignKey('input_cache.id'), nullable=False)
 
@@ -46,6 +58,112 @@ def db_cleanup(session):
         log.verbose('Removed %s old input caches.' % result)
 
 
+# maximum number of entries kept in the memory cache, least recently used caches are evicted first
+MAX_CACHED_ENTRIES = 50000
+
+
+def freeze(entry):
+    """
+    Takes an immutable snapshot of entry fields for the memory cache. Immutable values (strings, numbers, dates) are
+    shared with the entry, only mutable values are copied.
+
+    :param Entry entry: Entry to be cached
+    :return: Tuple of (field, value) pairs
+    :raises TypeError: If some field cannot be copied
+    """
+    fields = []
+    for field, value in dict.iteritems(entry):
+        if isinstance(value, LazyField):
+            lazy = value
+            value = LazyField(None, field, None)
+            value.funcs = lazy.funcs[:]
+            if lazy.batches:
+                value.batches = lazy.batches.copy()
+        elif not is_immutable(value):
+            value = copy.deepcopy(value)
+        fields.append((field, value))
+    return tuple(fields)
+
+
+def thaw(snapshot):
+    """
+    Creates a new entry from a :func:`freeze` snapshot. Values are shared with the snapshot, mutable ones are copied
+    only once they are accessed through the entry.
+
+    :param snapshot: Value returned by :func:`freeze`
+    :return: Entry
+    """
+    entry = Entry()
+    batches = set()
+    for field, value in snapshot:
+        if isinstance(value, LazyField):
+            lazy = LazyField(entry, field, None)
+            lazy.funcs = value.funcs[:]
+            if value.batches:
+                lazy.batches = value.batches.copy()
+                batches.update(value.batches.itervalues())
+            value = lazy
+        elif not is_immutable(value):
+            entry._borrow(field, value)
+            continue
+        # bypass Entry.__setitem__, values were validated when they were set originally
+        dict.__setitem__(entry, field, value)
+    for batch in batches:
+        batch.add(entry)
+    return entry
+
+
+class LRUCache(object):
+    """
+    Memory cache for input results, holds at most *max_size* entries in total. When full, least recently used
+    results are evicted.
+    """
+
+    def __init__(self, max_size=MAX_CACHED_ENTRIES):
+        self.max_size = max_size
+        self.size = 0
+        self._data = {}
+        # key -> value of counter when key was last used, there are only a few keys so eviction just finds the lowest
+        self._used = {}
+        self._counter = 0
+
+    def _touch(self, key):
+        self._counter += 1
+        self._used[key] = self._counter
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        self._touch(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self.size -= len(self._data.pop(key))
+            del self._used[key]
+        if len(value) > self.max_size:
+            log.debug('not caching %s, %s entries exceeds cache size' % (key, len(value)))
+            return
+        self._data[key] = value
+        self._touch(key)
+        self.size += len(value)
+        while self.size > self.max_size:
+            evicted = min(self._used, key=self._used.get)
+            del self._used[evicted]
+            self.size -= len(self._data.pop(evicted))
+            log.debug('evicted %s from memory cache' % evicted)
+
+    def keys(self):
+        return self._data.keys()
+
+    def clear(self):
+        self._data.clear()
+        self._used.clear()
+        self.size = 0
+
+
 def config_hash(config):
     """
     :param dict config: Configuration
@@ -71,7 +189,7 @@ class cached(object):
     .. note:: Configuration assumptions may make this unusable in some (future) inputs
     """
 
-    cache = {}
+    cache = LRUCache()
 
     def __init__(self, name, persist=None):
         # Cast name to unicode to prevent sqlalchemy warnings when filtering
@@ -107,10 +225,7 @@ class cached(object):
             if cache_name in self.cache:
                 # return from the cache
                 log.trace('cache hit')
-                entries = []
-                for entry in self.cache[cache_name]:
-                    fresh = copy.deepcopy(entry)
-                    entries.append(fresh)
+                entries = [thaw(snapshot) for snapshot in self.cache[cache_name]]
                 if entries:
                     log.verbose('Restored %s entries from cache' % len(entries))
                 return entries
@@ -122,10 +237,10 @@ class cached(object):
                                                               filter(InputCache.added > datetime.now() - self.persist).\
                                                               first()
                     if db_cache:
-                        entries = [Entry(e.entry) for e in db_cache.entries]
+                        entries = [e.entry for e in db_cache.entries]
                         log.verbose('Restored %s entries from db cache' % len(entries))
                         # Store to in memory cache
-                        self.cache[cache_name] = copy.deepcopy(entries)
+                        self.store(cache_name, entries)
                         return entries
 
                 # Nothing was restored from db or memory cache, run the function
@@ -141,10 +256,10 @@ class cached(object):
                         if db_cache and db_cache.entries:
                             log.error('There was an error during %s input (%s), using cache instead.' %
                                     (self.name, e))
-                            entries = [Entry(e.entry) for e in db_cache.entries]
+                            entries = [e.entry for e in db_cache.entries]
                             log.verbose('Restored %s entries from db cache' % len(entries))
                             # Store to in memory cache
-                            self.cache[cache_name] = copy.deepcopy(entries)
+                            self.store(cache_name, entries)
                             return entries
                     # If there was nothing in the db cache, re-raise the error.
                     raise
@@ -155,11 +270,7 @@ class cached(object):
                     return response
                 # store results to cache
                 log.debug('storing to cache %s %s entries' % (cache_name, len(response)))
-                try:
-                    self.cache[cache_name] = copy.deepcopy(response)
-                except TypeError:
-                    # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
-                    log.critical('Unable to save feed content into cache, if problem persists longer than a day please report this as a bug')
+                self.store(cache_name, response)
                 if self.persist:
                     # Store to database
                     log.debug('Storing cache %s to database.' % cache_name)
@@ -174,6 +285,14 @@ class cached(object):
 
         return wrapped_func
 
+    def store(self, cache_name, entries):
+        """Stores snapshots of *entries* into memory cache."""
+        try:
+            self.cache[cache_name] = [freeze(entry) for entry in entries]
+        except TypeError:
+            # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
+            log.critical('Unable to save feed content into cache, if problem persists longer than a day please report this as a bug')
+
 
 @event('manager.execute.started')
 def clear_cache(manager):
@@ -181,4 +300,4 @@ def clear_cache(manager):
     This is neccessary for webui or otherwise it will only use cache.
     """
     log.debug('clearing cache')
-    cached.cache = {}
+    cached.cache.clear()
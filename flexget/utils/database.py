@@ -1,9 +1,14 @@
+import logging
+import pickle
 from datetime import datetime
-from sqlalchemy import extract, func, case
+from sqlalchemy import extract, func, case, select
 from sqlalchemy.orm import synonym
 from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from flexget.manager import Session
-from flexget.utils import qualities
+from flexget.utils import qualities, serialization
+from flexget.utils.sqlalchemy_utils import table_schema
+
+log = logging.getLogger('util.database')
 
 
 def with_session(func):
@@ -120,6 +125,66 @@ def safe_pickle_synonym(name):
     return synonym(name, descriptor=property(getter, setter))
 
 
+def serialized_synonym(name):
+    """Used to store plain values (eg. :class:`~flexget.entry.Entry` instances) into a LargeBinary column
+    using :mod:`flexget.utils.serialization`.
+
+    Value is serialized when it is set, so later changes to the object are not stored.
+    """
+
+    def getter(self):
+        data = getattr(self, name)
+        if data is not None:
+            return serialization.loads(data)
+
+    def setter(self, value):
+        setattr(self, name, serialization.dumps(value))
+
+    return synonym(name, descriptor=property(getter, setter))
+
+
+def migrate_pickle_column(session, table_name, column_name, entries=False, chunk_size=500):
+    """Converts pickled values in a column into :func:`serialized_synonym` format.
+    Rows that cannot be unpickled (eg. because of moved classes) are removed.
+
+    :param session: SQLAlchemy session
+    :param string table_name: Name of the table
+    :param string column_name: Name of the pickled column
+    :param bool entries: Values are (pickled as dicts) entries, store them as :class:`~flexget.entry.Entry`
+    :return: Tuple of converted and removed row counts
+    """
+    table = table_schema(table_name, session)
+    column = table.c[column_name]
+    converted = removed = 0
+    last_id = 0
+    while True:
+        rows = session.execute(select([table.c.id, column]).where(table.c.id > last_id).
+                               order_by(table.c.id).limit(chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for id, data in rows:
+            if data is None:
+                continue
+            data = str(data)
+            if data[:1] in (serialization.FORMAT_JSON, serialization.FORMAT_JSON_ZLIB):
+                continue
+            try:
+                value = pickle.loads(data)
+                if entries:
+                    from flexget.entry import Entry
+                    value = Entry(value)
+                value = serialization.dumps(value)
+            except Exception, e:
+                log.debug('Removing unloadable %s row %s: %s' % (table_name, id, e))
+                session.execute(table.delete().where(table.c.id == id))
+                removed += 1
+                continue
+            session.execute(table.update().where(table.c.id == id).values({column_name: value}))
+            converted += 1
+    return converted, removed
+
+
 class CaseInsensitiveWord(Comparator):
     """Hybrid value representing a string that compares case insensitively."""
 
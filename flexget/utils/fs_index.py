@@ -0,0 +1,254 @@
+"""
+Persistent index of directory trees, used by the exists filters instead of walking the whole tree on every run.
+
+Every directory is stored with its modification time and the names it contains. Adding, removing or renaming anything
+in a directory changes its modification time, so :meth:`DirectoryIndex.refresh` lists only directories whose
+modification time differs from the stored one, the rest are only stat'ed.
+
+Values derived from the names, eg. parsed series identifiers, can be stored in the index with
+:meth:`DirectoryIndex.derive`. They are computed once for each name and kept until its directory changes, names
+whose value could not be computed (see :class:`DeriveFailed`) are tried again on next run.
+
+When the tree is watched by :mod:`flexget.utils.fs_watch`, the index is updated from its view instead.
+"""
+
+import logging
+import os
+import stat
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, Unicode, Float, DateTime, LargeBinary, ForeignKey
+from sqlalchemy.orm import relation
+from flexget import schema
+from flexget.event import event
+from flexget.utils import fs_watch
+from flexget.utils.database import serialized_synonym
+from flexget.utils.sqlalchemy_utils import drop_tables
+
+log = logging.getLogger('fs_index')
+Base = schema.versioned_base('fs_index', 1)
+
+# index of a path not used for this long is removed
+MAX_AGE = timedelta(days=30)
+
+# directories modified less than this many seconds before listing are listed again on next refresh, changes made
+# within the timestamp resolution of the filesystem would not be noticed otherwise
+SETTLE_TIME = 2
+
+
+@schema.upgrade('fs_index')
+def upgrade(ver, session):
+    if ver == 0:
+        # file names were stored decoded, the index is rebuilt on next run
+        drop_tables(['fs_index_directory', 'fs_index_root'], session)
+        # Create new tables from the current models
+        Base.metadata.create_all(bind=session.bind)
+        ver = 1
+    return ver
+
+
+class IndexRoot(Base):
+
+    __tablename__ = 'fs_index_root'
+
+    id = Column(Integer, primary_key=True)
+    path = Column(Unicode, index=True)
+    refreshed = Column(DateTime)
+
+    directories = relation('IndexedDirectory', cascade='all, delete, delete-orphan')
+
+
+class IndexedDirectory(Base):
+
+    __tablename__ = 'fs_index_directory'
+
+    id = Column(Integer, primary_key=True)
+    root_id = Column(Integer, ForeignKey('fs_index_root.id'), nullable=False, index=True)
+    path = Column(Unicode)
+    mtime = Column(Float)
+    # names of subdirectories as returned by the filesystem, they are used for walking the tree
+    _dirs = Column('dirs', LargeBinary)
+    dirs = serialized_synonym('_dirs')
+    # file names as returned by the filesystem
+    _files = Column('files', LargeBinary)
+    files = serialized_synonym('_files')
+    # key -> dict of name -> value, see DirectoryIndex.derive
+    _derived = Column('derived', LargeBinary)
+    derived = serialized_synonym('_derived')
+
+    def __repr__(self):
+        return '<IndexedDirectory(path=%s,mtime=%s)>' % (self.path, self.mtime)
+
+
+class DeriveFailed(Exception):
+    """Raised by functions given to :meth:`DirectoryIndex.derive` when a value could not be computed this time."""
+
+
+@event('manager.db_cleanup')
+def db_cleanup(session):
+    """Removes index of paths which are no longer configured."""
+    count = 0
+    for root in session.query(IndexRoot).filter(IndexRoot.refreshed < datetime.now() - MAX_AGE).all():
+        session.delete(root)
+        count += 1
+    if count:
+        log.verbose('Removed filesystem index of %s unused paths.' % count)
+
+
+def decode(name):
+    """Decode name returned by the filesystem the same way exists filters always have."""
+    return name.decode('utf-8', 'ignore')
+
+
+def _key(path):
+    return path.decode('utf-8', 'replace')
+
+
+class Directory(object):
+    """One directory of the index."""
+
+    def __init__(self, path, record):
+        #: path of the directory, as given to the filesystem
+        self.path = path
+        self.record = record
+        #: subdirectory and file names, as given to the filesystem
+        # (serialization returns ascii byte strings as unicode)
+        self.dirs = [name.encode('ascii') if isinstance(name, unicode) else name for name in record.dirs]
+        self.files = [name.encode('ascii') if isinstance(name, unicode) else name for name in record.files]
+        #: decoded subdirectory and file names
+        self.dir_names = [decode(name) for name in self.dirs]
+        self.file_names = [decode(name) for name in self.files]
+        self.derived = record.derived
+
+
+class DirectoryIndex(object):
+    """
+    Index of directory tree under *path*, which is walked like :func:`os.walk` does, without following links.
+
+    Changes to the index are stored in *session*.
+    """
+
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        #: :class:`Directory` instances of the tree, filled by :meth:`refresh`
+        self.directories = []
+        #: number of directories which were listed in last refresh
+        self.listed = 0
+
+    def refresh(self):
+        """Bring index up to date with the filesystem, :return: self"""
+        key = _key(self.path)
+        root = self.session.query(IndexRoot).filter(IndexRoot.path == key).first()
+        if root is None:
+            root = IndexRoot(path=key)
+            self.session.add(root)
+        root.refreshed = datetime.now()
+        known = dict((record.path, record) for record in root.directories)
+        self.directories = []
+        self.listed = 0
+        tree = fs_watch.tree(self.path)
+        if tree is None:
+            self._scan(root, known)
+        else:
+            for path, mtime, dirs, files in tree:
+                record = known.pop(_key(path), None)
+                # view is up to date, names tell whether directory has changed regardless of timestamp resolution
+                if record is None or record.dirs != dirs or record.files != files:
+                    record = self._store(root, record, path, mtime, dirs, files)
+                self.directories.append(Directory(path, record))
+        # directories which no longer exist
+        for record in known.itervalues():
+            root.directories.remove(record)
+        log.verbose('Indexed %s directories in %s, %s of them changed' % (len(self.directories), key, self.listed))
+        return self
+
+    def _scan(self, root, known):
+        stack = [self.path]
+        while stack:
+            path = stack.pop()
+            try:
+                info = os.stat(path) if path is self.path else os.lstat(path)
+            except OSError, e:
+                log.debug('Unable to stat %s: %s' % (path, e))
+                continue
+            if stat.S_ISLNK(info.st_mode):
+                continue
+            record = known.pop(_key(path), None)
+            if record is None or record.mtime != info.st_mtime:
+                try:
+                    names = os.listdir(path)
+                except OSError, e:
+                    log.debug('Unable to list %s: %s' % (path, e))
+                    continue
+                dirs, files = [], []
+                for name in names:
+                    if os.path.isdir(os.path.join(path, name)):
+                        dirs.append(name)
+                    else:
+                        files.append(name)
+                record = self._store(root, record, path, info.st_mtime, dirs, files)
+            directory = Directory(path, record)
+            self.directories.append(directory)
+            stack.extend(os.path.join(path, name) for name in directory.dirs)
+
+    def _store(self, root, record, path, mtime, dirs, files):
+        if record is None:
+            record = IndexedDirectory(path=_key(path))
+            root.directories.append(record)
+        record.mtime = mtime if time.time() - mtime > SETTLE_TIME else None
+        record.dirs = dirs
+        record.files = files
+        record.derived = {}
+        self.listed += 1
+        return record
+
+    def names(self):
+        """:return: Dict of decoded file and directory names to list of paths of directories containing them"""
+        result = {}
+        for directory in self.directories:
+            for name in directory.dir_names + directory.file_names:
+                result.setdefault(name, []).append(directory.path)
+        return result
+
+    def derive(self, key, function, files=True):
+        """
+        Values computed by *function* for names in the index, stored in the index until their directory changes.
+
+        :param string key: Identifies *function* and its parameters, computing values with a different function or
+            different *files* requires another key.
+        :param function: Called with a decoded name, returns a value storable with :mod:`flexget.utils.serialization`
+            or None if the name has no value. Raises :class:`DeriveFailed` if the value could not be computed, the
+            name is not stored and *function* is called with it again on next derive.
+        :param bool files: Whether values are computed for file names too, or only for directory names.
+        :return: List of (directory path, name, value) tuples of names which have a value
+        """
+        # names which failed are stored separately, so that values of unchanged directories are only read
+        retry_key = '%s retry' % key
+        result = []
+        for directory in self.directories:
+            values = directory.derived.get(key)
+            if values is None:
+                names = directory.dir_names + directory.file_names if files else directory.dir_names
+                values = {}
+            else:
+                names = directory.derived.get(retry_key)
+            if names:
+                failed = []
+                for name in names:
+                    try:
+                        value = function(name)
+                    except DeriveFailed:
+                        failed.append(name)
+                        continue
+                    if value is not None:
+                        values[name] = value
+                directory.derived[key] = values
+                if failed:
+                    directory.derived[retry_key] = failed
+                else:
+                    directory.derived.pop(retry_key, None)
+                # serialized when set, assign again to store
+                directory.record.derived = directory.derived
+            result.extend((directory.path, name, value) for name, value in values.iteritems())
+        return result
@@ -0,0 +1,321 @@
+"""
+Optional inotify based tracking of directory trees, for long running processes (daemon and webui with --watch-fs).
+
+While enabled, :func:`walk` and :func:`tree` answer from an in-memory view of each tree which has been asked for once.
+Only directories which the kernel has reported as changed are listed again, nothing needs to be walked between
+executions. Events are read when the view is used next, if the event queue overflowed meanwhile the tree is
+rescanned, listing only directories whose modification time has changed.
+
+Linux only, libc is used through ctypes. Elsewhere, or when the inotify watch limit is reached, :func:`tree` returns
+None and :func:`walk` walks the tree as :func:`os.walk`.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import threading
+
+log = logging.getLogger('fs_watch')
+
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_DONT_FOLLOW = 0x2000000
+IN_NONBLOCK = os.O_NONBLOCK
+
+# changes of directory contents, modifications of files do not matter
+WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | \
+    IN_DONT_FOLLOW
+
+EVENT = struct.Struct('iIII')
+
+_watcher = None
+# executions may run in several threads in webui
+_lock = threading.Lock()
+
+
+class Inotify(object):
+    """Non-blocking inotify instance."""
+
+    def __init__(self):
+        if not hasattr(ctypes, 'get_errno'):
+            # errno of foreign function calls is available since python 2.6
+            raise OSError(errno.ENOSYS, 'inotify requires python 2.6')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        try:
+            self._init = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not supported')
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._call(self._init, IN_NONBLOCK)
+
+    def _call(self, function, *args):
+        result = function(*args)
+        if result < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        return result
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """:return: Watch descriptor, watching a directory watched already returns its existing descriptor"""
+        return self._call(self._add_watch, self.fd, path, mask)
+
+    def rm_watch(self, wd):
+        try:
+            self._call(self._rm_watch, self.fd, wd)
+        except OSError, e:
+            # watch is removed by the kernel when directory is deleted
+            log.trace('Removing watch %s failed: %s' % (wd, e))
+
+    def read(self):
+        """:return: List of (watch descriptor, mask, name) of pending events"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError, e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    return events
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip('\0')
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TreeView(object):
+    """In-memory view of directory tree under *root*, kept up to date with inotify events."""
+
+    def __init__(self, watcher, root):
+        self.watcher = watcher
+        self.root = root
+        # path -> (mtime, subdirectory names, file names)
+        self.dirs = {}
+        # path -> watch descriptor
+        self.wds = {}
+        # directories which have changed since last update
+        self.dirty = set()
+        # event queue has overflowed, changes are unknown
+        self.stale = False
+
+    def _watch(self, path):
+        wd = self.watcher.inotify.add_watch(path)
+        self.wds[path] = wd
+        # same directory may be in several views, adding a watch again returns the same descriptor
+        watched = self.watcher.paths.setdefault(wd, [])
+        if (self, path) not in watched:
+            watched.append((self, path))
+
+    def _remove(self, path):
+        """Remove *path* and everything under it from the view."""
+        prefix = path.rstrip(os.sep) + os.sep
+        for other in [other for other in self.dirs if other == path or other.startswith(prefix)]:
+            del self.dirs[other]
+            wd = self.wds.pop(other, None)
+            watched = self.watcher.paths.get(wd, [])
+            if (self, other) in watched:
+                watched.remove((self, other))
+            # moved directory keeps its watch, it may already be watched under the new path
+            if wd is not None and not watched:
+                self.watcher.paths.pop(wd, None)
+                self.watcher.inotify.rm_watch(wd)
+
+    def _list(self, path):
+        """List *path* again and scan its new subdirectories."""
+        try:
+            # watch before listing, changes made while listing are reported
+            self._watch(path)
+            mtime = (os.stat if path == self.root else os.lstat)(path).st_mtime
+            names = os.listdir(path)
+        except OSError, e:
+            if e.errno == errno.ENOSPC:
+                raise
+            log.trace('Unable to list %s: %s' % (path, e))
+            self._remove(path)
+            return
+        dirs, files, subdirs = [], [], []
+        for name in names:
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                dirs.append(name)
+                # links are not followed, like os.walk does
+                if not os.path.islink(full):
+                    subdirs.append(full)
+            else:
+                files.append(name)
+        old = self.dirs.get(path)
+        self.dirs[path] = (mtime, dirs, files)
+        if old is not None:
+            for name in set(old[1]) - set(dirs):
+                self._remove(os.path.join(path, name))
+        for subdir in subdirs:
+            if subdir not in self.dirs:
+                self._list(subdir)
+
+    def scan(self):
+        """Scan whole tree, listing only directories whose modification time has changed."""
+        log.verbose('Scanning %s' % self.root)
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            known = self.dirs.get(path)
+            try:
+                changed = known is None or (os.stat if path == self.root else os.lstat)(path).st_mtime != known[0]
+            except OSError:
+                changed = True
+            if changed:
+                self._list(path)
+                if path not in self.dirs:
+                    continue
+            # new subdirectories have been scanned by _list already
+            old = set(known[1]) if known else set()
+            stack.extend(os.path.join(path, name) for name in self.dirs[path][1]
+                         if name in old and os.path.join(path, name) in self.dirs)
+        self.stale = False
+
+    def update(self):
+        """Apply changes reported since last update."""
+        if self.stale or not self.dirs:
+            self.dirty.clear()
+            self.scan()
+            return
+        dirty, self.dirty = self.dirty, set()
+        for path in sorted(dirty):
+            if path in self.dirs:
+                self._list(path)
+        if dirty:
+            log.debug('Listed %s changed directories in %s' % (len(dirty), self.root))
+
+    def walk(self, path=None):
+        """Yields (path, mtime, subdirectory names, file names) top-down, in the order :func:`os.walk` would."""
+        path = path or self.root
+        mtime, dirs, files = self.dirs[path]
+        yield path, mtime, list(dirs), list(files)
+        for name in dirs:
+            subdir = os.path.join(path, name)
+            if subdir in self.dirs:
+                for item in self.walk(subdir):
+                    yield item
+
+
+class Watcher(object):
+
+    def __init__(self):
+        self.inotify = Inotify()
+        # root -> TreeView
+        self.views = {}
+        # watch descriptor -> (TreeView, path)
+        self.paths = {}
+
+    def process_events(self):
+        for wd, mask, name in self.inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                log.verbose('Too many filesystem changes, directories will be rescanned')
+                for view in self.views.itervalues():
+                    if view is not None:
+                        view.stale = True
+                continue
+            watched = self.paths.get(wd, [])
+            if mask & IN_IGNORED:
+                # directory was removed or its watch was removed
+                self.paths.pop(wd, None)
+            for view, path in watched:
+                if mask & IN_IGNORED and view.wds.get(path) == wd:
+                    del view.wds[path]
+                view.dirty.add(path)
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF) and path != view.root:
+                    view.dirty.add(os.path.dirname(path))
+
+    def view(self, root):
+        view = self.views.get(root)
+        if view is None:
+            view = self.views[root] = TreeView(self, root)
+        self.process_events()
+        try:
+            view.update()
+        except OSError, e:
+            log.warning('Unable to watch %s, it will be walked instead: %s' % (root, e))
+            view._remove(root)
+            self.views[root] = view = None
+            return None
+        if root not in view.dirs:
+            # does not exist (anymore)
+            return None
+        return view
+
+    def close(self):
+        self.inotify.close()
+
+
+def enable(value=True):
+    """Start or stop watching, :return: Whether watching is enabled, it is not possible on all platforms."""
+    _lock.acquire()
+    try:
+        return _enable(value)
+    finally:
+        _lock.release()
+
+
+def _enable(value):
+    global _watcher
+    if not value:
+        if _watcher is not None:
+            _watcher.close()
+            _watcher = None
+        return False
+    if _watcher is None:
+        try:
+            _watcher = Watcher()
+        except OSError, e:
+            log.warning('Filesystem changes can not be watched: %s' % e)
+            return False
+    return True
+
+
+def tree(path):
+    """
+    Directory tree of *path* from the in-memory view, watching it from now on.
+
+    :return: List of (path, mtime, subdirectory names, file names) in :func:`os.walk` order, or None when watching
+        is not enabled or not possible
+    """
+    _lock.acquire()
+    try:
+        if _watcher is None:
+            return None
+        if path not in _watcher.views:
+            log.verbose('Watching %s for changes' % path)
+        elif _watcher.views[path] is None:
+            # watching failed before
+            return None
+        view = _watcher.view(path)
+        if view is None:
+            return None
+        return list(view.walk())
+    finally:
+        _lock.release()
+
+
+def walk(path):
+    """Like :func:`os.walk`, but answered from the in-memory view when watching is enabled."""
+    items = tree(path)
+    if items is None:
+        return os.walk(path)
+    return [(root, dirs, files) for root, mtime, dirs, files in items]
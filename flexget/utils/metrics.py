@@ -0,0 +1,257 @@
+"""
+Process wide metrics registry with counters, gauges and histograms, rendered in the Prometheus text format.
+
+Metrics are disabled by default, while disabled updating a metric returns right away. Metrics are created once
+at import time and updated with label values::
+
+    executions = metrics.counter('flexget_feed_executions_total', 'Feed executions', ['feed'])
+    executions.inc(feed=feed.name)
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# whether metrics are collected, see :func:`enable`
+enabled = False
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+# name -> metric, in registration order
+_metrics = {}
+_order = []
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    # float.is_integer needs python 2.6, int() fails for infinity and nan
+    if isinstance(value, float) and value == value and abs(value) != float('inf') and value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return unicode(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = zip(names, values)
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+class Metric(object):
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # label values tuple -> value
+        self.values = {}
+
+    def _key(self, labels):
+        try:
+            return tuple(labels[name] for name in self.labels)
+        except KeyError, e:
+            raise ValueError('Metric %s requires label %s' % (self.name, e))
+
+    def clear(self):
+        _lock.acquire()
+        try:
+            self.values.clear()
+        finally:
+            _lock.release()
+
+    def samples(self):
+        """:return: List of (suffix, label values, extra label, value) tuples"""
+        _lock.acquire()
+        try:
+            return [('', key, None, value) for key, value in sorted(self.values.iteritems())]
+        finally:
+            _lock.release()
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.type)]
+        for suffix, key, extra, value in self.samples():
+            lines.append('%s%s%s %s' % (self.name, suffix, _format_labels(self.labels, key, extra),
+                                        _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        _lock.acquire()
+        try:
+            self.values[key] = self.values.get(key, 0) + amount
+        finally:
+            _lock.release()
+
+    def get(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labels=()):
+        super(Gauge, self).__init__(name, help, labels)
+        self.function = None
+
+    def set(self, value, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        _lock.acquire()
+        try:
+            self.values[key] = value
+        finally:
+            _lock.release()
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        _lock.acquire()
+        try:
+            self.values[key] = self.values.get(key, 0) + amount
+        finally:
+            _lock.release()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Read value of an unlabeled gauge from *function* when rendered, instead of storing it."""
+        self.function = function
+
+    def get(self, **labels):
+        if self.function is not None:
+            return self.function()
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self.function is not None:
+            return [('', (), None, self.function())]
+        return super(Gauge, self).samples()
+
+
+class Histogram(Metric):
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        _lock.acquire()
+        try:
+            # list of bucket counts followed by count of values above buckets, and sum of values
+            data = self.values.get(key)
+            if data is None:
+                data = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            data[0][bisect_left(self.buckets, value)] += 1
+            data[1] += value
+        finally:
+            _lock.release()
+
+    def time(self, **labels):
+        """Context manager observing time spent in the block."""
+        return _Timer(self, labels)
+
+    def get(self, **labels):
+        """:return: Tuple of number and sum of observed values"""
+        data = self.values.get(self._key(labels))
+        if data is None:
+            return 0, 0.0
+        return sum(data[0]), data[1]
+
+    def samples(self):
+        result = []
+        _lock.acquire()
+        try:
+            for key, (counts, total) in sorted(self.values.iteritems()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    result.append(('_bucket', key, ('le', _format_value(float(bound))), cumulative))
+                result.append(('_sum', key, None, total))
+                result.append(('_count', key, None, cumulative))
+        finally:
+            _lock.release()
+        return result
+
+
+class _Timer(object):
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.time() - self.start, **self.labels)
+
+
+def _register(cls, name, *args, **kwargs):
+    _lock.acquire()
+    try:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, *args, **kwargs)
+            _order.append(name)
+        elif not isinstance(metric, cls):
+            raise ValueError('Metric %s is already registered as %s' % (name, metric.type))
+    finally:
+        _lock.release()
+    return metric
+
+
+def counter(name, help, labels=()):
+    """Return counter *name*, registering it if it does not exist yet."""
+    return _register(Counter, name, help, labels)
+
+
+def gauge(name, help, labels=()):
+    """Return gauge *name*, registering it if it does not exist yet."""
+    return _register(Gauge, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    """Return histogram *name*, registering it if it does not exist yet."""
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def enable(value=True):
+    global enabled
+    enabled = value
+
+
+def reset():
+    """Clear values of all metrics."""
+    for name in _order:
+        _metrics[name].clear()
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    return '\n'.join(_metrics[name].render() for name in _order) + '\n'
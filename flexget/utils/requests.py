@@ -7,6 +7,7 @@ from urlparse import urlparse
 import requests
 # Allow some request objects to be imported from here instead of requests
 from requests import RequestException
+from flexget.event import fire_event
 from flexget.utils.tools import parse_timedelta
 
 log = logging.getLogger('requests')
@@ -63,6 +64,14 @@ def cookies_for_url(url, cookiejar):
     return result
 
 
+def content_length(headers):
+    """Return size of response body from Content-Length header, 0 if not known."""
+    try:
+        return int(headers.get('content-length') or 0)
+    except ValueError:
+        return 0
+
+
 class Session(requests.Session):
     """Subclass of requests Session class which defines some of our own defaults, records unresponsive sites,
     and raises errors by default."""
@@ -159,11 +168,14 @@ class Session(requests.Session):
 
         try:
             result = requests.Session.request(self, method, url, *args, **kwargs)
-        except requests.Timeout:
-            # Mark this site in known unresponsive list
-            set_unresponsive(url)
+        except requests.RequestException, e:
+            if isinstance(e, requests.Timeout):
+                # Mark this site in known unresponsive list
+                set_unresponsive(url)
+            fire_event('http.error', url, e)
             raise
 
+        fire_event('http.response', url, content_length(result.headers), result.status_code)
         return result
 
 
@@ -0,0 +1,158 @@
+"""
+Compact, versioned serialization for values stored in the database (cached entries, backlog, simple persistence).
+
+Only plain data is stored: unicode and byte strings, numbers, booleans, None, datetimes and lists, tuples, sets
+and dicts of those. :class:`~flexget.entry.Entry` instances are restored as entries. Other objects (eg.
+LazyFields or parser instances) are silently left out, values subclassing builtin types are stored as the
+builtin type.
+
+Serialized data starts with a format byte so that the format can be changed later while still loading old rows,
+data without a known format byte is treated as legacy pickle.
+"""
+
+import logging
+import pickle
+import zlib
+from base64 import b64encode, b64decode
+from datetime import datetime, date, timedelta
+from flexget.utils import json
+
+log = logging.getLogger('serialization')
+
+# format bytes
+FORMAT_JSON = '\x01'
+FORMAT_JSON_ZLIB = '\x02'
+
+# values encoded larger than this are compressed
+COMPRESS_THRESHOLD = 256
+
+# key marking a tagged (non json) value in encoded dicts
+TAG = '$'
+
+
+class UnsupportedType(TypeError):
+    pass
+
+
+def _encode(value):
+    value_type = type(value)
+    if value_type in (unicode, int, long, float, bool) or value is None:
+        return value
+    if value_type is str:
+        try:
+            return value.decode('ascii')
+        except UnicodeDecodeError:
+            return {TAG: 'b', 'v': b64encode(value)}
+    if value_type is datetime:
+        return {TAG: 'dt', 'v': [value.year, value.month, value.day, value.hour, value.minute, value.second,
+                                 value.microsecond]}
+    if value_type is date:
+        return {TAG: 'd', 'v': [value.year, value.month, value.day]}
+    if value_type is timedelta:
+        return {TAG: 'td', 'v': [value.days, value.seconds, value.microseconds]}
+    if isinstance(value, dict):
+        from flexget.entry import Entry
+        if isinstance(value, Entry):
+            return {TAG: 'e', 'v': _encode_dict(dict.items(value))}
+        return _encode_dict(value.iteritems())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        result = _encode_items(value)
+        if isinstance(value, list):
+            return result
+        return {TAG: 't' if isinstance(value, tuple) else 's', 'v': result}
+    # subclasses of builtin types, eg. NavigableString
+    for base in (unicode, str, bool, int, long, float, datetime):
+        if isinstance(value, base):
+            return _encode(base(value))
+    raise UnsupportedType('%r cannot be serialized' % value_type)
+
+
+def _encode_items(values):
+    result = []
+    for value in values:
+        try:
+            result.append(_encode(value))
+        except UnsupportedType, e:
+            log.trace('skipped list item: %s' % e)
+    return result
+
+
+def _encode_dict(items):
+    result = {}
+    plain = True
+    for key, value in items:
+        try:
+            value = _encode(value)
+        except UnsupportedType, e:
+            log.trace('skipped key %s: %s' % (key, e))
+            continue
+        if not isinstance(key, basestring) or key == TAG:
+            plain = False
+        result[key] = value
+    if plain:
+        return result
+    # keys json can not represent, store as list of pairs
+    return {TAG: 'p', 'v': [[_encode(key), value] for key, value in result.iteritems()]}
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    tag = value.get(TAG)
+    if tag is None:
+        return dict((key, _decode(item)) for key, item in value.iteritems())
+    data = value['v']
+    if tag == 'e':
+        from flexget.entry import Entry
+        entry = Entry()
+        for key, item in data.iteritems():
+            # bypass Entry.__setitem__, values were validated when they were set originally
+            dict.__setitem__(entry, key, _decode(item))
+        return entry
+    if tag == 'dt':
+        return datetime(*data)
+    if tag == 'd':
+        return date(*data)
+    if tag == 'td':
+        return timedelta(*data)
+    if tag == 't':
+        return tuple(_decode(item) for item in data)
+    if tag == 's':
+        return set(_decode(item) for item in data)
+    if tag == 'b':
+        return b64decode(data)
+    if tag == 'p':
+        return dict((_decode(key), _decode(item)) for key, item in data)
+    raise ValueError('Unknown serialization tag %s' % tag)
+
+
+def dumps(value, compress=None):
+    """
+    :param value: Value to be serialized
+    :param compress: True or False to force compression, by default compresses when it's worth it
+    :return: Serialized string
+    """
+    data = json.dumps(_encode(value), separators=(',', ':'))
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    if compress or (compress is None and len(data) > COMPRESS_THRESHOLD):
+        compressed = zlib.compress(data)
+        if compress or len(compressed) < len(data):
+            return FORMAT_JSON_ZLIB + compressed
+    return FORMAT_JSON + data
+
+
+def loads(data):
+    """
+    :param string data: Serialized data, or legacy pickle
+    :return: Deserialized value
+    """
+    data = str(data)
+    format = data[:1]
+    if format == FORMAT_JSON:
+        return _decode(json.loads(data[1:]))
+    if format == FORMAT_JSON_ZLIB:
+        return _decode(json.loads(zlib.decompress(data[1:])))
+    return pickle.loads(data)
@@ -10,15 +10,15 @@ can replace underlying mechanism in single point (and provide transparent switch
 import logging
 from datetime import datetime
 import pickle
-from sqlalchemy import Column, Integer, String, DateTime, PickleType, select, Index
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, select, Index
 from UserDict import DictMixin
 from flexget import schema
 from flexget.manager import Session
-from flexget.utils.database import safe_pickle_synonym
+from flexget.utils.database import serialized_synonym, migrate_pickle_column
 from flexget.utils.sqlalchemy_utils import table_schema
 
 log = logging.getLogger('util.simple_persistence')
-Base = schema.versioned_base('simple_persistence', 2)
+Base = schema.versioned_base('simple_persistence', 3)
 
 
 @schema.upgrade('simple_persistence')
@@ -41,6 +41,9 @@ def upgrade(ver, session):
         log.info('Creating index on simple_persistence table.')
         Index('ix_simple_persistence_feed_plugin_key', table.c.feed, table.c.plugin, table.c.key).create(bind=session.bind)
         ver = 2
+    if ver == 2:
+        migrate_pickle_column(session, 'simple_persistence', 'value')
+        ver = 3
     return ver
 
 
@@ -53,8 +56,8 @@ class SimpleKeyValue(Base):
     feed = Column(String)
     plugin = Column(String)
     key = Column(String)
-    _value = Column('value', PickleType)
-    value = safe_pickle_synonym('_value')
+    _value = Column('value', LargeBinary)
+    value = serialized_synonym('_value')
     added = Column(DateTime, default=datetime.now())
 
     def __init__(self, feed, plugin, key, value):
@@ -6,6 +6,9 @@ from sqlalchemy.types import AbstractType
 from sqlalchemy.schema import Table, MetaData
 from sqlalchemy.exc import NoSuchTableError
 
+# values bound in one IN clause at most, SQLite allows only 999 bound variables in a statement by default
+IN_CHUNK_SIZE = 500
+
 
 def table_exists(name, session):
     """
@@ -93,6 +96,20 @@ def drop_tables(names, session):
             table.drop()
 
 
+def chunked(items, size=None):
+    """
+    Split *items* into lists small enough to be used in an IN clause.
+
+    :param items: Iterable of values
+    :param int size: Maximum length of the lists, :data:`IN_CHUNK_SIZE` by default
+    :return: Generator of lists
+    """
+    items = list(items)
+    size = size or IN_CHUNK_SIZE
+    for i in xrange(0, len(items), size):
+        yield items[i:i + size]
+
+
 def get_index_by_name(table, name):
     """
     Find declaratively defined index from table by name
@@ -0,0 +1,148 @@
+"""
+Startup profiling, enabled with --profile-startup.
+
+Records time spent importing modules, registering plugins, running schema upgrades and in the other startup steps.
+Recording functions do nothing unless profiling has been started, so they can be left in place.
+
+Times of different categories overlap, eg. registering a plugin is part of importing its module.
+"""
+
+import __builtin__
+import sys
+import time
+from contextlib import contextmanager
+
+TRACE_VERSION = 1
+
+# categories in report order, with their report titles
+CATEGORIES = [('step', 'Startup steps'),
+              ('import', 'Module imports (ms own, ms including imported modules)'),
+              ('register', 'Plugin registrations'),
+              ('upgrade', 'Schema upgrades')]
+
+_profile = None
+
+
+class StartupProfile(object):
+
+    def __init__(self):
+        self.started = time.time()
+        self.stopped = None
+        # list of (category, name, seconds, own seconds)
+        self.records = []
+        # time spent in nested imports, for each import in progress
+        self._nested = []
+        self._import = None
+
+    def install(self):
+        self._import = __builtin__.__import__
+        __builtin__.__import__ = self._profiled_import
+
+    def uninstall(self):
+        if self._import is not None:
+            __builtin__.__import__ = self._import
+            self._import = None
+        self.stopped = time.time()
+
+    def _profiled_import(self, name, globals=None, locals=None, fromlist=None, level=-1):
+        candidates = [name]
+        if globals and level != 0:
+            # implicit relative import, eg. `from event import x` inside flexget package
+            package = globals.get('__name__', '')
+            if '__path__' not in globals:
+                package = package.rpartition('.')[0]
+            if package:
+                candidates.insert(0, package + '.' + name)
+        if fromlist:
+            candidates.extend(module + '.' + item for module in candidates[:] for item in fromlist if item != '*')
+        missing = [module for module in candidates if sys.modules.get(module) is None]
+        self._nested.append(0.0)
+        start = time.time()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            took = time.time() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += took
+            # only imports which actually loaded something are interesting
+            loaded = [module for module in missing if sys.modules.get(module) is not None]
+            if loaded:
+                self.records.append(('import', ', '.join(loaded), took, took - nested))
+
+    def add(self, category, name, seconds, own=None):
+        self.records.append((category, name, seconds, seconds if own is None else own))
+
+    @property
+    def total(self):
+        return (self.stopped or time.time()) - self.started
+
+    def report(self, limit=20):
+        """Return human readable report of slowest records in each category."""
+        lines = ['Startup took %.1f ms' % (self.total * 1000)]
+        for category, title in CATEGORIES:
+            records = [r for r in self.records if r[0] == category]
+            if not records:
+                continue
+            records.sort(key=lambda r: r[3], reverse=True)
+            lines.append('')
+            lines.append('-- %s: %d, total %.1f ms %s' % (title, len(records), sum(r[3] for r in records) * 1000,
+                                                          '-' * 10))
+            for record in records[:limit]:
+                if category == 'import':
+                    lines.append('%9.1f %9.1f  %s' % (record[3] * 1000, record[2] * 1000, record[1]))
+                else:
+                    lines.append('%9.1f  %s' % (record[2] * 1000, record[1]))
+            if len(records) > limit:
+                lines.append('      ...  %d more' % (len(records) - limit))
+        return '\n'.join(lines)
+
+    def trace(self):
+        """Return all records in a json serializable form, suitable for comparing between versions."""
+        import flexget
+        return {'version': TRACE_VERSION,
+                'flexget': flexget.__version__,
+                'python': sys.version.split()[0],
+                'total': self.total,
+                'records': [{'category': category, 'name': name, 'seconds': seconds, 'own': own}
+                            for category, name, seconds, own in self.records]}
+
+
+def start():
+    """Start profiling startup, does nothing if already started."""
+    global _profile
+    if _profile is None:
+        _profile = StartupProfile()
+        _profile.install()
+    return _profile
+
+
+def stop():
+    """Stop profiling.
+
+    :return: :class:`StartupProfile` with the results, or None if profiling was not started
+    """
+    global _profile
+    profile, _profile = _profile, None
+    if profile is not None:
+        profile.uninstall()
+    return profile
+
+
+def record(category, name, seconds):
+    """Add a record, if profiling."""
+    if _profile is not None:
+        _profile.add(category, name, seconds)
+
+
+@contextmanager
+def timed(category, name):
+    """Context manager adding a record of the time spent in the block, if profiling."""
+    if _profile is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        record(category, name, time.time() - start)
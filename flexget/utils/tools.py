@@ -7,7 +7,7 @@ from urlparse import urlparse
 import time
 from htmlentitydefs import name2codepoint
 import re
-from datetime import timedelta
+from datetime import datetime, date, timedelta
 
 
 def str_to_boolean(string):
@@ -212,7 +212,8 @@ def urlopener(url_or_request, log, **kwargs):
     :param kwargs: Keyword arguments to be passed to urlopen
     :return: The file-like object returned by urlopen
     """
-    from flexget.utils.requests import is_unresponsive, set_unresponsive
+    from flexget.event import fire_event
+    from flexget.utils.requests import is_unresponsive, set_unresponsive, content_length
 
     if isinstance(url_or_request, urllib2.Request):
         url = url_or_request.get_host()
@@ -248,12 +249,14 @@ def urlopener(url_or_request, log, **kwargs):
             try:
                 retrieved = opener(url_or_request, kwargs.get('data'))
             except urllib2.HTTPError, e:
+                fire_event('http.error', url, e)
                 if e.code < 500:
                     # If it was not a server error, don't keep retrying.
                     log.warning('Could not retrieve url (HTTP %s error): %s' % (e.code, e.url))
                     raise
                 log.debug('HTTP error (try %i/%i): %s' % (i + 1, retries, e.code))
             except (urllib2.URLError, socket.timeout), e:
+                fire_event('http.error', url, e)
                 if hasattr(e, 'reason'):
                     reason = str(e.reason)
                 else:
@@ -275,6 +278,8 @@ def urlopener(url_or_request, log, **kwargs):
 
                 retrieved.__class__.__enter__ = enter
                 retrieved.__class__.__exit__ = exit
+                fire_event('http.response', url, content_length(retrieved.info()),
+                           getattr(retrieved, 'code', None))
                 return retrieved
 
         log.warning('Could not retrieve url: %s' % url_or_request)
@@ -338,3 +343,16 @@ def parse_timedelta(value):
         return timedelta(**params)
     except TypeError:
         raise ValueError('Invalid time format \'%s\'' % value)
+
+
+# types which can be shared instead of copied
+IMMUTABLE_TYPES = (unicode, str, int, long, float, bool, type(None), datetime, date, timedelta, frozenset)
+
+
+def is_immutable(value):
+    """
+    :return: True if *value* can be shared without copying
+    """
+    if type(value) is tuple:
+        return all(is_immutable(item) for item in value)
+    return type(value) in IMMUTABLE_TYPES
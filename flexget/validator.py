@@ -83,6 +83,13 @@ class Validator(object):
                 self._errors = Errors()
             return self._errors
 
+    def reset_errors(self):
+        """Clears errors from previous validation, allows reusing validator tree."""
+        if self.parent:
+            self.parent.reset_errors()
+        else:
+            self._errors = None
+
     def add_root_parent(self):
         if self.name == 'root':
             return self
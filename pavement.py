@@ -21,6 +21,8 @@ install_requires = ['FeedParser>=5.1', 'SQLAlchemy >=0.7, <0.8', 'PyYAML', 'Beau
                     'python-dateutil<2.0']
 if sys.version_info < (2, 6):
     install_requires.append('requests==0.10.0')
+    # json module is new in 2.6, database values are serialized with it
+    install_requires.append('simplejson')
 else:
     install_requires.append('requests>=0.10, !=0.10.1, <0.11') #URL quoting bug in 0.10.1
 
@@ -0,0 +1,231 @@
+from tests import FlexGetBase
+from flexget.manager import Session
+from flexget.plugins.generic import archive
+
+
+class TestArchiveSearch(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'Foo.Bar.S01E01.720p', url: 'http://localhost/1', description: 'pilot episode'}
+              - {title: 'Foo.Baz.S01E02', url: 'http://localhost/2', description: 'has foo bar in description'}
+              - {title: 'Something.Else', url: 'http://localhost/3'}
+            archive: [tv]
+          other:
+            mock:
+              - {title: 'Foo.Bar.S01E03', url: 'http://localhost/4'}
+            archive: yes
+    """
+
+    def search(self, text, **kwargs):
+        session = Session()
+        try:
+            return [ae.title for ae in archive.search(session, text, **kwargs)]
+        finally:
+            session.close()
+
+    def test_search(self):
+        self.execute_feed('test')
+        self.execute_feed('other')
+        assert self.search('foo bar') == ['Foo.Bar.S01E01.720p', 'Foo.Baz.S01E02', 'Foo.Bar.S01E03']
+        assert self.search('else') == ['Something.Else']
+        assert self.search('pil') == ['Foo.Bar.S01E01.720p'], 'prefix search failed'
+        assert self.search('foo missing') == []
+        assert self.search('') == []
+
+    def test_ranked(self):
+        self.execute_feed('test')
+        results = self.search('foo bar', ranked=True)
+        assert results[-1] == 'Foo.Baz.S01E02', 'description hit should rank lower than title hit'
+        assert len(self.search('foo bar', ranked=True, limit=1)) == 1
+
+    def test_filters(self):
+        self.execute_feed('test')
+        self.execute_feed('other')
+        assert self.search('foo', tags=[u'tv']) == ['Foo.Bar.S01E01.720p', 'Foo.Baz.S01E02']
+        assert self.search('foo', sources=[u'other']) == ['Foo.Bar.S01E03']
+
+    def test_delete(self):
+        self.execute_feed('test')
+        session = Session()
+        try:
+            session.delete(session.query(archive.ArchiveEntry).filter_by(title=u'Something.Else').one())
+            session.commit()
+        finally:
+            session.close()
+        assert self.search('else') == []
+
+    def test_reindex(self):
+        self.execute_feed('test')
+        session = Session()
+        try:
+            assert archive.rebuild_index(session) == 3
+            session.commit()
+        finally:
+            session.close()
+        assert self.search('foo bar') == ['Foo.Bar.S01E01.720p', 'Foo.Baz.S01E02']
+
+
+class TestArchiveWrite(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          feed_a:
+            mock:
+              - {title: 'x', url: 'http://x'}
+              - {title: 'y', url: 'http://y'}
+              - {title: 'y', url: 'http://y'}
+            archive: [tag1]
+          feed_b:
+            mock:
+              - {title: 'x', url: 'http://x'}
+              - {title: 'x', url: 'http://other'}
+            archive: [tag2]
+    """
+
+    def test_existing(self):
+        self.execute_feed('feed_a')
+        self.execute_feed('feed_b')
+        self.execute_feed('feed_a')
+        session = Session()
+        try:
+            entries = sorted((ae.title, ae.url, sorted(s.name for s in ae.sources), sorted(t.name for t in ae.tags))
+                             for ae in session.query(archive.ArchiveEntry))
+        finally:
+            session.close()
+        assert entries == [(u'x', u'http://other', [u'feed_b'], [u'tag2']),
+                           (u'x', u'http://x', [u'feed_a', u'feed_b'], [u'tag1', u'tag2']),
+                           (u'y', u'http://y', [u'feed_a'], [u'tag1'])], entries
+
+    def test_existing_same_title(self):
+        from flexget.entry import Entry
+        self.execute_feed('feed_a')
+        session = Session()
+        try:
+            # archived entry shares a title with the new one
+            entries = [Entry(title=u'x', url=u'http://x'), Entry(title=u'x', url=u'http://other')]
+            assert archive.archive_entries(session, entries, u'feed_b', [u'tag2']) == 1
+            session.commit()
+            for table in archive.archive_sources_table, archive.archive_tags_table:
+                rows = [tuple(row) for row in session.execute(table.select())]
+                assert len(rows) == len(set(rows)), 'associations should not be duplicated: %s' % rows
+        finally:
+            session.close()
+
+
+class TestArchiveKeywordIndex(TestArchiveSearch):
+    """Same tests using the fallback inverted index."""
+
+    def setup(self):
+        self.fts_modules = archive.FTS_MODULES
+        archive.FTS_MODULES = []
+        super(TestArchiveKeywordIndex, self).setup()
+
+    def teardown(self):
+        archive.FTS_MODULES = self.fts_modules
+        super(TestArchiveKeywordIndex, self).teardown()
+
+
+class TestArchiveFts4Index(TestArchiveKeywordIndex):
+    """Same tests using FTS4, which has no builtin ranking function."""
+
+    def setup(self):
+        self.fts_modules = archive.FTS_MODULES
+        archive.FTS_MODULES = ['fts4']
+        super(TestArchiveKeywordIndex, self).setup()
+
+
+class TestArchiveConsolidate(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'irrelevant'}
+    """
+
+    def add_legacy(self, items):
+        """Adds entries in the old data model, without sources"""
+        session = Session()
+        try:
+            for title, url, feed in items:
+                ae = archive.ArchiveEntry()
+                ae.title, ae.url, ae.feed = title, url, feed
+                session.add(ae)
+            session.commit()
+        finally:
+            session.close()
+
+    def entries(self):
+        session = Session()
+        try:
+            return sorted((ae.title, ae.url, sorted(s.name for s in ae.sources))
+                          for ae in session.query(archive.ArchiveEntry))
+        finally:
+            session.close()
+
+    def test_consolidate(self):
+        self.add_legacy([(u'a', u'http://a', u'feed1'), (u'b', u'http://b', u'feed1'),
+                         (u'a', u'http://a', u'feed2'), (u'a', u'http://other', u'feed2'),
+                         (u'c', u'http://c', u'feed3'), (u'b', u'http://b', u'feed1')])
+        consolidator = archive.Consolidator(chunk_size=2)
+        assert consolidator.run()
+        assert self.entries() == [(u'a', u'http://a', [u'feed1', u'feed2']), (u'a', u'http://other', [u'feed2']),
+                                  (u'b', u'http://b', [u'feed1']), (u'c', u'http://c', [u'feed3'])]
+        assert consolidator.stats['duplicates'] == 2
+        assert consolidator.stats['processed'] == 6
+        assert consolidator.stats['chunks'] == 2
+        # already consolidated
+        assert not archive.Consolidator().run()
+
+    def test_resume(self):
+        self.add_legacy([(u'a', u'http://a', u'feed1'), (u'a', u'http://a', u'feed2'),
+                         (u'b', u'http://b', u'feed1'), (u'b', u'http://b', u'feed2')])
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert not consolidator.run(lambda stats: consolidator.stop())
+        assert self.entries() == [(u'a', u'http://a', [u'feed1', u'feed2']),
+                                  (u'b', u'http://b', []), (u'b', u'http://b', [])]
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert consolidator.run()
+        assert consolidator.stats['processed'] == consolidator.stats['total']
+        assert self.entries() == [(u'a', u'http://a', [u'feed1', u'feed2']), (u'b', u'http://b', [u'feed1', u'feed2'])]
+
+    def test_resume_null_url(self):
+        self.add_legacy([(u'a', None, u'feed1'), (u'a', None, u'feed2'),
+                         (u'a', u'http://a', u'feed1'), (u'a', u'http://a', u'feed2')])
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert not consolidator.run(lambda stats: consolidator.stop())
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert consolidator.run()
+        assert consolidator.stats['processed'] == consolidator.stats['total']
+        assert self.entries() == [(u'a', None, [u'feed1', u'feed2']), (u'a', u'http://a', [u'feed1', u'feed2'])]
+
+    def test_resume_null_title(self):
+        self.add_legacy([(None, u'http://a', u'feed1'), (None, u'http://a', u'feed2'),
+                         (None, u'http://b', u'feed1'), (u'a', u'http://a', u'feed1'), (u'a', u'http://a', u'feed2')])
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert not consolidator.run(lambda stats: consolidator.stop())
+        consolidator = archive.Consolidator(chunk_size=1)
+        assert consolidator.run()
+        assert consolidator.stats['processed'] == consolidator.stats['total']
+        assert self.entries() == [(None, u'http://a', [u'feed1', u'feed2']), (None, u'http://b', [u'feed1']),
+                                  (u'a', u'http://a', [u'feed1', u'feed2'])]
+
+    def test_chunked_in_lists(self):
+        from flexget.utils import sqlalchemy_utils
+        items = [(u'title%s' % (i % 7), u'http://%s' % (i % 5), u'feed%s' % (i % 3)) for i in range(100)]
+        self.add_legacy(items)
+        expected = {}
+        for title, url, feed in items:
+            expected.setdefault((title, url), set()).add(feed)
+        in_chunk_size = sqlalchemy_utils.IN_CHUNK_SIZE
+        sqlalchemy_utils.IN_CHUNK_SIZE = 3
+        try:
+            consolidator = archive.Consolidator(chunk_size=50)
+            assert consolidator.run()
+        finally:
+            sqlalchemy_utils.IN_CHUNK_SIZE = in_chunk_size
+        assert self.entries() == sorted((title, url, sorted(feeds)) for (title, url), feeds in expected.iteritems())
+        assert consolidator.stats['duplicates'] == 65
@@ -56,3 +56,53 @@ class TestInputCache(FlexGetBase):
         assert self.feed.entries, 'should have created entries at the start'
         self.execute_feed('test_db')
         assert self.feed.entries, 'should have created entries from the cache'
+
+
+class TestCacheSnapshots(object):
+
+    def test_thaw(self):
+        from flexget.utils.cached_input import freeze, thaw
+        entry = Entry(title=u'Test', url=u'http://test.com', list=[1, 2])
+        entry.register_lazy_fields(['lazy'], lambda entry, field: entry['title'])
+        snapshot = freeze(entry)
+        entry['list'].append(3)
+        entry['title'] = u'Changed'
+        fresh = thaw(snapshot)
+        assert dict.get(fresh, 'list') is dict(snapshot)['list'], 'mutable field should be copied only when accessed'
+        assert fresh['title'] == u'Test'
+        assert fresh['list'] == [1, 2], 'mutable field should not be shared'
+        assert fresh['lazy'] == u'Test', 'lazy field should be evaluated against the restored entry'
+        fresh['list'].append(4)
+        assert thaw(snapshot)['list'] == [1, 2]
+
+    def test_thaw_batch(self):
+        from flexget.utils.cached_input import freeze, thaw
+        from flexget.entry import LazyBatch
+        resolved = []
+
+        def bulk(entries):
+            resolved.append(len(entries))
+            for entry in entries:
+                entry['lazy'] = u'bulk'
+
+        batch = LazyBatch(bulk)
+        entry = Entry(title=u'Test', url=u'http://test.com')
+        entry.register_lazy_fields(['lazy'], lambda entry, field: u'single', batch=batch)
+        snapshot = freeze(entry)
+        batch.resolve()
+        fresh = [thaw(snapshot), thaw(snapshot)]
+        assert [e['lazy'] for e in fresh] == [u'bulk', u'bulk'], 'restored entries should be resolved in bulk'
+        assert resolved == [1, 2]
+
+    def test_lru(self):
+        from flexget.utils.cached_input import LRUCache
+        cache = LRUCache(max_size=3)
+        cache['a'] = [1]
+        cache['b'] = [1, 2]
+        cache['a']
+        cache['c'] = [1]
+        assert 'a' in cache and 'c' in cache
+        assert 'b' not in cache, 'least recently used should have been evicted'
+        assert cache.size == 2
+        cache['d'] = [1, 2, 3, 4]
+        assert 'd' not in cache, 'results larger than the cache should not be stored'
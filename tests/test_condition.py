@@ -39,6 +39,14 @@ class TestCondition(FlexGetBase):
                   set:
                     some_field: some value
                   accept_all: yes
+
+          test_missing_field:
+            if:
+              - "rating > 5 or year > 2010": accept
+
+          test_invalid:
+            if:
+              - "year >": accept
     """
 
     def test_reject(self):
@@ -67,6 +75,35 @@ class TestCondition(FlexGetBase):
         assert entry
         assert len(self.feed.accepted) == 1
 
+    def test_missing_field(self):
+        self.execute_feed('test_missing_field')
+        assert self.feed.find_entry('accepted', title='brilliant')
+        assert not self.feed.find_entry('accepted', title='fresh'), 'fresh has no rating, condition should fail'
+        assert len(self.feed.accepted) == 1
+
+    def test_invalid(self):
+        self.execute_feed('test_invalid')
+        assert self.feed._abort, 'invalid condition should have aborted the feed'
+
+    def test_lazy_fields(self):
+        from flexget.entry import Entry
+        from flexget.plugins.filter.if_condition import FilterIf, compile_condition
+        lookups = []
+
+        def lookup(entry, field):
+            lookups.append(field)
+            entry['rating'] = 8.0
+            return entry['rating']
+
+        entries = [Entry(title='a', url='http://a', year=2000), Entry(title='b', url='http://b', year=2012)]
+        for entry in entries:
+            entry.register_lazy_fields(['rating'], lookup)
+        condition = 'year > 2010 and rating > 7 and has_field("title") and len(title) == 1'
+        passed = FilterIf().passed_entries(condition, compile_condition(condition), entries)
+        assert passed == [entries[1]]
+        assert lookups == ['rating'], 'lazy field should have been evaluated only when used'
+        assert entries[0].is_lazy('rating'), 'rating of the first entry should not have been looked up'
+
 
 class TestQualityCondition(FlexGetBase):
 
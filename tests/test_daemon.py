@@ -0,0 +1,91 @@
+import os
+import socket
+import threading
+from cStringIO import StringIO
+from tests import FlexGetBase
+from flexget import daemon
+
+
+class TestDaemon(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'entry'}
+            accept_all: yes
+          other:
+            mock:
+              - {title: 'other'}
+    """
+
+    def setup(self):
+        super(TestDaemon, self).setup()
+        self.daemon = daemon.Daemon(self.manager)
+
+    def request(self, *argv):
+        server, client = socket.socketpair()
+        output = StringIO()
+        result = []
+        argv = list(argv)
+        if '-c' not in argv:
+            # client sends the config it resolved
+            argv += ['-c', self.daemon.config]
+        # execution has to run in this thread, in-memory test database is not shared between threads
+        thread = threading.Thread(target=lambda: result.append(daemon.request(client, argv, output)))
+        thread.start()
+        try:
+            self.daemon.handle(server)
+        finally:
+            server.close()
+            thread.join()
+            client.close()
+        return result[0], output.getvalue()
+
+    def test_parse(self):
+        config = ['-c', self.daemon.config]
+        options, reason = self.daemon.parse(['--now', '--feed', 'test', '--learn'] + config)
+        assert options and options.onlyfeed == 'test' and options.interval_ignore, reason
+        options, reason = self.daemon.parse(['--test'] + config)
+        assert options is None and 'test' in reason
+        options, reason = self.daemon.parse(['--no-such-option'] + config)
+        assert options is None
+
+    def test_parse_empty(self):
+        # must not fall back to parsing the daemon's own command line
+        options, reason = self.daemon.parse([])
+        assert options, reason
+        assert options.onlyfeed is None
+
+    def test_other_config(self):
+        other = os.path.join(os.path.dirname(self.daemon.config), 'other.yml')
+        options, reason = self.daemon.parse(['-c', other])
+        assert options is None and self.daemon.config in reason
+        status, output = self.request('-c', other)
+        assert status is None, 'request for other config should be ran locally'
+
+    def test_execute(self):
+        status, output = self.request('--feed', 'test')
+        assert status == 0, output
+        assert self.manager.feeds['test'].find_entry('accepted', title='entry')
+        assert not self.manager.feeds['other'].entries, 'other feed should not run'
+        # feeds disabled by --feed are enabled for next executions
+        status, output = self.request()
+        assert status == 0, output
+        assert self.manager.feeds['other'].find_entry(title='other')
+        assert self.manager.options.onlyfeed is None, 'options should be restored'
+
+    def test_local(self):
+        status, output = self.request('--reset')
+        assert status is None, 'unsupported options should be ran locally'
+
+    def test_config_arg(self):
+        assert daemon._config_arg(['-c', '/path/to/my.yml']) == '/path/to/my.yml'
+        assert daemon._config_arg(['-cmy.yml']) == 'my.yml'
+        assert daemon._config_arg([]) == 'config.yml'
+
+    def test_socket_path(self):
+        path = daemon.socket_path('/path/to/my.yml')
+        assert os.path.basename(path).startswith('daemon-my-')
+        assert path == daemon.socket_path('/path/to/my.yml')
+        assert path != daemon.socket_path('/other/path/to/my.yml'), 'configs with same name should not share a daemon'
@@ -0,0 +1,107 @@
+import copy
+import pickle
+import struct
+import sys
+import timeit
+from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
+from flexget.entry import Entry
+
+
+class TestEntry(object):
+
+    def test_special_fields(self):
+        entry = Entry(title='title', url='http://localhost/')
+        assert entry['original_url'] == u'http://localhost/'
+        entry['url'] = u'http://localhost/other'
+        assert entry['original_url'] == u'http://localhost/', 'original_url should not change'
+        entry['imdb_url'] = 'http://www.imdb.com/title/tt0936501/?ref'
+        assert entry['imdb_url'] == u'http://www.imdb.com/title/tt0936501/'
+
+    def test_lazy_containers(self):
+        entry = Entry(title='title', url='http://localhost/')
+        assert not hasattr(entry, '__dict__'), 'entry should not have instance dict'
+        assert entry._trace is None and entry._snapshots is None
+        entry.take_snapshot('test')
+        assert entry.snapshots['test'] == entry
+        entry.trace.append(('plugin', 'message'))
+        assert entry.trace == [('plugin', 'message')]
+
+    def test_copy(self):
+        entry = Entry(title='title', url='http://localhost/', list=[1])
+        entry.trace.append(('plugin', 'message'))
+        for protocol in (0, 2):
+            restored = pickle.loads(pickle.dumps(entry, protocol))
+            assert restored == entry and restored.trace == entry.trace
+        restored = copy.deepcopy(entry)
+        assert restored == entry and restored.trace == entry.trace
+        assert restored['list'] is not entry['list']
+
+
+@attr('performance')
+class TestEntryPerformance(object):
+
+    def test_memory(self):
+        if not hasattr(sys, 'getsizeof'):
+            raise SkipTest('sys.getsizeof is not available')
+        size = sys.getsizeof(Entry(title='title', url='http://localhost/'))
+        plain = sys.getsizeof(dict(title=u'title', url=u'http://localhost/', original_url=u'http://localhost/'))
+        # slots add one pointer each compared to a plain dict
+        assert size <= plain + len(Entry.__slots__) * struct.calcsize('P'), 'entry takes %s bytes, dict %s bytes' % (size, plain)
+
+    def test_set_get(self):
+        setup = 'from flexget.entry import Entry; entry = Entry(title="title", url="http://localhost/")'
+        set_time = min(timeit.repeat('entry["field"] = u"value"', setup, number=10000, repeat=3))
+        get_time = min(timeit.repeat('entry["field"]', setup + '; entry["field"] = 1', number=10000, repeat=3))
+        # generous bounds, these only catch pathological slowdowns such as formatting disabled log messages
+        assert set_time < 0.5, 'setting 10000 fields took %.3fs' % set_time
+        assert get_time < 0.5, 'getting 10000 fields took %.3fs' % get_time
+
+
+class TestSnapshots(object):
+
+    def test_shared(self):
+        entry = Entry(title='title', url='http://localhost/', list=[1], immutable=(1, 2))
+        entry.take_snapshot('test')
+        snapshot = entry.snapshots['test']
+        assert snapshot['list'] is dict.get(entry, 'list'), 'values should be shared until accessed'
+        entry['list'].append(2)
+        assert snapshot['list'] == [1], 'mutation through the entry should not change snapshot'
+        assert entry['list'] == [1, 2]
+        entry['title'] = u'changed'
+        entry['immutable'] += (3,)
+        assert snapshot['title'] == u'title' and snapshot['immutable'] == (1, 2)
+
+    def test_setdefault(self):
+        entry = Entry(title='title', url='http://localhost/', list=[1])
+        entry.take_snapshot('test')
+        entry.setdefault('list', []).append(2)
+        assert entry.snapshots['test']['list'] == [1], 'mutation through setdefault should not change snapshot'
+        assert entry['list'] == [1, 2]
+
+    def test_multiple(self):
+        entry = Entry(title='title', url='http://localhost/', dict={'a': 1})
+        entry.take_snapshot('first')
+        entry.take_snapshot('second')
+        for key, value in entry.iteritems():
+            if key == 'dict':
+                value['b'] = 2
+        assert entry.snapshots['first']['dict'] == {'a': 1}
+        assert entry.snapshots['second']['dict'] == {'a': 1}
+
+    def test_reassign(self):
+        entry = Entry(title='title', url='http://localhost/', list=[1])
+        entry.take_snapshot('test')
+        original = dict.get(entry, 'list')
+        entry['list'] = [2]
+        entry['list'].append(3)
+        assert entry.snapshots['test']['list'] is original, 'reassigned field should not need a copy'
+        assert original == [1]
+
+    def test_copy(self):
+        entry = Entry(title='title', url='http://localhost/', list=[1])
+        entry.take_snapshot('test')
+        restored = copy.deepcopy(entry)
+        restored['list'].append(2)
+        assert restored.snapshots['test']['list'] == [1]
+        assert entry['list'] == [1]
@@ -0,0 +1,85 @@
+import os
+import shutil
+from tests import FlexGetBase
+from tests.util import maketemp
+
+
+class TestFind(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test_flat:
+            find:
+              mask: '*.mkv'
+          test_recursive:
+            find:
+              mask: '*.mkv'
+              recursive: yes
+          test_depth:
+            find:
+              mask: '*.mkv'
+              max_depth: 1
+          test_prune:
+            find:
+              mask: '*.mkv'
+              recursive: yes
+              prune:
+                - sample
+                - '.*'
+              threads: 2
+    """
+
+    files = ['1.mkv', '1.txt', os.path.join('a', '2.mkv'), os.path.join('a', 'b', '3.mkv'),
+             os.path.join('a', 'Sample', '4.mkv'), os.path.join('.hidden', '5.mkv')]
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        self.test_home = maketemp()
+        for feed in self.manager.config['feeds'].itervalues():
+            feed['find']['path'] = self.test_home
+        for name in self.files:
+            path = os.path.join(self.test_home, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+    def teardown(self):
+        shutil.rmtree(self.test_home)
+        FlexGetBase.teardown(self)
+
+    def titles(self, feed):
+        self.execute_feed(feed)
+        return sorted(entry['title'] for entry in self.feed.entries)
+
+    def test_flat(self):
+        assert self.titles('test_flat') == ['1.mkv']
+
+    def test_recursive(self):
+        assert self.titles('test_recursive') == ['1.mkv', '2.mkv', '3.mkv', '4.mkv', '5.mkv']
+        entry = self.feed.find_entry(title='3.mkv')
+        assert entry['location'] == os.path.join(self.test_home, 'a', 'b', '3.mkv')
+
+    def test_depth(self):
+        assert self.titles('test_depth') == ['1.mkv', '2.mkv', '5.mkv']
+
+    def test_prune(self):
+        assert self.titles('test_prune') == ['1.mkv', '2.mkv', '3.mkv']
+
+    def test_order(self):
+        self.execute_feed('test_recursive')
+        # directories are listed in parallel, entries are still sorted by directory
+        assert [entry['title'] for entry in self.feed.entries] == ['1.mkv', '5.mkv', '2.mkv', '4.mkv', '3.mkv']
+
+    def test_flat_no_threads(self):
+        from flexget.plugins.input import find
+
+        def no_threads(*args, **kwargs):
+            raise AssertionError('flat scan should not start threads')
+
+        old_thread, find.threading.Thread = find.threading.Thread, no_threads
+        try:
+            items = list(find.scan(self.test_home, max_depth=0))
+        finally:
+            find.threading.Thread = old_thread
+        assert len(items) == 1 and items[0][0] == self.test_home
+        assert sorted(items[0][2]) == ['1.mkv', '1.txt']
@@ -0,0 +1,163 @@
+import os
+import shutil
+import time
+from nose.plugins.skip import SkipTest
+from tests import FlexGetBase
+from tests.util import maketemp
+from flexget.manager import Session
+from flexget.utils import fs_watch
+from flexget.utils import fs_index
+from flexget.utils.fs_index import DirectoryIndex
+
+
+class TestDirectoryIndex(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'Existing'}
+              - {title: 'existing.file'}
+              - {title: 'New'}
+            accept_all: yes
+            exists: autogenerated in setup()
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        self.test_home = maketemp()
+        self.manager.config['feeds']['test']['exists'] = self.test_home
+        for path in ['Existing', 'sub', os.path.join('sub', 'deep')]:
+            os.mkdir(os.path.join(self.test_home, path))
+        self.touch('sub', 'deep', 'existing.file')
+        self.settle()
+        self.db_session = Session()
+
+    def teardown(self):
+        self.db_session.close()
+        shutil.rmtree(self.test_home)
+        FlexGetBase.teardown(self)
+
+    def touch(self, *path):
+        open(os.path.join(self.test_home, *path), 'w').close()
+
+    def settle(self):
+        """Make directories look like they have not been modified recently."""
+        past = time.time() - 60
+        for root, dirs, files in os.walk(self.test_home):
+            os.utime(root, (past, past))
+
+    def refresh(self):
+        return DirectoryIndex(self.db_session, self.test_home).refresh()
+
+    def test_exists(self):
+        self.execute_feed('test')
+        assert self.feed.find_entry('rejected', title='Existing'), 'directory should exist'
+        assert self.feed.find_entry('rejected', title='existing.file'), 'file in subdirectory should exist'
+        assert self.feed.find_entry('accepted', title='New')
+
+    def test_incremental(self):
+        index = self.refresh()
+        assert index.listed == 4
+        assert sorted(index.names()) == ['Existing', 'deep', 'existing.file', 'sub']
+        self.db_session.commit()
+
+        index = self.refresh()
+        assert index.listed == 0, 'unchanged directories should not be listed again'
+        assert sorted(index.names()) == ['Existing', 'deep', 'existing.file', 'sub']
+
+        self.touch('sub', 'deep', 'other.file')
+        os.rmdir(os.path.join(self.test_home, 'Existing'))
+        index = self.refresh()
+        assert index.listed == 2, 'changed directories should be listed'
+        assert sorted(index.names()) == ['deep', 'existing.file', 'other.file', 'sub']
+
+    def test_watched(self):
+        if not fs_watch.enable():
+            raise SkipTest('inotify is not available')
+        try:
+            index = self.refresh()
+            assert index.listed == 4
+            self.db_session.commit()
+            self.touch('sub', 'deep', 'other.file')
+            index = self.refresh()
+            assert index.listed == 1, 'only changed directory should be stored'
+            assert 'other.file' in index.names()
+        finally:
+            fs_watch.enable(False)
+
+    def test_upgrade(self):
+        self.refresh()
+        self.db_session.commit()
+        from flexget.schema import PluginSchema, get_version
+        self.db_session.query(PluginSchema).filter(PluginSchema.plugin == 'fs_index').update({'version': 0})
+        self.db_session.commit()
+        fs_index.upgrade(self.manager)
+        assert get_version('fs_index') == 1
+        assert not self.manager.db_upgrade_failed
+        # tables are recreated empty
+        index = self.refresh()
+        assert index.listed == 4
+        self.db_session.commit()
+        self.execute_feed('test')
+        assert self.feed.find_entry('rejected', title='Existing')
+
+    def test_derive(self):
+        parsed = []
+
+        def parse(name):
+            parsed.append(name)
+            if name.endswith('.file'):
+                return name.upper()
+
+        index = self.refresh()
+        assert index.derive('test', parse) == [(os.path.join(self.test_home, 'sub', 'deep'), 'existing.file',
+                                                'EXISTING.FILE')]
+        assert len(parsed) == 4
+        self.db_session.commit()
+
+        del parsed[:]
+        index = self.refresh()
+        assert len(index.derive('test', parse)) == 1
+        assert not parsed, 'values should have been stored'
+        assert not index.derive('dirs', parse, files=False)
+        assert sorted(parsed) == ['Existing', 'deep', 'sub']
+
+        del parsed[:]
+        self.touch('sub', 'deep', 'other.file')
+        index = self.refresh()
+        assert sorted(value for path, name, value in index.derive('test', parse)) == ['EXISTING.FILE', 'OTHER.FILE']
+        assert sorted(parsed) == ['existing.file', 'other.file'], 'only changed directory should be parsed'
+
+    def test_derive_failed(self):
+        parsed = []
+        available = []
+
+        def parse(name):
+            parsed.append(name)
+            if name == 'Existing' and not available:
+                raise fs_index.DeriveFailed('service is down')
+            return name.upper()
+
+        index = self.refresh()
+        assert sorted(value for path, name, value in index.derive('dirs', parse, files=False)) == ['DEEP', 'SUB']
+        self.db_session.commit()
+
+        del parsed[:]
+        index = self.refresh()
+        assert len(index.derive('dirs', parse, files=False)) == 2
+        assert parsed == ['Existing'], 'only failed name should be tried again'
+        self.db_session.commit()
+
+        del parsed[:]
+        available.append(True)
+        index = self.refresh()
+        assert sorted(value for path, name, value in index.derive('dirs', parse, files=False)) == \
+            ['DEEP', 'EXISTING', 'SUB']
+        assert parsed == ['Existing']
+        self.db_session.commit()
+
+        del parsed[:]
+        index = self.refresh()
+        assert len(index.derive('dirs', parse, files=False)) == 3
+        assert not parsed, 'value should have been stored once computed'
@@ -0,0 +1,60 @@
+import os
+import shutil
+from nose.plugins.skip import SkipTest
+from tests.util import maketemp
+from flexget.utils import fs_watch
+
+
+class TestFsWatch(object):
+
+    def setup(self):
+        if not fs_watch.enable():
+            raise SkipTest('inotify is not available')
+        self.root = maketemp()
+        os.makedirs(os.path.join(self.root, 'a', 'b'))
+        self.touch('a', 'b', 'file')
+
+    def teardown(self):
+        fs_watch.enable(False)
+        shutil.rmtree(self.root)
+
+    def touch(self, *path):
+        open(os.path.join(self.root, *path), 'w').close()
+
+    def walk(self):
+        return sorted(fs_watch.walk(self.root))
+
+    def test_changes(self):
+        assert self.walk() == sorted(os.walk(self.root))
+        self.touch('new')
+        os.makedirs(os.path.join(self.root, 'c', 'd'))
+        self.touch('c', 'd', 'deep')
+        os.rename(os.path.join(self.root, 'a', 'b'), os.path.join(self.root, 'c', 'b'))
+        assert self.walk() == sorted(os.walk(self.root))
+        shutil.rmtree(os.path.join(self.root, 'c'))
+        assert self.walk() == sorted(os.walk(self.root))
+        assert fs_watch.walk(os.path.join(self.root, 'missing')) is not None
+
+    def test_only_changed_listed(self):
+        fs_watch.walk(self.root)
+        listed = []
+        original = fs_watch.TreeView._list
+
+        def _list(view, path):
+            listed.append(path)
+            return original(view, path)
+
+        fs_watch.TreeView._list = _list
+        try:
+            self.touch('a', 'other')
+            assert self.walk() == sorted(os.walk(self.root))
+            assert listed == [os.path.join(self.root, 'a')], listed
+        finally:
+            fs_watch.TreeView._list = original
+
+    def test_overflow(self):
+        fs_watch.walk(self.root)
+        for view in fs_watch._watcher.views.itervalues():
+            view.stale = True
+        self.touch('a', 'b', 'other')
+        assert self.walk() == sorted(os.walk(self.root))
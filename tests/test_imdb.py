@@ -226,3 +226,54 @@ class TestImdbLookup(FlexGetBase):
         assert self.feed.entries[0]['imdb_score'], 'didn\'t get score'
         assert self.feed.entries[0]['imdb_year'], 'didn\'t get year'
         assert self.feed.entries[0]['imdb_plot_outline'], 'didn\'t get plot'
+
+
+class TestImdbBulkLookup(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'Cached', imdb_url: 'http://www.imdb.com/title/tt0000001/'}
+              - {title: 'Searched'}
+              - {title: 'Fails'}
+            imdb_lookup: yes
+            set:
+              afield: "{{ imdb_score }}"
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        from datetime import datetime
+        from flexget.manager import Session
+        from flexget.plugins.metainfo.imdb_lookup import ImdbLookup, Movie, SearchResult
+        session = Session()
+        for url, title in [('http://www.imdb.com/title/tt0000001/', u'Cached'),
+                           ('http://www.imdb.com/title/tt0000002/', u'Searched')]:
+            movie = Movie()
+            movie.url, movie.title, movie.score, movie.updated = url, title, 7.5, datetime.now()
+            session.add(movie)
+        session.add(SearchResult(u'Searched', 'http://www.imdb.com/title/tt0000002/'))
+        failed = SearchResult(u'Fails')
+        failed.fails = True
+        session.add(failed)
+        session.commit()
+        session.close()
+
+        # individual lookups should not be needed
+        self.lookups = []
+        self.lookup = ImdbLookup.lookup
+        ImdbLookup.lookup = lambda plugin, entry, search_allowed=True: self.lookups.append(entry['title'])
+
+    def teardown(self):
+        from flexget.plugins.metainfo.imdb_lookup import ImdbLookup
+        ImdbLookup.lookup = self.lookup
+        FlexGetBase.teardown(self)
+
+    def test_bulk(self):
+        self.execute_feed('test')
+        assert self.feed.find_entry(title='Cached', imdb_name='Cached', imdb_score=7.5)
+        assert self.feed.find_entry(title='Searched', imdb_name='Searched',
+                                    imdb_url='http://www.imdb.com/title/tt0000002/')
+        assert self.feed.find_entry(title='Fails')['imdb_score'] is None
+        assert not self.lookups, 'entries were looked up individually: %s' % self.lookups
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from tests import FlexGetBase
+from flexget.manager import Session
+from flexget.utils.simple_persistence import SimpleKeyValue
+
+
+class TestDueOnly(FlexGetBase):
+
+    __yaml__ = """
+        presets:
+          daily:
+            interval: 1 day
+        feeds:
+          never_ran:
+            mock:
+              - {title: 'a'}
+            interval: 1 day
+          recent:
+            mock:
+              - {title: 'a'}
+            interval: 1 day
+          old:
+            mock:
+              - {title: 'a'}
+            interval: 1 hour
+          preset_recent:
+            mock:
+              - {title: 'a'}
+            preset: daily
+          disabled_interval:
+            mock:
+              - {title: 'a'}
+            preset: daily
+            disable_plugin: interval
+          no_interval:
+            mock:
+              - {title: 'a'}
+    """
+
+    def setup(self):
+        super(TestDueOnly, self).setup()
+        session = Session()
+        now = datetime.now()
+        for feed, last_time in [('recent', now), ('old', now - timedelta(hours=2)), ('preset_recent', now),
+                                ('disabled_interval', now), ('no_interval', now)]:
+            session.add(SimpleKeyValue(feed, 'interval', 'last_time', last_time))
+        session.commit()
+        session.close()
+
+    def teardown(self):
+        self.manager.options.due_only = False
+        super(TestDueOnly, self).teardown()
+
+    def test_due_only(self):
+        self.manager.options.due_only = True
+        self.manager.create_feeds()
+        assert sorted(self.manager.feeds) == ['disabled_interval', 'never_ran', 'no_interval', 'old']
+
+    def test_all_without_option(self):
+        self.manager.create_feeds()
+        assert len(self.manager.feeds) == 6
+
+    def test_due_feed_runs(self):
+        self.manager.options.due_only = True
+        self.manager.create_feeds()
+        self.manager.execute()
+        assert 'recent' not in self.manager.feeds
+        assert self.manager.feeds['old'].find_entry(title='a'), 'due feed should have been ran'
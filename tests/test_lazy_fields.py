@@ -1,4 +1,4 @@
-from flexget.entry import Entry
+from flexget.entry import Entry, LazyBatch
 
 
 class TestLazyFields(object):
@@ -38,3 +38,31 @@ class TestLazyFields(object):
         assert entry['a_fail'] == 'b', 'Lookup should have fallen back to b'
         assert 'a_field' not in entry, 'a_field should no longer be in entry after failed lookup'
         assert entry['ab_field'] == 'b', 'ab_field should be `b`'
+
+
+class TestLazyBatch(object):
+
+    def test_batch(self):
+        calls = []
+
+        def bulk(entries):
+            calls.append(len(entries))
+            for entry in entries:
+                if entry['title'] != 'miss':
+                    entry['field'] = entry['title'] + ' bulk'
+
+        def single(entry, field):
+            entry['field'] = entry['title'] + ' single'
+            return entry['field']
+
+        batch = LazyBatch(bulk)
+        entries = [Entry(title='a'), Entry(title='b'), Entry(title='miss')]
+        for entry in entries:
+            entry.register_lazy_fields(['field'], single, batch=batch)
+            # registering again should not resolve the entry twice
+            entry.register_lazy_fields(['field'], single, batch=batch)
+        assert entries[1]['field'] == 'b bulk'
+        assert entries[0]['field'] == 'a bulk'
+        assert entries[2]['field'] == 'miss single', 'entries left lazy by bulk should be looked up normally'
+        assert calls == [3]
+
@@ -0,0 +1,87 @@
+from tests import FlexGetBase
+from flexget.utils import metrics
+
+
+class TestRegistry(object):
+
+    def setup(self):
+        metrics.enable()
+
+    def teardown(self):
+        metrics.enable(False)
+        metrics.reset()
+
+    def test_render(self):
+        counter = metrics.counter('test_requests_total', 'Test requests', ['host'])
+        counter.inc(host='example.com')
+        counter.inc(2, host='example.com')
+        histogram = metrics.histogram('test_duration_seconds', 'Test duration', buckets=(1, 5))
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+        text = metrics.render()
+        assert '# TYPE test_requests_total counter' in text
+        assert 'test_requests_total{host="example.com"} 3' in text
+        assert 'test_duration_seconds_bucket{le="1"} 1' in text
+        assert 'test_duration_seconds_bucket{le="5"} 2' in text
+        assert 'test_duration_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_duration_seconds_count 3' in text
+        assert 'test_duration_seconds_sum 13.5' in text
+
+    def test_disabled(self):
+        counter = metrics.counter('test_disabled_total', 'Test counter')
+        metrics.enable(False)
+        counter.inc()
+        assert counter.get() == 0
+
+    def test_registered_once(self):
+        assert metrics.gauge('test_gauge', 'Test gauge') is metrics.gauge('test_gauge', 'Test gauge')
+        try:
+            metrics.counter('test_gauge', 'Test gauge')
+        except ValueError:
+            pass
+        else:
+            assert False, 'registering other type with same name should fail'
+
+    def test_labels(self):
+        counter = metrics.counter('test_labels_total', 'Test counter', ['feed'])
+        try:
+            counter.inc()
+        except ValueError:
+            pass
+        else:
+            assert False, 'missing label should fail'
+        counter.inc(feed=u'a "quoted"\nfeed')
+        assert 'test_labels_total{feed="a \\"quoted\\"\\nfeed"} 1' in metrics.render()
+
+
+class TestFeedMetrics(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'foo'}
+              - {title: 'bar'}
+            regexp:
+              accept:
+                - foo
+    """
+
+    def setup(self):
+        super(TestFeedMetrics, self).setup()
+        metrics.enable()
+
+    def teardown(self):
+        metrics.enable(False)
+        metrics.reset()
+        super(TestFeedMetrics, self).teardown()
+
+    def test_feed(self):
+        self.execute_feed('test')
+        from flexget.plugins.generic import metrics as collector
+        assert collector.feed_executions.get(feed='test') == 1
+        assert collector.feed_duration.get(feed='test')[0] == 1
+        assert collector.feed_entries.get(feed='test', state='produced') == 2
+        assert collector.feed_entries.get(feed='test', state='accepted') == 1
+        assert collector.db_commit.get()[0] > 0, 'feed commit should be timed'
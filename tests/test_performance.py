@@ -0,0 +1,116 @@
+import csv
+from cStringIO import StringIO
+from tests import FlexGetBase
+from flexget.manager import Session
+from flexget.utils import json
+
+# imported once plugins are loaded, importing earlier would leave out the parser options of the module
+performance = None
+
+
+class TestPerformance(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'foo'}
+              - {title: 'bar'}
+            regexp:
+              reject:
+                - bar
+            seen: yes
+    """
+
+    def setup(self):
+        global performance
+        super(TestPerformance, self).setup()
+        from flexget.plugins.generic import performance
+        performance.enabled = True
+
+    def teardown(self):
+        performance.enabled = False
+        super(TestPerformance, self).teardown()
+
+    def records(self):
+        session = Session()
+        try:
+            return [record.as_dict() for record in performance.records(session)]
+        finally:
+            session.close()
+
+    def test_records(self):
+        self.execute_feed('test')
+        records = self.records()
+        mock = [r for r in records if r['plugin'] == 'mock']
+        assert len(mock) == 1 and mock[0]['phase'] == 'input' and mock[0]['feed'] == 'test'
+        assert mock[0]['entries_in'] == 0 and mock[0]['entries_out'] == 2
+        regexp = [r for r in records if r['plugin'] == 'regexp' and r['phase'] == 'filter']
+        assert regexp and regexp[0]['entries_in'] == 2
+        seen = [r for r in records if r['plugin'] == 'seen' and r['phase'] == 'filter']
+        assert seen and seen[0]['queries'] > 0, 'seen filter should run queries'
+
+    def test_disabled(self):
+        performance.enabled = False
+        self.execute_feed('test')
+        assert not self.records()
+
+    def test_history(self):
+        size, performance.HISTORY_SIZE = performance.HISTORY_SIZE, 2
+        try:
+            for i in range(3):
+                self.execute_feed('test')
+        finally:
+            performance.HISTORY_SIZE = size
+        assert len(set(r['execution'] for r in self.records())) == 2
+
+    def test_export(self):
+        self.execute_feed('test')
+        session = Session()
+        try:
+            data = StringIO()
+            performance.export(session, data, 'json')
+            exported = json.loads(data.getvalue())
+            data = StringIO()
+            performance.export(session, data, 'csv')
+            rows = list(csv.DictReader(StringIO(data.getvalue())))
+            hottest = performance.hottest(session)
+        finally:
+            session.close()
+        assert len(exported) == len(rows) == len(self.records())
+        assert set(rows[0]) == set(performance.FIELDS)
+        assert 'mock' in [item['plugin'] for item in hottest]
+
+    def test_threads(self):
+        import threading
+        performance.start(self.manager)
+        feed = self.manager.feeds['test']
+        feed.current_phase = 'input'
+        try:
+            performance.before_plugin(feed, 'mock')
+            # requests made by another execution at the same time
+            other = threading.Thread(target=performance._http_response, args=('http://localhost/', 100, 200))
+            other.start()
+            other.join()
+            performance._http_response('http://localhost/', 10, 200)
+            performance.after_plugin(feed, 'mock')
+            result = performance._local.results[('test', 'input', 'mock')]
+        finally:
+            performance._local.results = performance._local.counters = None
+        assert result['requests'] == 1 and result['bytes'] == 10, 'other threads should not be counted'
+
+    def test_upgrade(self):
+        self.execute_feed('test')
+        from flexget.schema import PluginSchema, get_version
+        session = Session()
+        try:
+            session.query(PluginSchema).filter(PluginSchema.plugin == 'performance').update({'version': 0})
+            session.commit()
+        finally:
+            session.close()
+        performance.upgrade(self.manager)
+        assert get_version('performance') == 1
+        assert not self.manager.db_upgrade_failed
+        assert not self.records(), 'history should have been dropped'
+        self.execute_feed('test')
+        assert self.records()
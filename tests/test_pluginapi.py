@@ -1,5 +1,9 @@
 import os
+import sys
 import glob
+import shutil
+import subprocess
+import tempfile
 from tests import FlexGetBase
 from flexget import plugin, plugins
 from nose.tools import raises
@@ -50,3 +54,104 @@ class TestPluginApi(object):
         assert 'test_plugin' in plugin.plugins
         assert 'oneword' in plugin.plugins
         assert 'test_html' in plugin.plugins
+
+
+class TestDispatchPlan(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'entry 1'}
+            accept_all: yes
+            disable_builtins: yes
+    """
+
+    def test_plan(self):
+        self.execute_feed('test')
+        plan = self.feed.plan('filter')
+        assert plan is self.feed.plan('filter'), 'plan should be reused'
+        names = [p.name for p in self.feed.plugins('filter')]
+        assert 'accept_all' in names
+        assert 'seen' in names, 'builtins should be enabled again after execution'
+        assert [p.name for p, configured in plan if configured] == ['accept_all']
+        # plan is recomputed when configuration changes
+        self.feed.config['regexp'] = {'accept': ['entry']}
+        assert self.feed.plan('filter') is not plan
+        assert 'regexp' in [p.name for p in self.feed.plugins('filter')]
+        del self.feed.config['regexp']
+        assert 'regexp' not in [p.name for p in self.feed.plugins('filter')]
+
+    def test_plan_plugins_replaced(self):
+        self.execute_feed('test')
+        plan = self.feed.plan('filter')
+        assert 'regexp' in [p.name for p, configured in plan]
+        # registry changes without changing the number of plugins
+        removed = plugin.plugins.pop('regexp')
+        plugin.plugins['test_placeholder'] = plugin.plugins['mock']
+        try:
+            assert 'regexp' not in [p.name for p, configured in self.feed.plan('filter')]
+        finally:
+            del plugin.plugins['test_placeholder']
+            plugin.plugins['regexp'] = removed
+
+    def test_disabled_builtins(self):
+        self.execute_feed('test')
+        assert self.feed.find_entry('accepted', title='entry 1')
+        # seen is disabled, so entry is accepted again
+        self.execute_feed('test')
+        assert self.feed.find_entry('accepted', title='entry 1')
+
+
+class TestPluginManifest(object):
+    """Lazy loading needs a fresh interpreter, plugins are already fully loaded in this one."""
+
+    script = """
+import sys
+from flexget import logger, plugin
+from flexget.options import CoreOptionParser
+logger.initialize(True)
+plugin.load_plugins(CoreOptionParser(), lazy=True)
+print 'html' in plugin.plugins, 'seen' in plugin.plugins
+plugin.load_plugins_for_config({'feeds': {'test': {'html': 'http://localhost/', 'regexp': {'accept': ['a']}}}})
+print 'html' in plugin.plugins, 'regexp' in plugin.plugins, 'limit_new' in plugin.plugins
+print bool(plugin.get_plugin_by_name('limit_new')), 'piratebay' in plugin.plugins
+print bool(list(plugin.get_plugins_by_group('urlrewriter'))), 'piratebay' in plugin.plugins
+"""
+
+    def setup(self):
+        self.home = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.home, '.flexget'))
+
+    def teardown(self):
+        shutil.rmtree(self.home)
+
+    def run_script(self, script=None):
+        env = dict(os.environ, HOME=self.home)
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, '-c', script or self.script], stdout=subprocess.PIPE, env=env,
+                                   cwd=cwd)
+        return process.communicate()[0].split()
+
+    def test_lazy(self):
+        # first run builds the manifest and loads everything
+        assert self.run_script() == ['True'] * 9
+        assert os.path.exists(os.path.join(self.home, '.flexget', 'plugin_manifest.json'))
+        assert self.run_script() == ['False', 'True', 'True', 'True', 'False', 'True', 'False', 'True', 'True']
+
+    def test_outdated(self):
+        path = os.path.join(self.home, '.flexget', 'plugin_manifest.json')
+        self.run_script()
+        manifest = open(path).read()
+        open(path, 'w').write(manifest.replace('"mtime": ', '"mtime": 1', 1))
+        assert self.run_script() == ['True'] * 9, 'outdated manifest should not be used'
+        assert open(path).read() == manifest, 'manifest should be rebuilt'
+
+    def test_fingerprint(self):
+        script = (self.script.split('plugin.load_plugins_for_config')[0] +
+                  'from flexget import schema\nprint schema.fingerprint()\n'
+                  'plugin.load_all_plugins()\nprint schema.fingerprint()\n')
+        full = self.run_script(script)
+        lazy = self.run_script(script)
+        assert lazy[0] == 'False', 'second run should load lazily'
+        assert full[2] == full[3] == lazy[2] == lazy[3], 'fingerprint should not depend on loaded modules'
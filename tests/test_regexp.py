@@ -138,3 +138,29 @@ class TestRegexp(FlexGetBase):
         self.execute_feed('test_match_in_list')
         assert self.feed.find_entry('accepted', title='expression'), '\'expression\' should have been accepted'
         assert self.feed.find_entry('entries', title='regular') not in self.feed.accepted, '\'regular\' should not have been accepted'
+
+    def test_compiled_order(self):
+        from flexget.entry import Entry
+        from flexget.plugins.filter.regexp import FilterRegexp, CompiledRegexps, RuleGroup
+        config = FilterRegexp().prepare_config({'accept': ['xyz', 'exp', 'reg', {'regexp1': {'not': 'regexp'}}, 'r']})
+        compiled = CompiledRegexps(config['accept'])
+        assert isinstance(compiled.matchers[0], RuleGroup), 'plain regexps should have been combined'
+        entry = Entry(title='regexp1', url='http://localhost/')
+        rule, field = compiled.first(entry, True)
+        # 'reg' matches leftmost, but 'exp' is configured first
+        assert rule.regexp.pattern == 'exp', 'first configured regexp should have matched, got %s' % rule.regexp.pattern
+        assert field == 'title'
+        rule, field = compiled.first(entry, False)
+        assert rule.regexp.pattern == 'xyz', 'first regexp not matching should have been found'
+        assert compiled.first(Entry(title='abc', url='http://localhost/'), True) is None
+
+    def test_compiled_groups(self):
+        from flexget.entry import Entry
+        from flexget.plugins.filter.regexp import FilterRegexp, CompiledRegexps
+        regexps = ['(n%d)(x)?' % i for i in range(100)] + ['(?P<name>reg)exp', '(?P<name>exp)1', '(r)\\1']
+        compiled = CompiledRegexps(FilterRegexp().prepare_config({'reject': regexps})['reject'])
+        assert len(compiled.matchers) > 2, 'regexps should have been split into several alternations'
+        rule, field = compiled.first(Entry(title='regexp1', url='http://localhost/'), True)
+        assert rule.regexp.pattern == '(?P<name>reg)exp'
+        rule, field = compiled.first(Entry(title='rr', url='http://localhost/'), True)
+        assert rule.regexp.pattern == '(r)\\1'
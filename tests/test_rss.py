@@ -34,7 +34,7 @@ class TestInputRSS(FlexGetBase):
         FlexGetBase.setup(self)
         # reset input cache so that the cache is not used for second execution
         from flexget.utils.cached_input import cached
-        cached.cache = {}
+        cached.cache.clear()
 
     def test_rss(self):
         self.execute_feed('test')
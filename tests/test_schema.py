@@ -0,0 +1,83 @@
+import os
+import shutil
+from tests import FlexGetBase, MockManager, util
+from flexget import schema
+
+
+class TestSchemaFingerprint(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'entry'}
+            accept_all: yes
+    """
+
+    def setup(self):
+        self.tmpdir = util.maketemp('schema_fingerprint')
+        self.database_uri = 'sqlite:///%s' % os.path.join(self.tmpdir, 'test.sqlite').replace('\\', '\\\\')
+        super(TestSchemaFingerprint, self).setup()
+
+    def teardown(self):
+        try:
+            super(TestSchemaFingerprint, self).teardown()
+        finally:
+            shutil.rmtree(self.tmpdir)
+
+    def restart(self, verify=False):
+        self.manager.shutdown()
+        self.manager.__del__()
+        options = self.manager.options
+        # unit tests run with --reset, which always recreates the tables
+        reset, options.reset, options.db_verify = options.reset, False, verify
+        try:
+            self.manager = MockManager(self.__yaml__, self.__class__.__name__, db_uri=self.database_uri)
+        finally:
+            options.reset, options.db_verify = reset, False
+
+    def test_skip_unchanged(self):
+        assert self.manager.db_schema_changed, 'new database should be checked'
+        assert schema.get_fingerprint(self.manager.engine) != schema.fingerprint(), \
+            'versions set by this start should not be trusted yet'
+        self.restart()
+        assert self.manager.db_schema_changed, 'versions should be verified once more'
+        assert schema.get_fingerprint(self.manager.engine) == schema.fingerprint()
+        self.restart()
+        assert not self.manager.db_schema_changed, 'unchanged schema should not be checked again'
+        self.execute_feed('test')
+        assert self.feed.find_entry('accepted', title='entry')
+
+    def test_changed(self):
+        schema.set_fingerprint(self.manager.engine, 1)
+        self.restart()
+        assert self.manager.db_schema_changed, 'changed schema should be checked'
+        assert schema.get_fingerprint(self.manager.engine) == schema.fingerprint()
+
+    def test_version_changed(self):
+        self.restart()
+        schema.set_fingerprint(self.manager.engine, 1)
+        # simulate a plugin upgraded during the next start
+        session = schema.Session()
+        try:
+            session.query(schema.PluginSchema).filter(schema.PluginSchema.plugin == 'fs_index').\
+                update({'version': 0})
+            session.commit()
+        finally:
+            session.close()
+        self.restart()
+        assert self.manager.db_schema_changed
+        assert schema.get_fingerprint(self.manager.engine) == 1, 'fingerprint should not be stored after upgrade'
+        self.restart()
+        assert schema.get_fingerprint(self.manager.engine) == schema.fingerprint()
+
+    def test_lazy_modules(self):
+        from flexget import plugin
+        before = schema.fingerprint()
+        plugin.load_all_plugins()
+        assert schema.fingerprint() == before, 'fingerprint should not depend on which modules are loaded'
+
+    def test_verify(self):
+        self.restart(verify=True)
+        assert self.manager.db_schema_changed, '--db-verify should force checking'
+
@@ -0,0 +1,68 @@
+import pickle
+from datetime import datetime, date, timedelta
+from sqlalchemy import Table, Column, Integer, LargeBinary, MetaData
+from tests import FlexGetBase
+from flexget.entry import Entry
+from flexget.manager import Session
+from flexget.utils import serialization
+from flexget.utils.database import migrate_pickle_column
+
+
+class TestSerialization(object):
+
+    def test_roundtrip(self):
+        value = {'text': u'\xe4iti', 'ascii': 'abc', 'binary': '\xff\x00', 'int': 1, 'long': 2L, 'float': 1.5,
+                 'bool': True, 'none': None, 'datetime': datetime(2012, 1, 2, 3, 4, 5, 6), 'date': date(2012, 1, 2),
+                 'timedelta': timedelta(days=1, seconds=5), 'list': [1, [2, u'3']], 'tuple': (1, 2),
+                 'set': set([1, 2]), 'int_keys': {1: u'a', 2: u'b'}, '$': u'tag key'}
+        for compress in (True, False):
+            assert serialization.loads(serialization.dumps(value, compress=compress)) == value
+
+    def test_entry(self):
+        entry = Entry(u'title', u'http://localhost', nested={'key': [1, 2]})
+        entry.register_lazy_fields(['lazy'], lambda entry, field: u'value')
+        result = serialization.loads(serialization.dumps(entry))
+        assert isinstance(result, Entry)
+        assert result == {'title': u'title', 'url': u'http://localhost', 'original_url': u'http://localhost',
+                          'nested': {'key': [1, 2]}}
+        assert 'lazy' not in result, 'lazy fields should not be stored'
+
+    def test_unsupported(self):
+        result = serialization.loads(serialization.dumps({'a': object(), 'b': [1, object()], 'c': u'c'}))
+        assert result == {'b': [1], 'c': u'c'}
+
+    def test_legacy_pickle(self):
+        assert serialization.loads(pickle.dumps({'a': 1})) == {'a': 1}
+        assert serialization.loads(pickle.dumps({'a': 1}, 2)) == {'a': 1}
+
+    def test_compression(self):
+        value = {'description': u'lorem ipsum ' * 100}
+        assert serialization.dumps(value)[0] == serialization.FORMAT_JSON_ZLIB
+        assert serialization.dumps({'a': 1})[0] == serialization.FORMAT_JSON
+
+
+class TestPickleMigration(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'irrelevant'}
+    """
+
+    def test_migrate(self):
+        table = Table('pickle_test', MetaData(), Column('id', Integer, primary_key=True), Column('data', LargeBinary))
+        session = Session()
+        try:
+            table.create(bind=session.connection())
+            session.execute(table.insert(), [{'data': pickle.dumps({'title': u'a', 'url': u'b'})},
+                                             {'data': 'garbage'}])
+            assert migrate_pickle_column(session, 'pickle_test', 'data', entries=True) == (1, 1)
+            rows = session.execute(table.select()).fetchall()
+            assert len(rows) == 1
+            entry = serialization.loads(rows[0]['data'])
+            assert isinstance(entry, Entry) and entry['title'] == u'a'
+            # already converted rows are left alone
+            assert migrate_pickle_column(session, 'pickle_test', 'data') == (0, 0)
+        finally:
+            session.close()
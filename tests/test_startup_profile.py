@@ -0,0 +1,33 @@
+from __future__ import with_statement
+import sys
+from flexget.utils import json, startup_profile
+
+
+class TestStartupProfile(object):
+
+    def teardown(self):
+        startup_profile.stop()
+
+    def test_inactive(self):
+        startup_profile.record('step', 'nothing', 1.0)
+        with startup_profile.timed('step', 'nothing'):
+            pass
+        assert startup_profile.stop() is None
+
+    def test_records(self):
+        sys.modules.pop('colorsys', None)
+        profile = startup_profile.start()
+        assert startup_profile.start() is profile, 'should not restart'
+        import colorsys
+        startup_profile.record('register', 'plugin', 0.5)
+        with startup_profile.timed('step', 'block'):
+            pass
+        assert startup_profile.stop() is profile
+        assert __import__ is not profile._profiled_import, 'import hook should be removed'
+        names = [(category, name) for category, name, seconds, own in profile.records]
+        assert ('import', 'colorsys') in names
+        assert ('register', 'plugin') in names and ('step', 'block') in names
+        report = profile.report()
+        assert 'colorsys' in report and 'plugin' in report
+        trace = json.loads(json.dumps(profile.trace()))
+        assert len(trace['records']) == len(profile.records)
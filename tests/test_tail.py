@@ -0,0 +1,124 @@
+from tests import FlexGetBase
+
+
+class TestTail(FlexGetBase):
+
+    __tmp__ = True
+    __yaml__ = """
+        feeds:
+          test:
+            tail:
+              file: __tmp__announce.log
+              entry:
+                title: 'TITLE: (.*?) (?:URL|$)'
+                url: 'URL: (\S+)'
+          test_encoding:
+            tail:
+              file: __tmp__announce.log
+              encoding: ascii
+              entry:
+                title: 'TITLE: (.*?) (?:URL|$)'
+                url: 'URL: (\S+)'
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        self.log = self.__tmp__ + 'announce.log'
+        open(self.log, 'w').close()
+
+    def teardown(self):
+        from flexget.plugins.input import tail
+        tail.CHECKPOINT_INTERVAL = 1000
+        FlexGetBase.teardown(self)
+
+    def write(self, text):
+        log = open(self.log, 'ab')
+        try:
+            log.write(text)
+        finally:
+            log.close()
+
+    def titles(self, feed='test'):
+        self.execute_feed(feed)
+        return [entry['title'] for entry in self.feed.entries]
+
+    def test_fields(self):
+        self.write('noise\nTITLE: a URL: http://localhost/a\nTITLE: b \nnoise\nURL: http://localhost/b\n')
+        assert self.titles() == ['a', 'b']
+        assert self.feed.find_entry(title='b')['url'] == 'http://localhost/b'
+
+    def test_position(self):
+        self.write('TITLE: a URL: http://localhost/a\n')
+        assert self.titles() == ['a']
+        assert self.titles() == [], 'lines should not be read again'
+        self.write('TITLE: b URL: http://localhost/b\nTITLE: c \n')
+        assert self.titles() == ['b'], 'incomplete entry should not be added'
+        self.write('URL: http://localhost/c\nTITLE: d URL: http://lo')
+        assert self.titles() == ['c'], 'incomplete entry should be completed and unterminated line left unread'
+        self.write('calhost/d\n')
+        assert self.titles() == ['d']
+
+    def test_checkpoint(self):
+        # imported here, importing plugins before they are loaded loses their options
+        from flexget.plugins.input import tail
+        tail.CHECKPOINT_INTERVAL = 2
+        for name in 'abcd':
+            self.write('TITLE: %s URL: http://localhost/%s\n' % (name, name))
+        # execution fails before reaching end of file
+        self.write('TITLE: \xe4 URL: http://localhost/e\n')
+        assert self.titles('test_encoding') == []
+        # replace invalid line
+        data = open(self.log).read().replace('\xe4', 'e')
+        open(self.log, 'w').write(data)
+        assert self.titles('test_encoding') == ['a', 'b', 'c', 'd', 'e']
+        assert self.titles('test_encoding') == []
+
+    def checkpoints(self):
+        from flexget.manager import Session
+        from flexget.plugins.input import tail
+        from flexget.utils.simple_persistence import SimpleKeyValue
+        session = Session()
+        try:
+            rows = session.query(SimpleKeyValue).filter(SimpleKeyValue.feed == 'test_encoding').\
+                filter(SimpleKeyValue.plugin == 'tail').all()
+            return dict((row.key, row.value) for row in rows if row.key.startswith(tail.checkpoint_key(self.log)))
+        finally:
+            session.close()
+
+    def test_checkpoint_parts(self):
+        from flexget.plugins.input import tail
+        tail.CHECKPOINT_INTERVAL = 2
+        for name in 'abcd':
+            self.write('TITLE: %s URL: http://localhost/%s\n' % (name, name))
+        self.write('TITLE: \xe4 URL: http://localhost/e\n')
+        assert self.titles('test_encoding') == []
+        checkpoints = self.checkpoints()
+        assert len(checkpoints) == 3, checkpoints.keys()
+        # each part holds only entries found after the previous checkpoint
+        parts = [value for key, value in sorted(checkpoints.iteritems()) if key[-1].isdigit()]
+        assert [[entry['title'] for entry in part] for part in parts] == [['a', 'b'], ['c', 'd']]
+        data = open(self.log).read().replace('\xe4', 'e')
+        open(self.log, 'w').write(data)
+        assert self.titles('test_encoding') == ['a', 'b', 'c', 'd', 'e']
+        assert not self.checkpoints(), 'checkpoint should be removed once the position is stored'
+        # rotated log reaching past the old checkpoint does not continue from it
+        open(self.log, 'w').close()
+        for name in 'fghi':
+            self.write('TITLE: %s URL: http://localhost/%s\n' % (name, name))
+        assert self.titles('test_encoding') == ['f', 'g', 'h', 'i']
+
+    def test_checkpoint_rotated(self):
+        from flexget.plugins.input import tail
+        tail.CHECKPOINT_INTERVAL = 2
+        self.write('TITLE: a URL: http://localhost/a\n')
+        assert self.titles('test_encoding') == ['a']
+        for name in 'bcd':
+            self.write('TITLE: %s URL: http://localhost/%s\n' % (name, name))
+        self.write('TITLE: \xe4 URL: http://localhost/e\n')
+        assert self.titles('test_encoding') == []
+        assert self.checkpoints()
+        # log is rotated, new file is shorter than the stored position
+        open(self.log, 'w').close()
+        self.write('TITLE: f URL: http://f\n')
+        assert self.titles('test_encoding') == ['f'], 'entries of the old file should not be returned'
+        assert not self.checkpoints(), 'checkpoint of the old file should be removed'
@@ -80,6 +80,72 @@ class TestThetvdbLookup(FlexGetBase):
         test_run()
 
 
+class TestThetvdbBulkLookup(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'House.S01E02.HDTV.XViD-FlexGet'}
+              - {title: 'House.S01E03.HDTV.XViD-FlexGet'}
+              - {title: 'House.S02E01.HDTV.XViD-FlexGet'}
+            series:
+              - House
+            thetvdb_lookup: yes
+            set:
+              afield: "{{ thetvdb_id }}{{ ep_name }}"
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        from datetime import datetime
+        from flexget.plugins import api_tvdb
+        from flexget.plugins.metainfo.thetvdb_lookup import PluginThetvdbLookup
+        session = Session()
+        series = api_tvdb.TVDBSeries()
+        series.id, series.seriesname, series.expired = 73255, u'House', False
+        session.add(series)
+        for season, number, name in [(1, 2, u'Paternity'), (1, 3, u'Occam\'s Razor'), (2, 1, u'Acceptance')]:
+            episode = api_tvdb.TVDBEpisode()
+            episode.id, episode.seasonnumber, episode.episodenumber = 100 * season + number, season, number
+            episode.episodename, episode.expired, episode.series_id = name, False, 73255
+            session.add(episode)
+        session.commit()
+        session.close()
+        # avoid checking updates from tvdb
+        api_tvdb.persist['last_local'] = datetime.now()
+        api_tvdb.persist['last_server'] = '1'
+
+        # individual lookups should not be needed
+        self.lookups = []
+        self.lookup = PluginThetvdbLookup.lazy_series_lookup, PluginThetvdbLookup.lazy_episode_lookup
+        PluginThetvdbLookup.lazy_series_lookup = PluginThetvdbLookup.lazy_episode_lookup = \
+            lambda plugin, entry, field: self.lookups.append(entry['title'])
+
+    def teardown(self):
+        from flexget.plugins.metainfo.thetvdb_lookup import PluginThetvdbLookup
+        PluginThetvdbLookup.lazy_series_lookup, PluginThetvdbLookup.lazy_episode_lookup = self.lookup
+        FlexGetBase.teardown(self)
+
+    def test_bulk(self):
+        self.execute_feed('test')
+        assert self.feed.find_entry(title='House.S01E02.HDTV.XViD-FlexGet', afield='73255Paternity')
+        assert self.feed.find_entry(title='House.S01E03.HDTV.XViD-FlexGet', ep_name='Occam\'s Razor')
+        assert self.feed.find_entry(title='House.S02E01.HDTV.XViD-FlexGet', ep_name='Acceptance')
+        assert not self.lookups, 'entries were looked up individually: %s' % self.lookups
+
+    def test_bulk_chunked(self):
+        from flexget.plugins.metainfo import thetvdb_lookup
+        from flexget.utils import sqlalchemy_utils
+        chunk_size = thetvdb_lookup.IN_CHUNK_SIZE
+        # one season and one series per query
+        thetvdb_lookup.IN_CHUNK_SIZE = sqlalchemy_utils.IN_CHUNK_SIZE = 2
+        try:
+            self.test_bulk()
+        finally:
+            thetvdb_lookup.IN_CHUNK_SIZE = sqlalchemy_utils.IN_CHUNK_SIZE = chunk_size
+
+
 class TestThetvdbFavorites(FlexGetBase):
     """
         Tests thetvdb favorites plugin with a test user at thetvdb.
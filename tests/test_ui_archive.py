@@ -0,0 +1,60 @@
+import sys
+import threading
+from nose.plugins.skip import SkipTest
+from tests import FlexGetBase
+
+
+class TestArchiveRoutes(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'irrelevant'}
+    """
+
+    def setup(self):
+        try:
+            import flask
+        except ImportError:
+            raise SkipTest('flask is not installed')
+        super(TestArchiveRoutes, self).setup()
+        from sqlalchemy.orm import scoped_session, sessionmaker
+        from flexget.ui import webui
+        webui.db_session = scoped_session(sessionmaker(bind=self.manager.engine))
+        import flexget.ui.plugins.archive
+        from flexget.plugins.generic.archive import Consolidator
+        # package exports the flask module of the same name
+        ui_archive = sys.modules['flexget.ui.plugins.archive.archive']
+        self.ui_archive = ui_archive
+        self.db_session = webui.db_session
+        ui_archive.db_session = webui.db_session
+        self.runs = []
+        ui_archive.consolidator = Consolidator()
+        # in-memory test database is not visible to the consolidation thread
+        ui_archive.consolidator.run = lambda: self.runs.append(True)
+        self.client = webui.app.test_client()
+
+    def teardown(self):
+        self.db_session.remove()
+        super(TestArchiveRoutes, self).teardown()
+
+    def test_count(self):
+        response = self.client.get('/archive/count')
+        assert response.status_code == 200
+        assert response.data == '0'
+
+    def test_consolidate(self):
+        from flexget.utils import json
+        status = json.loads(self.client.get('/archive/consolidate/status').data)
+        assert not status['running']
+        status = json.loads(self.client.post('/archive/consolidate').data)
+        assert status['running'], 'consolidation should have been started'
+        for thread in threading.enumerate():
+            if thread.getName() == 'archive_consolidate':
+                thread.join()
+        # already running, not started again
+        self.client.post('/archive/consolidate')
+        self.client.post('/archive/consolidate/stop')
+        assert self.runs == [True]
+        assert self.ui_archive.consolidator._stop, 'stop should have been requested'
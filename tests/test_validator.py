@@ -1,4 +1,5 @@
-from flexget import validator
+from flexget import validator, feed
+from tests import FlexGetBase
 import yaml
 
 
@@ -91,3 +92,48 @@ class TestValidator(object):
         assert recursive_validator().validate(test_config), 'Config should pass validation'
         test_config['recurse']['badkey'] = 4
         assert not recursive_validator().validate(test_config), 'Config should not be valid'
+
+
+class TestValidationCache(FlexGetBase):
+
+    __yaml__ = """
+        feeds:
+          test:
+            mock:
+              - {title: 'entry'}
+            accept_all: yes
+    """
+
+    def test_cache(self):
+        from flexget.plugin import get_plugin_by_name
+        plugin = get_plugin_by_name('accept_all')
+        validator = plugin.instance.validator
+        calls = []
+
+        def counting_validator():
+            calls.append(1)
+            return validator()
+
+        feed.Feed.validate_config({'accept_all': True})
+        plugin.instance.validator = counting_validator
+        try:
+            self.execute_feed('test')
+            self.execute_feed('test')
+            assert not calls, 'validator tree should have been built only once'
+            assert feed._valid_configs[self.feed.name] == self.feed.config_hash
+            # invalid configs are not cached and errors are reported each time
+            assert feed.Feed.validate_config({'accept_all': 'invalid'})
+            assert feed.Feed.validate_config({'accept_all': 'invalid'})
+            assert not feed.Feed.validate_config({'accept_all': True}), 'errors from previous validation remained'
+        finally:
+            plugin.instance.validator = validator
+
+    def test_check(self):
+        self.execute_feed('test')
+        self.feed.config['accept_all'] = 'invalid'
+        # same hash, --check should still validate
+        self.manager.options.validate = True
+        try:
+            assert self.feed.validate()
+        finally:
+            self.manager.options.validate = False